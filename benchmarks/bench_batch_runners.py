@@ -0,0 +1,63 @@
+"""
+Batch runner throughput benchmark.
+
+Runs batches of I/O-bound tool calls through the batch tool with the sequential
+`DEFAULT_BATCH_RUNNER`, a runner that builds a new `ThreadPoolExecutor` for every
+batch, and the persistent `ThreadPoolBatchRunner`.
+
+Run with `python benchmarks/bench_batch_runners.py`.
+"""
+
+import concurrent.futures
+import json
+import time
+
+from pytoolsmith import ToolDefinition, ToolLibrary, pytoolsmith_config
+from pytoolsmith.pytoolsmith_config.batch_runner import DEFAULT_BATCH_RUNNER
+
+BATCH_SIZE = 20
+N_BATCHES = 20
+IO_LATENCY = 0.005
+
+
+def lookup(user_id: int) -> str:
+    time.sleep(IO_LATENCY)
+    return str(user_id)
+
+
+def per_batch_executor_runner(callables):
+    with concurrent.futures.ThreadPoolExecutor() as executor:
+        return list(executor.map(lambda c: c(), callables))
+
+
+def main() -> None:
+    library = ToolLibrary(include_batch_tool=True)
+    library.add_tool(ToolDefinition(function=lookup))
+    batch = library.get_tool_from_name("batch_tool")
+    llm_parameters = {"invocations": [
+        {"name": "lookup", "arguments": json.dumps({"user_id": i})}
+        for i in range(BATCH_SIZE)
+    ]}
+
+    thread_pool_runner = pytoolsmith_config.ThreadPoolBatchRunner(max_workers=32)
+    runners = {
+        "DEFAULT_BATCH_RUNNER": DEFAULT_BATCH_RUNNER,
+        "new executor per batch": per_batch_executor_runner,
+        "ThreadPoolBatchRunner": thread_pool_runner,
+    }
+
+    print(f"{N_BATCHES} batches of {BATCH_SIZE} calls, {IO_LATENCY * 1000:.0f}ms each")
+    for label, runner in runners.items():
+        pytoolsmith_config.set_batch_runner(runner)
+        start = time.perf_counter()
+        for _ in range(N_BATCHES):
+            batch.call_tool(llm_parameters, {})
+        elapsed = time.perf_counter() - start
+        print(f"{label:<24} {N_BATCHES * BATCH_SIZE / elapsed:>10,.0f} calls/sec")
+
+    pytoolsmith_config.unset_batch_runner()
+    thread_pool_runner.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""
+Dispatch micro-benchmark for `ToolDefinition.call_tool`.
+
+Uses trivial tools so the numbers are almost entirely PyToolsmith's own overhead
+on top of a plain function call.
+
+Run with `python benchmarks/bench_dispatch.py`.
+"""
+
+import timeit
+
+from pytoolsmith import ToolDefinition, ToolLibrary
+
+N_CALLS = 500_000
+
+
+def add_one(a: int) -> int:
+    return a + 1
+
+
+def add_one_for_tenant(a: int, tenant_id: str) -> int:
+    return a + 1
+
+
+def _report(label: str, seconds: float) -> None:
+    print(f"{label:<32} {N_CALLS / seconds:>12,.0f} calls/sec "
+          f"({seconds / N_CALLS * 1e9:,.0f} ns/call)")
+
+
+def main() -> None:
+    plain_tool = ToolDefinition(function=add_one)
+    injected_tool = ToolDefinition(function=add_one_for_tenant,
+                                   injected_parameters=["tenant_id"])
+
+    library = ToolLibrary(include_batch_tool=True)
+    library.add_tool(plain_tool)
+    batch = library.get_tool_from_name("batch_tool")
+    invocations = {"invocations": [{"name": "add_one", "arguments": '{"a": 1}'}]}
+
+    llm_parameters = {"a": 1}
+    hardset_parameters = {"tenant_id": "t"}
+
+    _report("direct function call",
+            timeit.timeit(lambda: add_one(**llm_parameters), number=N_CALLS))
+    _report("call_tool",
+            timeit.timeit(lambda: plain_tool.call_tool(llm_parameters, {}),
+                          number=N_CALLS))
+    _report("call_tool (injected parameter)",
+            timeit.timeit(
+                lambda: injected_tool.call_tool(llm_parameters, hardset_parameters),
+                number=N_CALLS))
+    _report("batch_tool (1 invocation)",
+            timeit.timeit(lambda: batch.call_tool(invocations, {}),
+                          number=N_CALLS // 10) * 10)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""
+Multi-thread scaling benchmark for a shared `ToolLibrary`.
+
+Each thread looks up tools, renders their schema and calls them against a single
+library. On free-threaded CPython (3.13t) throughput should grow with the thread
+count; on a GIL build it shows the cost of the shared-state paths staying flat.
+
+Run with `python benchmarks/bench_threading.py`.
+"""
+
+import concurrent.futures
+import sys
+import time
+
+from pytoolsmith import ToolDefinition, ToolLibrary
+
+N_TOOLS = 200
+CALLS_PER_THREAD = 20_000
+
+
+def _make_function(name: str):
+    def func(a: int, tenant_id: str) -> int:
+        return a + 1
+
+    func.__name__ = name
+    return func
+
+
+def _build_library() -> ToolLibrary:
+    library = ToolLibrary(include_batch_tool=True)
+    for i in range(N_TOOLS):
+        library.add_tool(ToolDefinition(function=_make_function(f"tool_{i}"),
+                                        injected_parameters=["tenant_id"]))
+    return library
+
+
+def _worker(library: ToolLibrary, offset: int) -> None:
+    hardset = {"tenant_id": "t"}
+    for i in range(CALLS_PER_THREAD):
+        tool = library.get_tool_from_name(f"tool_{(i + offset) % N_TOOLS}")
+        tool.build_json_schema()
+        tool.call_tool({"a": i}, hardset)
+
+
+def main() -> None:
+    library = _build_library()
+    gil_enabled = getattr(sys, "_is_gil_enabled", lambda: True)()
+    print(f"Python {sys.version.split()[0]}, GIL enabled: {gil_enabled}")
+
+    for n_threads in (1, 2, 4, 8):
+        with concurrent.futures.ThreadPoolExecutor(max_workers=n_threads) as executor:
+            start = time.perf_counter()
+            list(executor.map(lambda i: _worker(library, i), range(n_threads)))
+            elapsed = time.perf_counter() - start
+
+        total_calls = n_threads * CALLS_PER_THREAD
+        print(f"{n_threads:>2} threads: {total_calls / elapsed:>12,.0f} calls/sec")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,8 +3,51 @@
 __version__ = "0.1.0"
 
 from . import pytoolsmith_config
+from .admission import AdmissionStats, ToolOverloadedError
+from .batch_tool import BatchResult
+from .caching import CachePolicy, CacheStats, invalidate_cache_tags
+from .circuit_breaker import CircuitBreakerPolicy, CircuitOpenError
+from .execution import ToolQueueTimeoutError, ToolTimeoutError
+from .hedging import HedgePolicy, HedgeStats
+from .hooks import CallEvent, RenderEvent, SchemaEvent, ToolHooks, get_current_call
+from .limits import LimitStats, RateLimit
+from .opentelemetry_hooks import OpenTelemetryHooks
+from .retries import RetryPolicy, RetryStats
 from .tool_definition import ToolDefinition
 from .tool_library import ToolLibrary
 from .tool_parameters import ToolParameters
+from .tool_stats import Histogram, ToolStats, format_prometheus_metrics
+from .validation import ToolArgumentValidationError
 
-__all__ = [ToolLibrary, ToolDefinition, ToolParameters, pytoolsmith_config]
+__all__ = [
+    ToolLibrary,
+    ToolDefinition,
+    ToolParameters,
+    BatchResult,
+    CachePolicy,
+    CacheStats,
+    RateLimit,
+    LimitStats,
+    RetryPolicy,
+    RetryStats,
+    CircuitBreakerPolicy,
+    CircuitOpenError,
+    HedgePolicy,
+    HedgeStats,
+    AdmissionStats,
+    ToolStats,
+    Histogram,
+    ToolHooks,
+    CallEvent,
+    SchemaEvent,
+    RenderEvent,
+    OpenTelemetryHooks,
+    ToolArgumentValidationError,
+    ToolTimeoutError,
+    ToolQueueTimeoutError,
+    ToolOverloadedError,
+    invalidate_cache_tags,
+    format_prometheus_metrics,
+    get_current_call,
+    pytoolsmith_config,
+]
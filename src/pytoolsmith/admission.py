@@ -0,0 +1,269 @@
+"""Process-wide admission control, which caps how many tool calls run at once."""
+
+import asyncio
+from collections.abc import Hashable
+from dataclasses import dataclass, field
+import heapq
+import itertools
+import threading
+import time
+from typing import Any
+
+from .execution import ToolQueueTimeoutError
+from .limits import _Waiter
+
+
+class ToolOverloadedError(RuntimeError):
+    """Raised instead of calling a tool when too many tool calls are already waiting."""
+
+    def __init__(self, tool_name: str):
+        self.tool_name = tool_name
+        super().__init__(f"Too many tool calls are running, so {tool_name} wasn't "
+                         f"called. Try again shortly.")
+
+
+@dataclass(frozen=True)
+class AdmissionStats:
+    """A snapshot of the admission controller's counters."""
+
+    active: int
+    """Calls running right now."""
+
+    queued: int
+    """Calls waiting to run right now."""
+
+    peak_queued: int
+    """The longest the queue has been."""
+
+    admitted: int
+    """Calls that have been let through, with or without waiting."""
+
+    shed: int
+    """Calls turned away because the queue was full or they waited too long."""
+
+    total_wait_time: float
+    """Seconds that admitted calls have spent waiting, in total."""
+
+    max_wait_time: float
+    """The longest an admitted call has waited, in seconds."""
+
+    queued_by_tenant: dict[Hashable, int] = field(default_factory=dict)
+    """Calls waiting right now, by tenant, when calls are scheduled by tenant."""
+
+    @property
+    def mean_wait_time(self) -> float:
+        return self.total_wait_time / self.admitted if self.admitted else 0.0
+
+
+class _FairQueue:
+    """
+    Orders queued items by start-time fair queueing between tenants. Each item is
+    tagged with how much its tenant has been served, counting an item as one over the
+    tenant's weight, and the lowest tag goes next. Tenants are served in proportion to
+    their weights however many items each has queued, and each tenant's items keep
+    the order they arrived in. Callers lock around it.
+    """
+
+    def __init__(self):
+        self._heap: list[tuple[float, int, Hashable, Any]] = []
+        """A heap of items by start tag, then arrival."""
+        self._arrivals = itertools.count()
+        self._virtual_time = 0.0
+        self._finish_tags: dict[Hashable, float] = {}
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def _tag(self, tenant: Hashable, weight: float) -> float:
+        """Returns the start tag of a new item, and charges the tenant for it."""
+        start = max(self._virtual_time, self._finish_tags.get(tenant, 0.0))
+        self._finish_tags[tenant] = start + 1 / weight
+        return start
+
+    def serve(self, tenant: Hashable, weight: float = 1.0) -> None:
+        """Charges the tenant for an item served without queueing."""
+        self._virtual_time = self._tag(tenant, weight)
+
+    def push(self, item: Any, tenant: Hashable, weight: float = 1.0) -> None:
+        heapq.heappush(self._heap,
+                       (self._tag(tenant, weight), next(self._arrivals), tenant, item))
+
+    def pop(self) -> Any:
+        """Removes and returns the item with the lowest start tag."""
+        start, _, _, item = heapq.heappop(self._heap)
+        self._virtual_time = start
+        return item
+
+    def remove(self, item: Any) -> None:
+        self._heap = [entry for entry in self._heap if entry[3] is not item]
+        heapq.heapify(self._heap)
+
+    def forget_usage(self) -> None:
+        """
+        Forgets how much each tenant has been served. Called when nothing is queued,
+        since past usage then no longer needs to be evened out.
+        """
+        self._finish_tags.clear()
+
+    def count_by_tenant(self) -> dict[Hashable, int]:
+        counts: dict[Hashable, int] = {}
+        for _, _, tenant, _ in self._heap:
+            counts[tenant] = counts.get(tenant, 0) + 1
+        return counts
+
+
+class AdmissionController:
+    """
+    Caps how many tool calls run at once across every library, thread and event loop
+    in the process. Calls over the cap wait in a bounded queue and are shed with a
+    `ToolOverloadedError` when the queue is full or they have waited `max_wait`
+    seconds.
+
+    With a `tenant_key`, waiting calls are handed slots by start-time fair queueing.
+    Each call is tagged with how much its tenant has been served, counting a call as
+    one over the tenant's weight, and the lowest tag goes next. Tenants get slots in
+    proportion to their weights however many calls each has queued, and each tenant's
+    calls run in the order they arrived. Slots are never held back, so a lone tenant
+    can use all of them.
+    """
+
+    def __init__(self, max_concurrency: int, max_queue: int | None = None,
+                 max_wait: float | None = None, tenant_key: str | None = None,
+                 tenant_weights: dict[Hashable, float] | None = None):
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be at least 1")
+        if max_queue is not None and max_queue < 0:
+            raise ValueError("max_queue can't be negative")
+        if max_wait is not None and max_wait < 0:
+            raise ValueError("max_wait can't be negative")
+        if tenant_weights and min(tenant_weights.values()) <= 0:
+            raise ValueError("Tenant weights must be positive")
+
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.tenant_key = tenant_key
+        self.tenant_weights = dict(tenant_weights or {})
+        self._lock = threading.Lock()
+        self._active = 0
+        self._waiters = _FairQueue()
+        self._peak_queued = 0
+        self._admitted = 0
+        self._shed = 0
+        self._total_wait_time = 0.0
+        self._max_wait_time = 0.0
+
+    def get_tenant(self, hardset_parameters: dict[str, Any]) -> Hashable:
+        """Returns the tenant a call is scheduled as, from its hard-set parameters."""
+        if self.tenant_key is None:
+            return None
+        return hardset_parameters.get(self.tenant_key)
+
+    def _admit_or_queue(self, tool_name: str, tenant: Hashable,
+                        waiter: _Waiter) -> bool:
+        """
+        Admits the call if there is room, or queues the waiter and returns False.
+        Raises a `ToolOverloadedError` if the queue is full.
+        """
+        with self._lock:
+            weight = self.tenant_weights.get(tenant, 1.0)
+            if self._active < self.max_concurrency and not self._waiters:
+                self._waiters.serve(tenant, weight)
+                self._active += 1
+                self._admitted += 1
+                return True
+            if self.max_queue is not None and len(self._waiters) >= self.max_queue:
+                self._shed += 1
+                raise ToolOverloadedError(tool_name)
+            self._waiters.push(waiter, tenant, weight)
+            self._peak_queued = max(self._peak_queued, len(self._waiters))
+            return False
+
+    def _get_wait(self, timeout: float | None) -> float | None:
+        if self.max_wait is None:
+            return timeout
+        if timeout is None:
+            return self.max_wait
+        return min(timeout, self.max_wait)
+
+    def _record_wait(self, start: float) -> None:
+        waited = time.monotonic() - start
+        with self._lock:
+            self._admitted += 1
+            self._total_wait_time += waited
+            self._max_wait_time = max(self._max_wait_time, waited)
+
+    def _abandon(self, waiter: _Waiter) -> bool:
+        """Stops waiting, returning whether the waiter was given a slot anyway."""
+        with self._lock:
+            if waiter.granted:
+                return True
+            self._waiters.remove(waiter)
+            return False
+
+    def _give_up(self, tool_name: str, timeout: float | None) -> Exception:
+        """Returns the error for a call that waited as long as it could."""
+        if timeout is not None and (self.max_wait is None or timeout < self.max_wait):
+            return ToolQueueTimeoutError(tool_name, timeout)
+        with self._lock:
+            self._shed += 1
+        return ToolOverloadedError(tool_name)
+
+    def acquire(self, tool_name: str, timeout: float | None = None,
+                tenant: Hashable = None) -> None:
+        """
+        Waits for a slot, raising a `ToolOverloadedError` if the call is shed or a
+        `ToolQueueTimeoutError` if it runs out of `timeout` first.
+        """
+        waiter = _Waiter(event=threading.Event())
+        if self._admit_or_queue(tool_name, tenant, waiter):
+            return
+
+        start = time.monotonic()
+        if waiter.event.wait(self._get_wait(timeout)) or self._abandon(waiter):
+            self._record_wait(start)
+            return
+        raise self._give_up(tool_name, timeout)
+
+    async def acquire_async(self, tool_name: str, timeout: float | None = None,
+                            tenant: Hashable = None) -> None:
+        """Async version of `acquire`, which waits without blocking the event loop."""
+        waiter = _Waiter(loop=asyncio.get_running_loop())
+        if self._admit_or_queue(tool_name, tenant, waiter):
+            return
+
+        start = time.monotonic()
+        try:
+            async with asyncio.timeout(self._get_wait(timeout)):
+                await waiter.future
+        except TimeoutError:
+            if not self._abandon(waiter):
+                raise self._give_up(tool_name, timeout) from None
+        except asyncio.CancelledError:
+            if self._abandon(waiter):
+                self.release()
+            raise
+        self._record_wait(start)
+
+    def release(self) -> None:
+        """Frees a slot, handing it to the waiting call with the earliest start tag."""
+        with self._lock:
+            while self._waiters:
+                if self._waiters.pop().grant():
+                    return
+            self._active -= 1
+            self._waiters.forget_usage()
+
+    def stats(self) -> AdmissionStats:
+        with self._lock:
+            return AdmissionStats(active=self._active, queued=len(self._waiters),
+                                  peak_queued=self._peak_queued,
+                                  admitted=self._admitted, shed=self._shed,
+                                  total_wait_time=self._total_wait_time,
+                                  max_wait_time=self._max_wait_time,
+                                  queued_by_tenant=self._count_queued_by_tenant())
+
+    def _count_queued_by_tenant(self) -> dict[Hashable, int]:
+        if self.tenant_key is None:
+            return {}
+        return self._waiters.count_by_tenant()
@@ -0,0 +1,59 @@
+"""
+Support for tools with a vectorized batch implementation, which the batch tool calls
+once with every invocation of the tool instead of calling the tool once per invocation.
+"""
+
+from collections.abc import Callable
+import inspect
+from typing import Any
+
+_REQUIRED = inspect.Parameter.empty
+
+
+def get_column_parameters(function: Callable[..., Any],
+                          injected_parameters: tuple[str, ...]
+                          ) -> tuple[tuple[str, Any], ...]:
+    """
+    Returns the name and default of each parameter the LLM fills in, which become the
+    column lists passed to the batch function.
+    """
+    return tuple(
+        (name, parameter.default)
+        for name, parameter in inspect.signature(function).parameters.items()
+        if name not in injected_parameters
+        and parameter.kind not in (inspect.Parameter.VAR_POSITIONAL,
+                                   inspect.Parameter.VAR_KEYWORD)
+    )
+
+
+def build_columns(tool_name: str,
+                  column_parameters: tuple[tuple[str, Any], ...],
+                  llm_parameter_list: list[dict[str, Any]]
+                  ) -> tuple[dict[str, list[Any]], list[int], dict[int, Exception]]:
+    """
+    Turns a list of argument dictionaries into one list per parameter, filling in
+    defaults for missing optional arguments.
+
+    Returns:
+        The columns, the positions of the items in them, and an error for each item
+        that couldn't be added, such as one missing a required argument.
+    """
+    columns: dict[str, list[Any]] = {name: [] for name, _ in column_parameters}
+    positions: list[int] = []
+    errors: dict[int, Exception] = {}
+
+    for position, llm_parameters in enumerate(llm_parameter_list):
+        unexpected = set(llm_parameters) - columns.keys()
+        missing = [name for name, default in column_parameters
+                   if default is _REQUIRED and name not in llm_parameters]
+        if unexpected or missing:
+            problem = f"unexpected argument '{sorted(unexpected)[0]}'" if unexpected \
+                else f"missing required argument '{missing[0]}'"
+            errors[position] = TypeError(f"{tool_name}() got {problem}")
+            continue
+
+        for name, default in column_parameters:
+            columns[name].append(llm_parameters.get(name, default))
+        positions.append(position)
+
+    return columns, positions, errors
@@ -4,17 +4,448 @@ https://github.com/anthropics/anthropic-cookbook/blob/main/tool_use/parallel_too
 for more information.
 """
 
-from typing import TYPE_CHECKING, Any
+import asyncio
+from collections.abc import AsyncIterator, Awaitable, Callable, Iterator
+from contextlib import contextmanager
+import contextvars
+from dataclasses import dataclass, field
+from functools import partial
+import queue
+import threading
+import time
+from typing import TYPE_CHECKING, Any, NamedTuple
 
-from .pytoolsmith_config.batch_runner import get_batch_runner
+from .admission import AdmissionController
+from .caching import make_cache_key
+from .hooks import get_current_call
+from .limits import Limiter
+from .pytoolsmith_config.admission_control import get_admission_controller
+from .pytoolsmith_config.batch_runner import (
+    BATCH_TENANT,
+    DEFAULT_ASYNC_BATCH_RUNNER,
+    DEFAULT_BATCH_RUNNER,
+    get_async_batch_runner,
+    get_batch_runner,
+)
 from .pytoolsmith_config.serialization import serialize_batch_tool_args
-from .tool_definition import ToolDefinition
+from .tool_definition import ToolDefinition, _AsyncCall, _Call
 from .tool_parameters import ToolParameters
 
 if TYPE_CHECKING:
     from .tool_library import ToolLibrary
 
 
+_CANCELLED_REASON = "Cancelled: an earlier call in the batch failed."
+
+
+class _BatchControl:
+    """
+    Tracks the deadline and fail-fast state shared by the invocations of a batch. In 
+    fail-fast mode, the first failure cancels the async invocations still running. 
+    Threads can't be stopped, so sync invocations that have started run to the end.
+    """
+
+    def __init__(self, tool_library: "ToolLibrary"):
+        self.deadline = None if tool_library._batch_deadline is None \
+            else time.monotonic() + tool_library._batch_deadline
+        self.fail_fast = tool_library._batch_fail_fast
+        self._failed = threading.Event()
+        # The tasks of running async invocations, which are only touched on the
+        # event loop's thread, and the ones a failure cancelled.
+        self._tasks: set[asyncio.Task] = set()
+        self._cancelled: set[asyncio.Task] = set()
+
+    def skip_reason(self) -> str | None:
+        """Why an invocation that is about to start should be skipped, if it should."""
+        if self.fail_fast and self._failed.is_set():
+            return "Skipped: an earlier call in the batch failed."
+        if self.deadline is not None and time.monotonic() >= self.deadline:
+            return "Skipped: the batch deadline passed before this call started."
+        return None
+
+    def record_failure(self) -> None:
+        self._failed.set()
+        if self._tasks:
+            tasks, self._tasks = self._tasks, set()
+            for task in tasks:
+                if task is not asyncio.current_task():
+                    task.cancel()
+                    self._cancelled.add(task)
+
+    @contextmanager
+    def cancellable(self) -> Iterator[None]:
+        """Lets a failure cancel the async invocation that runs inside the block."""
+        task = asyncio.current_task() if self.fail_fast else None
+        if task is None:
+            yield
+            return
+        self._tasks.add(task)
+        try:
+            yield
+        finally:
+            self._tasks.discard(task)
+
+    def cancelled_by_failure(self) -> bool:
+        """
+        Whether the `CancelledError` the current task is handling came from a failure
+        in the batch alone, rather than the batch itself being cancelled.
+        """
+        task = asyncio.current_task()
+        return task in self._cancelled and task.uncancel() == 0
+
+
+@dataclass
+class PlannedInvocation:
+    """One invocation of a `BatchPlan`, with its arguments parsed and its tool found."""
+
+    index: int
+
+    tool: ToolDefinition
+
+    llm_parameters: dict[str, Any]
+
+    source: int
+    """The index of the invocation whose result this one uses, itself if it's unique."""
+
+
+@dataclass
+class BatchPlan:
+    """
+    A batch compiled once, up front: every invocation's arguments parsed, its tool 
+    found, duplicates matched and groups for `batch_function`s formed. Running the 
+    batch and formatting its user message both use the plan.
+    """
+
+    invocations: list[PlannedInvocation]
+
+    units: list[tuple[list[int], bool]]
+    """
+    The indices of the invocations each function given to the batch runner runs, and 
+    whether they run as a group with the tool's `batch_function`.
+    """
+
+    duplicates: dict[int, list[int]]
+    """The indices of the invocations that use each invocation's result."""
+
+    def format_message(self, hardset_parameters: dict[str, Any]) -> str | None:
+        """Joins the user messages of every invocation in the batch."""
+        msgs = []
+        for invocation in self.invocations:
+            msg = invocation.tool.format_message_for_call(
+                llm_parameters=invocation.llm_parameters,
+                hardset_parameters=hardset_parameters
+            )
+            if msg:
+                msgs.append(msg)
+
+        return "\n".join(msgs) if msgs else None
+
+
+def compile_batch_plan(tool_library: "ToolLibrary",
+                       invocations: list[dict[str, Any]]) -> BatchPlan:
+    """
+    Builds the plan for a batch, raising a `ValueError` listing every invocation with 
+    an unknown tool or arguments that can't be parsed, before anything runs.
+
+    Identical invocations of tools that allow `batch_dedupe` only run once. Tools that 
+    don't allow it, or that invalidate cache tags, may have side effects, so 
+    invocations after them are never merged or grouped with ones before them.
+    """
+    planned: list[PlannedInvocation] = []
+    problems: list[str] = []
+    units: list[tuple[list[int], bool]] = []
+    duplicates: dict[int, list[int]] = {}
+    seen: dict[tuple[str, str], int] = {}
+    groups: dict[str, list[int]] = {}
+
+    for idx, invocation in enumerate(invocations):
+        tool_name = invocation.get("name")
+        try:
+            tool = tool_library.get_tool_from_name(tool_name)
+            llm_parameters = serialize_batch_tool_args(
+                invocation.get("arguments", "{}"))
+        except Exception as e:
+            problems.append(f"#{idx} ({tool_name}): {e}")
+            continue
+
+        source = idx
+        dedupe = tool.batch_dedupe and not tool.invalidates
+        if dedupe:
+            key = (tool_name, make_cache_key(llm_parameters, {}, ()))
+            source = seen.setdefault(key, idx)
+        else:
+            seen.clear()
+        planned.append(PlannedInvocation(idx, tool, llm_parameters, source))
+
+        if source != idx:
+            duplicates.setdefault(source, []).append(idx)
+        elif tool.batch_function is None:
+            units.append(([idx], False))
+        elif tool_name in groups:
+            groups[tool_name].append(idx)
+        else:
+            groups[tool_name] = [idx]
+            units.append((groups[tool_name], True))
+
+        if not dedupe:
+            groups.clear()
+
+    if problems:
+        raise ValueError(f"Invalid batch: {'; '.join(problems)}")
+
+    return BatchPlan(invocations=planned, units=units, duplicates=duplicates)
+
+
+class BatchResult(NamedTuple):
+    """The result of one invocation in a batch, see `ToolLibrary.run_batch`."""
+
+    index: int
+    """The position of the invocation in the batch."""
+
+    tool_name: str
+
+    result: Any
+    """What the tool returned, or the error message if it errored."""
+
+    errored: bool
+
+    elapsed: float
+    """Seconds the invocation took to run."""
+
+    def format(self) -> str:
+        """Formats the result the way the batch tool shows it to the LLM."""
+        return (
+            f"#{self.index} ({self.tool_name}) Result"
+            f"{' (note: errored)' if self.errored else ''}: {self.result}"
+        )
+
+
+def format_batch_results(results: list[BatchResult]) -> str:
+    """Joins the results of a batch into the string the batch tool returns."""
+    return '\n'.join(result.format() for result in results)
+
+
+def _order_units(plan: BatchPlan) -> list[tuple[list[int], bool]]:
+    """
+    Orders a plan's units longest expected latency first, so a bounded runner starts 
+    the slow invocations straight away and fills the gaps with the quick ones. Units 
+    of tools that haven't completed a call yet keep their place at the front, and 
+    ties keep the order of the invocations. The default runners, sequential and 
+    unbounded async, take as long in any order, so they keep the invocations' order, 
+    and tools only track their latency while another runner is set.
+    """
+    def expected_latency(unit: tuple[list[int], bool]) -> float:
+        latency = plan.invocations[unit[0][0]].tool.get_expected_latency()
+        return float("inf") if latency is None else latency
+
+    return sorted(plan.units, key=expected_latency, reverse=True)
+
+
+class _Batch:
+    """
+    One run of a batch plan. It builds the functions given to the batch runner, and 
+    reports each invocation's result as soon as it is ready.
+    """
+
+    def __init__(self, tool_library: "ToolLibrary",
+                 hardset_parameters: dict[str, Any],
+                 plan: BatchPlan,
+                 on_result: Callable[[BatchResult], None] | None = None,
+                 longest_first: bool = True):
+        self.hardset_parameters = hardset_parameters
+        self.plan = plan
+        self.control = _BatchControl(tool_library)
+        self.results: dict[int, BatchResult] = {}
+        self._on_result = on_result
+        self._units = _order_units(plan) if longest_first else plan.units
+
+    def _report(self, idx: int, result: Any, did_error: bool, elapsed: float) -> None:
+        """Records the result of an invocation and of each of its duplicates."""
+        if did_error:
+            self.control.record_failure()
+        tool_name = self.plan.invocations[idx].tool.name
+        for i in (idx, *self.plan.duplicates.get(idx, ())):
+            batch_result = BatchResult(i, tool_name, result, did_error, elapsed)
+            self.results[i] = batch_result
+            if self._on_result is not None:
+                self._on_result(batch_result)
+
+    def _report_group(self, indices: list[int], results: list[Any],
+                      elapsed: float) -> None:
+        """Reports the results of a group run with `ToolDefinition._execute_many`."""
+        for idx, result in zip(indices, results):
+            if isinstance(result, Exception):
+                self._report(idx, str(result), True, elapsed)
+            else:
+                self._report(idx, result, False, elapsed)
+
+    def _skip(self, indices: list[int]) -> bool:
+        """Reports the invocations as skipped if the batch says they should be."""
+        skip_reason = self.control.skip_reason()
+        if skip_reason is None:
+            return False
+        for idx in indices:
+            self._report(idx, skip_reason, True, 0.0)
+        return True
+
+    def _format(self, indices: list[int]) -> str:
+        return '\n'.join(self.results[idx].format() for idx in indices)
+
+    def _run_invocation(self, idx: int) -> str:
+        start = time.perf_counter()
+        if not self._skip([idx]):
+            invocation = self.plan.invocations[idx]
+            did_error = False
+            try:
+                result = invocation.tool._execute(
+                    invocation.llm_parameters, self.hardset_parameters,
+                    deadline=self.control.deadline)
+            except Exception as e:
+                did_error = True
+                result = str(e)
+            self._report(idx, result, did_error, time.perf_counter() - start)
+        return self._format([idx])
+
+    async def _run_invocation_async(self, idx: int) -> str:
+        start = time.perf_counter()
+        if not self._skip([idx]):
+            invocation = self.plan.invocations[idx]
+            did_error = False
+            try:
+                with self.control.cancellable():
+                    result = await invocation.tool._execute_async(
+                        invocation.llm_parameters, self.hardset_parameters,
+                        deadline=self.control.deadline)
+            except asyncio.CancelledError:
+                if not self.control.cancelled_by_failure():
+                    raise
+                did_error = True
+                result = _CANCELLED_REASON
+            except Exception as e:
+                did_error = True
+                result = str(e)
+            self._report(idx, result, did_error, time.perf_counter() - start)
+        return self._format([idx])
+
+    def _run_group(self, indices: list[int]) -> str:
+        start = time.perf_counter()
+        if not self._skip(indices):
+            results = self.plan.invocations[indices[0]].tool._execute_many(
+                [self.plan.invocations[i].llm_parameters for i in indices],
+                self.hardset_parameters, deadline=self.control.deadline)
+            self._report_group(indices, results, time.perf_counter() - start)
+        return self._format(indices)
+
+    async def _run_group_async(self, indices: list[int]) -> str:
+        start = time.perf_counter()
+        if not self._skip(indices):
+            tool = self.plan.invocations[indices[0]].tool
+            try:
+                with self.control.cancellable():
+                    results = await tool._execute_many_async(
+                        [self.plan.invocations[i].llm_parameters for i in indices],
+                        self.hardset_parameters, deadline=self.control.deadline)
+            except asyncio.CancelledError:
+                if not self.control.cancelled_by_failure():
+                    raise
+                for idx in indices:
+                    self._report(idx, _CANCELLED_REASON, True,
+                                 time.perf_counter() - start)
+            else:
+                self._report_group(indices, results, time.perf_counter() - start)
+        return self._format(indices)
+
+    def make_funcs(self) -> list[Callable[[], str]]:
+        """
+        Builds the functions for the batch runner, one per invocation or group, 
+        slowest first unless the batch keeps the order of the invocations. Inside a 
+        hooked call, each function runs in a copy of the caller's context, so 
+        invocations run by a thread pool know the call they are part of.
+        """
+        funcs = [partial(self._run_group, indices) if is_group
+                 else partial(self._run_invocation, indices[0])
+                 for indices, is_group in self._units]
+        if get_current_call() is None:
+            return funcs
+        return [partial(contextvars.copy_context().run, func) for func in funcs]
+
+    def make_async_funcs(self) -> list[Callable[[], Awaitable[str]]]:
+        """Async version of `make_funcs`, for the async batch runner."""
+        return [partial(self._run_group_async, indices) if is_group
+                else partial(self._run_invocation_async, indices[0])
+                for indices, is_group in self._units]
+
+    def finish(self, unit_results: list[Any]) -> list[BatchResult]:
+        """
+        Reports the invocations whose function didn't report a result, such as one
+        that raised, whose exception batch runners like `ThreadPoolBatchRunner` return
+        in place of its result.
+        """
+        reported = []
+        for (indices, _), unit_result in zip(self._units, unit_results):
+            if indices[0] in self.results:
+                continue
+            for idx in indices:
+                self._report(idx, str(unit_result), True, 0.0)
+                reported.extend(self.results[i]
+                                for i in (idx, *self.plan.duplicates.get(idx, ())))
+        return reported
+
+    def ordered_results(self) -> list[BatchResult]:
+        """Every invocation's result, in the order of the invocations."""
+        return [self.results[idx] for idx in range(len(self.plan.invocations))]
+
+
+def _get_plan(tool_library: "ToolLibrary",
+              invocations: list[dict[str, Any]] | BatchPlan) -> BatchPlan:
+    if isinstance(invocations, BatchPlan):
+        return invocations
+    return compile_batch_plan(tool_library, invocations)
+
+
+@contextmanager
+def _for_tenant(hardset_parameters: dict[str, Any]) -> Iterator[None]:
+    """Tells the batch runner which tenant the batch is for."""
+    controller = get_admission_controller()
+    token = BATCH_TENANT.set(
+        None if controller is None else controller.get_tenant(hardset_parameters))
+    try:
+        yield
+    finally:
+        BATCH_TENANT.reset(token)
+
+
+def run_batch(tool_library: "ToolLibrary",
+              hardset_parameters: dict[str, Any],
+              invocations: list[dict[str, Any]] | BatchPlan) -> list[BatchResult]:
+    """Runs a batch with the batch runner, returning every result in order."""
+    # To allow a user to set their own (potentially async/parallel) batch runner, 
+    # we will create functions that will be passed in to the batch runner.
+    runner = get_batch_runner()
+    batch = _Batch(tool_library, hardset_parameters,
+                   _get_plan(tool_library, invocations),
+                   longest_first=runner is not DEFAULT_BATCH_RUNNER)
+    with _for_tenant(hardset_parameters):
+        batch.finish(runner(batch.make_funcs()))
+    return batch.ordered_results()
+
+
+async def run_batch_async(tool_library: "ToolLibrary",
+                          hardset_parameters: dict[str, Any],
+                          invocations: list[dict[str, Any]] | BatchPlan
+                          ) -> list[BatchResult]:
+    """
+    Async version of `run_batch`. Invocations run through the async batch runner, 
+    with async tools awaited natively and sync tools sent to the async executor.
+    """
+    runner = get_async_batch_runner()
+    batch = _Batch(tool_library, hardset_parameters,
+                   _get_plan(tool_library, invocations),
+                   longest_first=runner is not DEFAULT_ASYNC_BATCH_RUNNER)
+    batch.finish(await runner(batch.make_async_funcs()))
+    return batch.ordered_results()
+
+
 def batch_tool(tool_library: "ToolLibrary",
                hardset_parameters: dict[str, Any],
                invocations: list[dict[str, Any]]) -> str:
@@ -29,48 +460,171 @@ def batch_tool(tool_library: "ToolLibrary",
     Returns:
         String containing all the results, separated by newlines
     """
-    batch_runner = get_batch_runner()
+    return format_batch_results(
+        run_batch(tool_library, hardset_parameters, invocations))
 
-    # To allow a user to set their own (potentially async/parallel) batch runner, 
-    # we will create functions that will be passed in to the batch runner.
-    funcs_to_call = []
 
-    for i, invocation in enumerate(invocations):
-        # Create a factory function that returns the actual function with proper closure
-        def invocation_func_factory(idx, inv):
-            def func():
-                tool_name = inv.get("name")
-                llm_parameters = serialize_batch_tool_args(
-                    inv.get("arguments", "{}"))
+async def batch_tool_async(tool_library: "ToolLibrary",
+                           hardset_parameters: dict[str, Any],
+                           invocations: list[dict[str, Any]]) -> str:
+    """
+    Async version of `batch_tool`.
 
-                tool = tool_library.get_tool_from_name(tool_name)
+    Returns:
+        String containing all the results, separated by newlines, in the same format 
+        as `batch_tool`.
+    """
+    return format_batch_results(
+        await run_batch_async(tool_library, hardset_parameters, invocations))
 
-                did_error = False
-                try:
-                    result = tool.call_tool(
-                        llm_parameters=llm_parameters,
-                        hardset_parameters=hardset_parameters
-                    )
-                except Exception as e:
-                    did_error = True
-                    result = str(e)
 
-                return (
-                    f"#{idx} ({tool_name}) Result"
-                    f"{' (note: errored)' if did_error else ''}: {result}"
-                )
+_RUNNER_DONE = object()
 
-            return func
 
-        # Create a new function with the current values of i and invocation
-        funcs_to_call.append(invocation_func_factory(i, invocation))
+def iter_batch(tool_library: "ToolLibrary",
+               hardset_parameters: dict[str, Any],
+               invocations: list[dict[str, Any]] | BatchPlan) -> Iterator[BatchResult]:
+    """
+    Runs a batch like `run_batch`, yielding each invocation's result as soon as it 
+    is ready. The batch runner runs in a background thread, so results arrive in the 
+    order the runner finishes them.
+    """
+    events: queue.SimpleQueue = queue.SimpleQueue()
+    runner = get_batch_runner()
+    batch = _Batch(tool_library, hardset_parameters,
+                   _get_plan(tool_library, invocations), events.put,
+                   longest_first=runner is not DEFAULT_BATCH_RUNNER)
+    funcs = batch.make_funcs()
+    outcome: dict[str, Any] = {}
+
+    def run() -> None:
+        try:
+            with _for_tenant(hardset_parameters):
+                outcome["unit_results"] = runner(funcs)
+        except BaseException as e:
+            outcome["error"] = e
+        finally:
+            events.put(_RUNNER_DONE)
+
+    threading.Thread(target=contextvars.copy_context().run, args=(run,),
+                     name="pytoolsmith-batch-stream", daemon=True).start()
 
-    return '\n'.join(batch_runner(funcs_to_call))
+    while (event := events.get()) is not _RUNNER_DONE:
+        yield event
+
+    if "error" in outcome:
+        raise outcome["error"]
+    yield from batch.finish(outcome["unit_results"])
+
+
+async def iter_batch_async(tool_library: "ToolLibrary",
+                           hardset_parameters: dict[str, Any],
+                           invocations: list[dict[str, Any]] | BatchPlan
+                           ) -> AsyncIterator[BatchResult]:
+    """
+    Async version of `iter_batch`, which runs the batch with the async batch runner. 
+    Closing the iterator early cancels the invocations that are still running.
+    """
+    events: asyncio.Queue = asyncio.Queue()
+    async_runner = get_async_batch_runner()
+    batch = _Batch(tool_library, hardset_parameters,
+                   _get_plan(tool_library, invocations), events.put_nowait,
+                   longest_first=async_runner is not DEFAULT_ASYNC_BATCH_RUNNER)
+    runner = asyncio.ensure_future(async_runner(batch.make_async_funcs()))
+    runner.add_done_callback(lambda _: events.put_nowait(_RUNNER_DONE))
+
+    try:
+        while (event := await events.get()) is not _RUNNER_DONE:
+            yield event
+
+        for batch_result in batch.finish(runner.result()):
+            yield batch_result
+    finally:
+        runner.cancel()
+
+
+@dataclass
+class BatchToolDefinition(ToolDefinition):
+    """
+    The batch tool. Rather than hard-set parameters, it is given its library and passes
+    the caller's hard-set parameters through to each invocation.
+    """
 
+    function: Callable[..., str] = batch_tool
 
-batch_tool_definition = ToolDefinition(function=batch_tool,
-                                       injected_parameters=["tool_library",
-                                                            "hardset_parameters"])
+    injected_parameters: list[str] = field(
+        default_factory=lambda: ["tool_library", "hardset_parameters"])
+
+    def _compile_invoker(self) -> Callable[[dict[str, Any], dict[str, Any]], Any]:
+        def invoke(llm_parameters: dict[str, Any],
+                   hardset_parameters: dict[str, Any]) -> str:
+            return format_batch_results(run_batch(
+                self._tool_library, hardset_parameters, llm_parameters["invocations"]))
+
+        return invoke
+
+    def _compile_async_invoker(
+            self
+    ) -> Callable[[dict[str, Any], dict[str, Any]], Awaitable[str]]:
+        async def invoke_async(llm_parameters: dict[str, Any],
+                               hardset_parameters: dict[str, Any]) -> str:
+            return format_batch_results(await run_batch_async(
+                self._tool_library, hardset_parameters, llm_parameters["invocations"]))
+
+        return invoke_async
+
+    def _compile_limited(self, call: _Call, limiters: tuple[Limiter, ...],
+                         controller: AdmissionController | None) -> _Call:
+        """
+        Runs the batch without taking limit or admission slots. Each invocation takes 
+        its own, so a batch holding one while it waits for its invocations' would 
+        deadlock once batches held every slot.
+        """
+        return call
+
+    def _compile_limited_async(self, call: _AsyncCall, limiters: tuple[Limiter, ...],
+                               controller: AdmissionController | None
+                               ) -> _AsyncCall:
+        """Async version of `_compile_limited`."""
+        return call
+
+    def call_tool(self, llm_parameters: dict[str, Any],
+                  hardset_parameters: dict[str, Any],
+                  include_message: bool = False) -> Any | tuple[Any, str | None]:
+        """
+        Calls the batch tool, compiling the batch's plan once so running it and 
+        formatting its user message share the parsed arguments.
+        """
+        return super().call_tool(self._with_plan(llm_parameters), hardset_parameters,
+                                 include_message)
+
+    async def call_tool_async(
+            self, llm_parameters: dict[str, Any],
+            hardset_parameters: dict[str, Any],
+            include_message: bool = False
+    ) -> Any | tuple[Any, str | None]:
+        return await super().call_tool_async(self._with_plan(llm_parameters),
+                                             hardset_parameters, include_message)
+
+    def _with_plan(self, llm_parameters: dict[str, Any]) -> dict[str, Any]:
+        return {**llm_parameters, "invocations": _get_plan(
+            self._tool_library, llm_parameters["invocations"])}
+
+    def format_message_for_call(self, llm_parameters: dict[str, Any],
+                                hardset_parameters: dict[str, Any]) -> str | None:
+        """Joins the user messages of every invocation in the batch."""
+        return _get_plan(self._tool_library, llm_parameters["invocations"]) \
+            .format_message(hardset_parameters)
+
+
+def create_batch_tool_definition(tool_library: "ToolLibrary") -> BatchToolDefinition:
+    """
+    Creates the batch tool for a library. Each library gets its own instance so
+    concurrent batches never see another library's tools.
+    """
+    definition = BatchToolDefinition()
+    definition.set_tool_library(tool_library)
+    return definition
 
 batch_tool_parameters = ToolParameters(
     name="batch_tool",
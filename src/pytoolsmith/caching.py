@@ -0,0 +1,282 @@
+"""In-memory caching of tool results."""
+
+from collections import OrderedDict
+import copy
+from dataclasses import dataclass, field
+import json
+import re
+import string
+import threading
+import time
+from typing import Any
+import weakref
+
+
+@dataclass(frozen=True)
+class CachePolicy:
+    """
+    Describes how a tool's results are cached. Only use this for read-only tools,
+    since a cached call doesn't run the tool.
+    """
+
+    ttl: float | None = None
+    """Seconds a result stays cached. `None` keeps it until it is evicted."""
+
+    max_entries: int = 1024
+    """The most results to keep. The least recently used result is evicted first."""
+
+    key_params: list[str] = field(default_factory=list)
+    """
+    Hard-set parameters to include in the cache key, such as a tenant ID. The LLM's
+    arguments are always part of the key.
+    """
+
+    copy_results: bool = True
+    """
+    Whether to cache and return deep copies of results that aren't strings, bytes or
+    numbers, so a caller that changes its result doesn't change what later calls get.
+    Results that can't be copied aren't cached. Turn this off to cache them, or to
+    skip the copying for results that are never changed.
+    """
+
+
+@dataclass(frozen=True)
+class CacheStats:
+    """A snapshot of a result cache's counters."""
+
+    hits: int
+    misses: int
+    evictions: int
+    size: int
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+def make_cache_key(llm_parameters: dict[str, Any],
+                   hardset_parameters: dict[str, Any],
+                   key_params: tuple[str, ...]) -> str:
+    """
+    Builds a canonical key for a call, so the same arguments in a different order or
+    spacing share an entry.
+    """
+    return json.dumps(
+        [llm_parameters, [hardset_parameters.get(name) for name in key_params]],
+        sort_keys=True, separators=(",", ":"), default=str
+    )
+
+
+CACHE_MISS = object()
+"""Returned by `ResultCache.get` when there is no fresh result."""
+
+_IMMUTABLE_TYPES = frozenset({str, bytes, int, float, bool, complex, type(None)})
+
+_INVALIDATIONS_KEPT = 4096
+"""How many recently invalidated tags `TagIndex` remembers the generation of."""
+
+
+class ResultCache:
+    """
+    A thread-safe LRU cache whose entries expire after a TTL. Entries can be tagged so
+    they can be invalidated with `invalidate_cache_tags`.
+    """
+
+    def __init__(self, policy: CachePolicy):
+        if policy.max_entries < 1:
+            raise ValueError("max_entries must be at least 1")
+        self.policy = policy
+        self.key_params = tuple(policy.key_params)
+        self._entries: OrderedDict[str, tuple[float | None, Any, tuple[str, ...]]] = \
+            OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def _copy(self, value: Any) -> Any:
+        if not self.policy.copy_results or type(value) in _IMMUTABLE_TYPES:
+            return value
+        return copy.deepcopy(value)
+
+    def get(self, key: str) -> Any:
+        """
+        Returns the cached result, or `CACHE_MISS` if there isn't a fresh one. Unless
+        the policy turns off `copy_results`, each call gets its own copy.
+        """
+        value = CACHE_MISS
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, cached, _ = entry
+                if expires_at is None or expires_at > time.monotonic():
+                    self._entries.move_to_end(key)
+                    value = cached
+                else:
+                    del self._entries[key]
+            if value is CACHE_MISS:
+                self._misses += 1
+            else:
+                self._hits += 1
+        # Copying outside the lock keeps large results from holding up other calls.
+        return value if value is CACHE_MISS else self._copy(value)
+
+    def set(self, key: str, value: Any, tags: tuple[str, ...] = (),
+            generation: int | None = None) -> None:
+        """
+        Caches a result. A result that can't be copied isn't cached, since the call
+        that returned it has already succeeded.
+
+        Args:
+            key: The key from `make_cache_key`.
+            value: The result to cache.
+            tags: Tags that invalidate the entry.
+            generation: The `TAG_INDEX.generation` from before the result was
+                computed. Tagged results are dropped if any of their tags were
+                invalidated since.
+        """
+        try:
+            value = self._copy(value)
+        except Exception:
+            return
+        if tags:
+            TAG_INDEX.store(self, key, value, tags, generation)
+        else:
+            self._store(key, value, ())
+
+    def _store(self, key: str, value: Any,
+               tags: tuple[str, ...]) -> list[tuple[str, tuple[str, ...]]]:
+        """Stores an entry, returning the keys and tags of any it evicted."""
+        ttl = self.policy.ttl
+        expires_at = None if ttl is None else time.monotonic() + ttl
+        evicted = []
+        with self._lock:
+            self._entries[key] = (expires_at, value, tags)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.policy.max_entries:
+                evicted_key, (_, _, evicted_tags) = self._entries.popitem(last=False)
+                evicted.append((evicted_key, evicted_tags))
+                self._evictions += 1
+        return evicted
+
+    def _delete(self, key: str) -> tuple[str, ...] | None:
+        """Removes an entry, returning its tags, or `None` if it wasn't cached."""
+        with self._lock:
+            entry = self._entries.pop(key, None)
+        return None if entry is None else entry[2]
+
+    def clear(self) -> None:
+        with self._lock:
+            tagged = [(key, tags) for key, (_, _, tags) in self._entries.items()
+                      if tags]
+            self._entries.clear()
+        if tagged:
+            TAG_INDEX.discard(self, tagged)
+
+    def stats(self) -> CacheStats:
+        with self._lock:
+            return CacheStats(hits=self._hits, misses=self._misses,
+                              evictions=self._evictions, size=len(self._entries))
+
+
+class TagIndex:
+    """
+    Tracks which cached entries carry each tag, across every tool's cache. Caches are
+    held weakly so the index doesn't keep discarded tools alive.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries: dict[str, set[tuple[weakref.ref[ResultCache], str]]] = {}
+        self._generation = 0
+        # The generation each recently invalidated tag was last invalidated in, oldest
+        # first, and the newest generation of any tag that has since been forgotten.
+        self._invalidated: OrderedDict[str, int] = OrderedDict()
+        self._forgotten = 0
+
+    @property
+    def generation(self) -> int:
+        """Goes up every time tags are invalidated."""
+        return self._generation
+
+    def store(self, cache: ResultCache, key: str, value: Any, tags: tuple[str, ...],
+              generation: int | None) -> None:
+        with self._lock:
+            # If any of the result's tags were invalidated while it was being computed,
+            # it may already be stale, so it isn't cached. Results from before the
+            # oldest remembered invalidation can't be checked, so aren't cached either.
+            if generation is not None and generation != self._generation and (
+                    generation < self._forgotten
+                    or any(self._invalidated.get(tag, 0) > generation for tag in tags)):
+                return
+
+            evicted = cache._store(key, value, tags)
+            for tag in tags:
+                self._entries.setdefault(tag, set()).add((weakref.ref(cache), key))
+            for evicted_key, evicted_tags in evicted:
+                self._discard_locked(cache, evicted_key, evicted_tags)
+
+    def discard(self, cache: ResultCache,
+                entries: list[tuple[str, tuple[str, ...]]]) -> None:
+        with self._lock:
+            for key, tags in entries:
+                self._discard_locked(cache, key, tags)
+
+    def _discard_locked(self, cache: ResultCache, key: str,
+                        tags: tuple[str, ...]) -> None:
+        for tag in tags:
+            tagged = self._entries.get(tag)
+            if tagged is not None:
+                tagged.discard((weakref.ref(cache), key))
+                if not tagged:
+                    del self._entries[tag]
+
+    def invalidate(self, tags: list[str] | tuple[str, ...]) -> int:
+        """Removes every cached entry with any of the tags, returning how many."""
+        removed = 0
+        with self._lock:
+            self._generation += 1
+            for tag in tags:
+                self._invalidated[tag] = self._generation
+                self._invalidated.move_to_end(tag)
+                for cache_ref, key in self._entries.pop(tag, ()):
+                    cache = cache_ref()
+                    if cache is None:
+                        continue
+                    entry_tags = cache._delete(key)
+                    if entry_tags is not None:
+                        removed += 1
+                        self._discard_locked(cache, key, entry_tags)
+            while len(self._invalidated) > _INVALIDATIONS_KEPT:
+                _, self._forgotten = self._invalidated.popitem(last=False)
+        return removed
+
+
+TAG_INDEX = TagIndex()
+"""The tag index shared by every tool."""
+
+
+def invalidate_cache_tags(tags: list[str]) -> int:
+    """
+    Removes every cached tool result tagged with any of the given tags, such as
+    `["user:123"]`. Returns the number of results removed.
+    """
+    return TAG_INDEX.invalidate(tags)
+
+
+def get_template_fields(template: str) -> set[str]:
+    """
+    Returns the names of the parameters a tag template like `user:{user_id}` uses,
+    leaving out attribute and index lookups like `{user.id}`. Positional fields like
+    `{}` come back as empty or numeric names, which are never parameters.
+    """
+    return {re.match(r"[^.\[]*", field_name).group()
+            for _, field_name, _, _ in string.Formatter().parse(template)
+            if field_name is not None}
+
+
+def resolve_tags(templates: tuple[str, ...],
+                 parameters: dict[str, Any]) -> tuple[str, ...]:
+    """Fills tag templates in with the call's parameters."""
+    return tuple(template.format_map(parameters) for template in templates)
@@ -0,0 +1,169 @@
+"""Circuit breakers, which stop calling a failing tool until its dependency recovers."""
+
+from collections import deque
+from dataclasses import dataclass
+import threading
+import time
+from typing import Literal
+
+from .admission import ToolOverloadedError
+from .execution import ToolQueueTimeoutError
+from .validation import ToolArgumentValidationError
+
+_NEVER_FAILURES = (ToolArgumentValidationError, ToolOverloadedError,
+                   ToolQueueTimeoutError)
+
+CircuitState = Literal["closed", "open", "half_open"]
+
+
+@dataclass(frozen=True)
+class CircuitBreakerPolicy:
+    """
+    Describes when a circuit breaker opens and how it recovers. While it is open, calls
+    fail right away with a `CircuitOpenError` instead of waiting on a dependency that
+    is down.
+    """
+
+    failure_threshold: int = 5
+    """Failures within the window that open the circuit."""
+
+    window: float = 60.0
+    """Seconds that failures are counted over."""
+
+    reset_timeout: float = 30.0
+    """Seconds the circuit stays open before probe calls are let through."""
+
+    half_open_max_calls: int = 1
+    """Probe calls let through at once while half open. One success closes the
+    circuit, and one failure opens it again."""
+
+    failure_types: tuple[type[BaseException], ...] = (Exception,)
+    """
+    The exception types that count as failures. Invalid arguments from the LLM and
+    calls shed by admission control never do, since they say nothing about the
+    dependency.
+    """
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling a tool whose circuit breaker is open."""
+
+    def __init__(self, tool_name: str, retry_in: float):
+        self.tool_name = tool_name
+        self.retry_in = retry_in
+        super().__init__(
+            f"{tool_name} is unavailable after repeated failures, so it wasn't "
+            f"called. Try again in {max(retry_in, 0):.0f} seconds."
+        )
+
+
+class CircuitBreaker:
+    """A thread-safe circuit breaker following a `CircuitBreakerPolicy`."""
+
+    def __init__(self, policy: CircuitBreakerPolicy):
+        if policy.failure_threshold < 1 or policy.half_open_max_calls < 1:
+            raise ValueError("failure_threshold and half_open_max_calls must be at "
+                             "least 1")
+
+        self.policy = policy
+        self._lock = threading.Lock()
+        self._state: CircuitState = "closed"
+        self._failures: deque[float] = deque()
+        self._opened_at = 0.0
+        self._probes = 0
+
+    def _current_state(self, now: float) -> CircuitState:
+        if self._state == "open" and now >= self._opened_at + self.policy.reset_timeout:
+            return "half_open"
+        return self._state
+
+    @property
+    def state(self) -> CircuitState:
+        with self._lock:
+            return self._current_state(time.monotonic())
+
+    def enter(self, tool_name: str) -> bool:
+        """
+        Lets a call through, returning whether it is a probe of a half-open circuit,
+        or raises a `CircuitOpenError`.
+        """
+        with self._lock:
+            now = time.monotonic()
+            state = self._current_state(now)
+            if state == "closed":
+                return False
+            if state == "half_open" and self._probes < self.policy.half_open_max_calls:
+                self._state = "half_open"
+                self._probes += 1
+                return True
+            retry_in = self._opened_at + self.policy.reset_timeout - now
+        raise CircuitOpenError(tool_name, retry_in)
+
+    def exit(self, is_probe: bool, error: BaseException | None) -> None:
+        """Records how a call that was let through ended."""
+        if error is not None and not isinstance(error, Exception):
+            # The call was cancelled, which says nothing about the dependency.
+            self.abandon(is_probe)
+            return
+
+        failed = error is not None and isinstance(error, self.policy.failure_types) \
+            and not isinstance(error, _NEVER_FAILURES)
+
+        with self._lock:
+            now = time.monotonic()
+            if is_probe:
+                self._probes -= 1
+                if failed:
+                    self._open(now)
+                else:
+                    self._state = "closed"
+                    self._failures.clear()
+            elif failed and self._state == "closed":
+                self._failures.append(now)
+                while self._failures[0] <= now - self.policy.window:
+                    self._failures.popleft()
+                if len(self._failures) >= self.policy.failure_threshold:
+                    self._open(now)
+
+    def abandon(self, is_probe: bool) -> None:
+        """Records that a call that was let through never ran to completion."""
+        if is_probe:
+            with self._lock:
+                self._probes -= 1
+
+    def _open(self, now: float) -> None:
+        self._state = "open"
+        self._opened_at = now
+        self._failures.clear()
+
+
+def enter_breakers(tool_name: str,
+                   breakers: tuple[CircuitBreaker, ...]) -> tuple[bool, ...]:
+    """Enters every breaker, returning which calls are probes."""
+    probes = []
+    for breaker in breakers:
+        try:
+            probes.append(breaker.enter(tool_name))
+        except CircuitOpenError as e:
+            exit_breakers(breakers[:len(probes)], tuple(probes), e)
+            raise
+    return tuple(probes)
+
+
+def exit_breakers(breakers: tuple[CircuitBreaker, ...], probes: tuple[bool, ...],
+                  error: BaseException | None) -> None:
+    for breaker, is_probe in zip(breakers, probes):
+        if isinstance(error, CircuitOpenError):
+            # Another breaker stopped the call, so this one learns nothing from it.
+            breaker.abandon(is_probe)
+        else:
+            breaker.exit(is_probe, error)
+
+
+def combine_states(states: list[CircuitState]) -> CircuitState:
+    """Returns the state of a tool guarded by several breakers."""
+    if "open" in states:
+        return "open"
+    if "half_open" in states:
+        return "half_open"
+    return "closed"
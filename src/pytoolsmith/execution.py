@@ -0,0 +1,313 @@
+"""Helpers shared by the sync and async call paths of `ToolDefinition`."""
+
+import asyncio
+from collections.abc import Awaitable, Callable, Iterator
+from concurrent.futures import Executor, Future, TimeoutError as FutureTimeoutError
+from contextlib import contextmanager
+import contextvars
+from contextvars import ContextVar
+import queue
+import threading
+from typing import Any
+
+_IDLE_WORKER_TIMEOUT = 30.0
+"""Seconds a `GrowingExecutor` worker waits for work before it exits."""
+
+
+class ToolTimeoutError(TimeoutError):
+    """Raised when a tool call takes longer than its timeout or the batch deadline."""
+
+    def __init__(self, tool_name: str, timeout: float):
+        self.tool_name = tool_name
+        self.timeout = timeout
+        super().__init__(f"{tool_name} timed out after {max(timeout, 0):.2f} seconds.")
+
+
+class ToolQueueTimeoutError(ToolTimeoutError):
+    """
+    Raised when a tool call runs out of time waiting for a concurrency, rate limit or
+    admission slot, so the tool never ran. Circuit breakers don't count it as a
+    failure, and retry policies only retry it if it is in their `retry_on`.
+    """
+
+    def __init__(self, tool_name: str, timeout: float):
+        super().__init__(tool_name, timeout)
+        self.args = (f"{tool_name} timed out after {max(timeout, 0):.2f} seconds "
+                     f"waiting for a slot.",)
+
+
+class GrowingExecutor:
+    """
+    Runs each call on an idle worker thread, starting a new one when none is idle, so 
+    a call never waits behind others. Python can't stop a running thread, so a call 
+    that is abandoned, such as one that timed out, keeps its worker until it returns, 
+    and only that worker. Workers are daemon threads, so a hung call doesn't keep the 
+    process from exiting, and they exit after being idle for a while.
+    """
+
+    def __init__(self, thread_name_prefix: str,
+                 idle_timeout: float = _IDLE_WORKER_TIMEOUT):
+        self.thread_name_prefix = thread_name_prefix
+        self.idle_timeout = idle_timeout
+        self._lock = threading.Lock()
+        self._idle: list[queue.SimpleQueue] = []
+        """The inboxes of idle workers. The most recently idle is reused first, so 
+        extra workers go idle long enough to exit."""
+        self._workers = 0
+
+    @property
+    def workers(self) -> int:
+        """The number of worker threads, busy or idle."""
+        return self._workers
+
+    def submit(self, fn: Callable[..., Any], *args: Any) -> Future:
+        future: Future = Future()
+        with self._lock:
+            inbox = self._idle.pop() if self._idle else None
+            if inbox is None:
+                self._workers += 1
+        if inbox is None:
+            inbox = queue.SimpleQueue()
+            threading.Thread(target=self._work, args=(inbox,), daemon=True,
+                             name=f"{self.thread_name_prefix}-{self._workers}").start()
+        inbox.put((future, fn, args))
+        return future
+
+    def _work(self, inbox: queue.SimpleQueue) -> None:
+        while True:
+            try:
+                future, fn, args = inbox.get(timeout=self.idle_timeout)
+            except queue.Empty:
+                with self._lock:
+                    if inbox in self._idle:
+                        self._idle.remove(inbox)
+                        self._workers -= 1
+                        return
+                # A call was handed to this worker just as it timed out.
+                continue
+
+            if future.set_running_or_notify_cancel():
+                try:
+                    future.set_result(fn(*args))
+                except BaseException as e:
+                    future.set_exception(e)
+            # Don't keep the call's result alive while idle.
+            del future, fn, args
+            with self._lock:
+                self._idle.append(inbox)
+
+
+_TIMEOUT_EXECUTOR = GrowingExecutor("pytoolsmith-timeout")
+"""Where sync calls with a timeout run, so the caller can stop waiting for them."""
+
+_ABANDONED_CALLS: ContextVar[list[Future] | None] = ContextVar(
+    "pytoolsmith_abandoned_calls", default=None)
+"""Calls that are still running on a thread after the caller stopped waiting for 
+them, collected by `hold_until_done`."""
+
+
+def _abandon(future: Future) -> None:
+    """Cancels a call if it hasn't started, or records it as abandoned if it has."""
+    if not future.cancel():
+        calls = _ABANDONED_CALLS.get()
+        if calls is not None:
+            calls.append(future)
+
+
+@contextmanager
+def hold_until_done(release: Callable[[], None]) -> Iterator[None]:
+    """
+    Wraps a call that holds slots, like a concurrency limit. Sync calls can't be 
+    stopped, so if the call is abandoned, by a timeout or by the caller being 
+    cancelled, `release` is only called once the call has returned. Otherwise it is 
+    called on exit.
+    """
+    calls: list[Future] = []
+    token = _ABANDONED_CALLS.set(calls)
+    try:
+        yield
+    finally:
+        _ABANDONED_CALLS.reset(token)
+        if not calls:
+            release()
+        else:
+            _release_when_done(calls, release)
+
+
+def _release_when_done(calls: list[Future], release: Callable[[], None]) -> None:
+    remaining = len(calls)
+    lock = threading.Lock()
+
+    def on_done(_: Future) -> None:
+        nonlocal remaining
+        with lock:
+            remaining -= 1
+            is_last = remaining == 0
+        if is_last:
+            release()
+
+    for call in calls:
+        call.add_done_callback(on_done)
+
+
+def call_with_timeout(tool_name: str,
+                      invoke: Callable[[dict[str, Any], dict[str, Any]], Any],
+                      llm_parameters: dict[str, Any],
+                      hardset_parameters: dict[str, Any],
+                      timeout: float) -> Any:
+    """
+    Runs a sync invoker, raising `ToolTimeoutError` if it doesn't finish in time. The 
+    call runs on a worker of its own, so calls that hang can't hold up other tools' 
+    calls. A call that times out keeps running, and holding on to its worker, until it 
+    returns.
+    """
+    if timeout <= 0:
+        raise ToolTimeoutError(tool_name, timeout)
+
+    future = _TIMEOUT_EXECUTOR.submit(
+        contextvars.copy_context().run, invoke, llm_parameters, hardset_parameters)
+    try:
+        return future.result(timeout=timeout)
+    except FutureTimeoutError:
+        _abandon(future)
+        raise ToolTimeoutError(tool_name, timeout) from None
+
+
+async def call_with_timeout_async(
+        tool_name: str,
+        invoke_async: Callable[[dict[str, Any], dict[str, Any]], Awaitable[Any]],
+        llm_parameters: dict[str, Any],
+        hardset_parameters: dict[str, Any],
+        timeout: float) -> Any:
+    """Awaits an async invoker, cancelling it if it doesn't finish in time."""
+    if timeout <= 0:
+        raise ToolTimeoutError(tool_name, timeout)
+
+    timeout_context = asyncio.timeout(timeout)
+    try:
+        async with timeout_context:
+            return await invoke_async(llm_parameters, hardset_parameters)
+    except TimeoutError:
+        # Only our timeout is reported as such, not a `TimeoutError` from the tool.
+        if timeout_context.expired():
+            raise ToolTimeoutError(tool_name, timeout) from None
+        raise
+
+
+async def run_in_executor(executor: Executor | None, func: Callable[[], Any]) -> Any:
+    """
+    Runs a sync function in an executor and awaits it, like 
+    `loop.run_in_executor`. If the await is cancelled once the function is running, 
+    the function is recorded as abandoned, see `hold_until_done`.
+    """
+    running: Future = Future()
+
+    def run() -> Any:
+        if not running.set_running_or_notify_cancel():
+            return None
+        try:
+            return func()
+        finally:
+            running.set_result(None)
+
+    try:
+        return await asyncio.get_running_loop().run_in_executor(executor, run)
+    except asyncio.CancelledError:
+        _abandon(running)
+        raise
+
+
+class _InFlightCall:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.exception: BaseException | None = None
+
+
+class _SharedTask:
+    """
+    An async execution shared by concurrent calls, and how many callers are waiting 
+    for it. The count is only changed on the task's event loop.
+    """
+
+    def __init__(self):
+        self.task: asyncio.Task | None = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Lets concurrent calls with the same key share one execution. The first caller runs
+    the call and everyone who arrives while it is running gets its result or exception.
+    Sync and async calls are coalesced separately.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: dict[str, _InFlightCall] = {}
+        self._async_calls: dict[str, _SharedTask] = {}
+
+    def do(self, key: str, func: Callable[[], Any]) -> Any:
+        with self._lock:
+            call = self._calls.get(key)
+            is_leader = call is None
+            if is_leader:
+                call = self._calls[key] = _InFlightCall()
+
+        if not is_leader:
+            call.done.wait()
+            if call.exception is not None:
+                raise call.exception
+            return call.result
+
+        try:
+            call.result = func()
+            return call.result
+        except BaseException as e:
+            call.exception = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    async def do_async(self, key: str, func: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Async version of `do`. The execution runs as a task of its own, so a caller 
+        that is cancelled doesn't cancel it for the others. It is only cancelled once 
+        every caller waiting for it has been.
+        """
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            shared = self._async_calls.get(key)
+            if shared is not None and shared.task.get_loop() is not loop:
+                # Tasks can't be shared between event loops, so this call runs alone.
+                shared = None
+            elif shared is None:
+                shared = self._async_calls[key] = _SharedTask()
+                shared.task = loop.create_task(self._run_shared(key, shared, func))
+
+        if shared is None:
+            return await func()
+
+        shared.waiters += 1
+        try:
+            return await asyncio.shield(shared.task)
+        finally:
+            shared.waiters -= 1
+            if not shared.waiters and not shared.task.done():
+                self._forget(key, shared)
+                shared.task.cancel()
+
+    async def _run_shared(self, key: str, shared: "_SharedTask",
+                          func: Callable[[], Awaitable[Any]]) -> Any:
+        try:
+            return await func()
+        finally:
+            self._forget(key, shared)
+
+    def _forget(self, key: str, shared: "_SharedTask") -> None:
+        """Stops new callers from joining a shared execution."""
+        with self._lock:
+            if self._async_calls.get(key) is shared:
+                del self._async_calls[key]
@@ -0,0 +1,223 @@
+"""Hedged calls, which race a second copy of a slow call to cut tail latency."""
+
+import asyncio
+from collections.abc import Awaitable, Callable
+from concurrent.futures import FIRST_COMPLETED, Future, wait
+import contextvars
+from dataclasses import dataclass
+import threading
+from typing import Any
+
+from .execution import GrowingExecutor
+from .latency import LatencyTracker
+
+_PRIMARY_EXECUTOR = GrowingExecutor("pytoolsmith-hedged")
+"""Where sync hedged calls run, so each starts right away and the caller is free to 
+return whichever of it and its hedge finishes first."""
+
+_HEDGE_EXECUTOR = GrowingExecutor("pytoolsmith-hedge")
+"""Where sync hedges run. It never has more workers busy than the hedge budget's 
+`max_concurrent`."""
+
+
+@dataclass(frozen=True)
+class HedgePolicy:
+    """
+    Describes when a slow call gets a second, identical call raced against it. Only
+    use this for idempotent tools, since both calls may run to completion.
+    """
+
+    delay: float | None = None
+    """
+    Seconds to wait before hedging. `None` waits for the tool's observed `quantile`
+    latency instead.
+    """
+
+    quantile: float = 0.95
+    """The latency quantile to hedge at when `delay` isn't set."""
+
+    min_samples: int = 20
+    """Calls the tool must have completed before its quantile is trusted. Calls
+    aren't hedged until then, unless `delay` is set."""
+
+
+@dataclass(frozen=True)
+class HedgeStats:
+    """A snapshot of a tool's hedging counters."""
+
+    calls: int
+
+    hedged: int
+    """Calls that were slow enough that a hedge was started."""
+
+    hedge_wins: int
+    """Hedged calls where the hedge finished first."""
+
+    denied: int
+    """Calls that were slow enough to hedge, but the hedge budget was used up or 
+    already had `max_concurrent` hedges running."""
+
+
+class HedgeBudget:
+    """
+    A process-wide token bucket that caps hedge traffic. Every hedgeable call adds
+    `ratio` of a token, and every hedge takes a whole one, so hedges stay under that
+    fraction of calls once the `burst` is spent. At most `max_concurrent` hedges run 
+    at once, and a hedge that would go over is denied rather than queued.
+    """
+
+    def __init__(self, ratio: float = 0.05, burst: int = 10, max_concurrent: int = 10):
+        if ratio < 0 or burst < 0:
+            raise ValueError("The hedge budget's ratio and burst can't be negative")
+        if max_concurrent < 1:
+            raise ValueError("max_concurrent must be at least 1")
+        self.ratio = ratio
+        self.burst = burst
+        self.max_concurrent = max_concurrent
+        self._lock = threading.Lock()
+        self._tokens = float(burst)
+        self._running = 0
+
+    def deposit(self) -> None:
+        with self._lock:
+            self._tokens = min(float(self.burst), self._tokens + self.ratio)
+
+    def try_start(self) -> bool:
+        """Takes a token and a hedge slot, returning False if either is used up."""
+        with self._lock:
+            if self._tokens < 1 or self._running >= self.max_concurrent:
+                return False
+            self._tokens -= 1
+            self._running += 1
+            return True
+
+    def finish(self, _: Any = None) -> None:
+        """Gives back a hedge's slot. Used as a done callback of the hedge."""
+        with self._lock:
+            self._running -= 1
+
+
+class Hedger:
+    """Runs calls under a `HedgePolicy`, counting how often they are hedged."""
+
+    def __init__(self, policy: HedgePolicy, latency: LatencyTracker):
+        if not 0 < policy.quantile < 1:
+            raise ValueError("quantile must be between 0 and 1")
+        if policy.delay is not None and policy.delay < 0:
+            raise ValueError("delay can't be negative")
+
+        self.policy = policy
+        self._latency = latency
+        self._lock = threading.Lock()
+        self._calls = 0
+        self._hedged = 0
+        self._hedge_wins = 0
+        self._denied = 0
+
+    def _get_delay(self) -> float | None:
+        if self.policy.delay is not None:
+            return self.policy.delay
+        if self._latency.count < self.policy.min_samples:
+            return None
+        return self._latency.quantile(self.policy.quantile)
+
+    def _count(self, hedged: bool = False, hedge_won: bool = False,
+               denied: bool = False) -> None:
+        with self._lock:
+            self._calls += 1
+            self._hedged += hedged
+            self._hedge_wins += hedge_won
+            self._denied += denied
+
+    def call(self, func: Callable[[], Any], budget: HedgeBudget) -> Any:
+        """
+        Calls the function, and calls it again if the first call is slow, returning 
+        whichever call succeeds first. The first call starts on a thread of its own 
+        right away, so the delay only times the call, and the caller waits for 
+        either call. Python can't stop a running thread, so the slower call runs to 
+        completion and is ignored.
+        """
+        budget.deposit()
+        delay = self._get_delay()
+        if delay is None:
+            self._count()
+            return func()
+
+        primary = _PRIMARY_EXECUTOR.submit(contextvars.copy_context().run, func)
+        done, _ = wait([primary], timeout=delay)
+        if done:
+            self._count()
+            return primary.result()
+        if not budget.try_start():
+            self._count(denied=True)
+            return primary.result()
+
+        hedge = _HEDGE_EXECUTOR.submit(contextvars.copy_context().run, func)
+        hedge.add_done_callback(budget.finish)
+        winner = _first_success(primary, hedge)
+        (hedge if winner is primary else primary).cancel()
+        self._count(hedged=True, hedge_won=winner is hedge)
+        return winner.result()
+
+    async def call_async(self, func: Callable[[], Awaitable[Any]],
+                         budget: HedgeBudget) -> Any:
+        """Async version of `call`. The slower call is cancelled."""
+        budget.deposit()
+        delay = self._get_delay()
+        if delay is None:
+            self._count()
+            return await func()
+
+        primary = asyncio.ensure_future(func())
+        hedge = None
+        try:
+            done, _ = await asyncio.wait([primary], timeout=delay)
+            if done:
+                self._count()
+                return await primary
+            if not budget.try_start():
+                self._count(denied=True)
+                return await primary
+
+            hedge = asyncio.ensure_future(func())
+            hedge.add_done_callback(budget.finish)
+            pending = {primary, hedge}
+            while True:
+                done, pending = await asyncio.wait(pending,
+                                                   return_when=asyncio.FIRST_COMPLETED)
+                winner = next((task for task in (primary, hedge)
+                               if task in done and task.exception() is None), None)
+                if winner is not None or not pending:
+                    break
+
+            self._count(hedged=True, hedge_won=winner is hedge)
+            return (primary if winner is None else winner).result()
+        finally:
+            for task in (primary, hedge):
+                if task is None:
+                    continue
+                if not task.done():
+                    task.cancel()
+                elif not task.cancelled():
+                    # Mark the loser's exception as retrieved.
+                    task.exception()
+
+
+    def stats(self) -> HedgeStats:
+        with self._lock:
+            return HedgeStats(calls=self._calls, hedged=self._hedged,
+                              hedge_wins=self._hedge_wins, denied=self._denied)
+
+
+def _first_success(primary: Future, hedge: Future) -> Future:
+    """
+    Waits for the first of two calls to succeed. If both fail, returns the primary
+    call so its exception is raised.
+    """
+    pending = {primary, hedge}
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in (primary, hedge):
+            if future in done and future.exception() is None:
+                return future
+    return primary
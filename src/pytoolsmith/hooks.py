@@ -0,0 +1,173 @@
+"""
+Instrumentation hooks, which are told about tool calls, schema builds and renders.
+Tools without hooks skip all of this, so hooks cost nothing until one is added.
+"""
+
+from contextvars import ContextVar, Token
+from dataclasses import asdict, dataclass, field
+import json
+import time
+from typing import TYPE_CHECKING, Any
+
+from .tool_stats import get_result_size
+
+if TYPE_CHECKING:
+    from .tool_parameters import ToolParameters
+
+
+@dataclass
+class CallEvent:
+    """
+    One call of a tool. The same event is passed to every hook method for the call,
+    so hooks can keep state for it in `data`.
+    """
+
+    tool_name: str
+
+    llm_parameters: dict[str, Any]
+
+    hardset_parameters: dict[str, Any]
+
+    parent: "CallEvent | None" = None
+    """The call this one is part of, such as the batch tool call that ran it."""
+
+    batched: bool = False
+    """
+    If True, the call ran together with others of the same tool in one call of its
+    `batch_function`. Such calls start and end together, and aren't the current call
+    while they run.
+    """
+
+    start_time: float = field(default_factory=time.perf_counter)
+    """The `time.perf_counter()` time the call started."""
+
+    elapsed: float | None = None
+    """Seconds the call took, once it has ended."""
+
+    result: Any = None
+
+    result_size: int | None = None
+    """The size of a string or bytes result in bytes, once the call has ended."""
+
+    error: BaseException | None = None
+
+    data: dict[Any, Any] = field(default_factory=dict)
+    """State kept by hooks, such as the call's span."""
+
+
+@dataclass(frozen=True)
+class SchemaEvent:
+    """A tool's schema being built, which only happens when it isn't cached."""
+
+    tool_name: str
+
+    schema_vals: dict[str, str]
+
+    elapsed: float
+    """Seconds it took to build the schema."""
+
+    size: int
+    """The size of the schema's JSON in characters."""
+
+
+@dataclass(frozen=True)
+class RenderEvent:
+    """A library's tools being rendered for a model provider."""
+
+    format: str
+    """The provider, like `openai` for `ToolLibrary.to_openai`."""
+
+    rendered: Any
+    """What was rendered, which should be treated as read-only."""
+
+    elapsed: float
+
+    size: int
+    """The size of the rendered tools' JSON in characters."""
+
+
+class ToolHooks:
+    """
+    Base class for instrumentation hooks. Subclasses override the methods they need.
+    Exceptions raised by a hook are raised from the call, so hooks shouldn't raise.
+    """
+
+    def on_call_start(self, event: CallEvent) -> None:
+        """Called before a tool call runs, including calls answered from the cache."""
+
+    def on_call_end(self, event: CallEvent) -> None:
+        """Called once a tool call has finished, whether or not it succeeded."""
+
+    def on_error(self, event: CallEvent) -> None:
+        """Called when a tool call fails, just before `on_call_end`."""
+
+    def on_schema_build(self, event: SchemaEvent) -> None:
+        """Called when a tool's schema is built."""
+
+    def on_render(self, event: RenderEvent) -> None:
+        """Called when a library renders its tools with one of its `to_*` methods."""
+
+
+_CURRENT_CALL: ContextVar[CallEvent | None] = ContextVar("pytoolsmith_current_call",
+                                                         default=None)
+
+
+def get_current_call() -> CallEvent | None:
+    """Returns the event of the tool call that is running, if a hooked call is."""
+    return _CURRENT_CALL.get()
+
+
+def start_call(hooks: tuple[ToolHooks, ...], event: CallEvent) -> Token | None:
+    """
+    Starts a call's event, making it the current call unless it is batched. Returns
+    the token to pass to `end_call`. If a hook raises, the call stops being current
+    before the error is raised.
+    """
+    event.parent = _CURRENT_CALL.get()
+    token = None if event.batched else _CURRENT_CALL.set(event)
+    try:
+        for hook in hooks:
+            hook.on_call_start(event)
+    except BaseException:
+        if token is not None:
+            _CURRENT_CALL.reset(token)
+        raise
+    return token
+
+
+def end_call(hooks: tuple[ToolHooks, ...], event: CallEvent, token: Token | None,
+             result: Any = None, error: BaseException | None = None) -> None:
+    """Ends a call's event with its result or error."""
+    event.elapsed = time.perf_counter() - event.start_time
+    try:
+        if error is None:
+            event.result = result
+            event.result_size = get_result_size(result)
+        else:
+            event.error = error
+            for hook in hooks:
+                hook.on_error(event)
+        for hook in hooks:
+            hook.on_call_end(event)
+    finally:
+        if token is not None:
+            _CURRENT_CALL.reset(token)
+
+
+def _json_size(value: Any) -> int:
+    return len(json.dumps(value, default=str))
+
+
+def emit_schema_build(hooks: tuple[ToolHooks, ...], tool_name: str,
+                      schema_vals: dict[str, str], elapsed: float,
+                      schema: "ToolParameters") -> None:
+    event = SchemaEvent(tool_name, schema_vals, elapsed, _json_size(asdict(schema)))
+    for hook in hooks:
+        hook.on_schema_build(event)
+
+
+def emit_render(hooks: tuple[ToolHooks, ...], format: str, rendered: Any,
+                elapsed: float) -> None:
+    event = RenderEvent(format, rendered, elapsed, _json_size(rendered))
+    for hook in hooks:
+        hook.on_render(event)
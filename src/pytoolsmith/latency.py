@@ -0,0 +1,95 @@
+"""Tracking how long each tool's calls take, to schedule batches around it."""
+
+from bisect import bisect_left
+
+MIN_LATENCY = 1e-4
+"""The upper bound of the first histogram bucket, in seconds."""
+
+LATENCY_GROWTH = 2 ** 0.25
+"""How much wider each bucket is than the last, for a resolution of about 19%."""
+
+LATENCY_BUCKETS = 80
+"""Enough buckets to reach about 100 seconds. Slower calls share the last one."""
+
+_DECAY_EVERY = 1024
+"""The histogram's counts are halved after this many calls, so its quantiles follow
+recent calls."""
+
+
+LATENCY_BOUNDS = tuple(MIN_LATENCY * LATENCY_GROWTH ** i
+                       for i in range(LATENCY_BUCKETS))
+"""The upper bound of each bucket, in seconds."""
+
+_BUCKET_LIMITS = LATENCY_BOUNDS[:-1]
+"""Without the last bound, so that slower calls land in the last bucket."""
+
+
+def latency_bucket(seconds: float) -> int:
+    """
+    Returns the latency histogram bucket that a call falls in. Bucket `i` holds
+    latencies up to `LATENCY_BOUNDS[i]`, and the last holds everything above. It runs
+    on every call, so it bisects the bounds rather than taking a logarithm.
+    """
+    return bisect_left(_BUCKET_LIMITS, seconds)
+
+
+class LatencyTracker:
+    """
+    Tracks a tool's call latency, as an exponentially weighted moving average and a
+    log-bucketed histogram for quantiles. Recording doesn't lock, so a call recorded
+    at the same time as another can occasionally be lost, which only makes the
+    estimates a little less precise.
+    """
+
+    def __init__(self, alpha: float = 0.2):
+        """
+        Args:
+            alpha: How much each new call moves the average, from 0 to 1. Higher
+                values follow changes faster but are noisier.
+        """
+        self.alpha = alpha
+        self._average: float | None = None
+        self._buckets = [0] * LATENCY_BUCKETS
+        self._count = 0
+        self._since_decay = 0
+
+    def record(self, seconds: float) -> None:
+        average = self._average
+        self._average = seconds if average is None \
+            else average + self.alpha * (seconds - average)
+
+        self._buckets[latency_bucket(seconds)] += 1
+        self._count += 1
+        self._since_decay += 1
+        if self._since_decay >= _DECAY_EVERY:
+            self._since_decay = 0
+            buckets = [count // 2 for count in self._buckets]
+            self._buckets = buckets
+            self._count = sum(buckets)
+
+    @property
+    def average(self) -> float | None:
+        """The average latency in seconds, or `None` before the first call."""
+        return self._average
+
+    @property
+    def count(self) -> int:
+        """The number of calls in the histogram, which decays over time."""
+        return self._count
+
+    def quantile(self, q: float) -> float | None:
+        """
+        Returns the latency that a fraction `q` of recent calls finished within,
+        rounded up to its bucket, or `None` before the first call.
+        """
+        buckets = self._buckets
+        total = sum(buckets)
+        if not total:
+            return None
+        rank = q * total
+        seen = 0
+        for bucket, count in enumerate(buckets):
+            seen += count
+            if seen >= rank:
+                break
+        return LATENCY_BOUNDS[bucket]
@@ -0,0 +1,79 @@
+from dataclasses import dataclass, field
+import importlib
+import threading
+from typing import Any
+
+from .tool_definition import ToolDefinition
+
+
+@dataclass
+class LazyToolDefinition:
+    """
+    A tool that is registered by its import path. The module is only imported, and the
+    `ToolDefinition` only built, the first time the tool is needed.
+    """
+
+    import_path: str
+    """Where to find the tool function, in the form `package.module:function`."""
+
+    tool_kwargs: dict[str, Any] = field(default_factory=dict)
+    """Keyword arguments passed to the `ToolDefinition` when it is built."""
+
+    _tool: ToolDefinition | None = field(default=None, init=False, repr=False)
+
+    _lock: threading.Lock = field(default_factory=threading.Lock, init=False,
+                                  repr=False, compare=False)
+
+    def __post_init__(self) -> None:
+        module_name, _, attr_path = self.import_path.partition(":")
+        if not module_name or not attr_path:
+            raise ValueError(
+                f"Invalid import path: {self.import_path}. "
+                f"Expected the form `package.module:function`."
+            )
+
+    @property
+    def name(self) -> str:
+        return self.import_path.partition(":")[2].split(".")[-1]
+
+    @property
+    def tool_group(self) -> str | None:
+        return self.tool_kwargs.get("tool_group")
+
+    @property
+    def is_loaded(self) -> bool:
+        return self._tool is not None
+
+    def load(self) -> ToolDefinition:
+        """Imports the tool and builds its definition, caching it for later calls."""
+        if self._tool is not None:
+            return self._tool
+
+        with self._lock:
+            if self._tool is None:
+                self._tool = self._build()
+        return self._tool
+
+    def _build(self) -> ToolDefinition:
+        module_name, _, attr_path = self.import_path.partition(":")
+        obj = importlib.import_module(module_name)
+        for attr in attr_path.split("."):
+            obj = getattr(obj, attr)
+
+        if isinstance(obj, ToolDefinition):
+            if self.tool_kwargs:
+                raise ValueError(
+                    f"{self.import_path} is already a ToolDefinition, "
+                    f"so it can't be given additional arguments."
+                )
+            tool = obj
+        else:
+            tool = ToolDefinition(function=obj, **self.tool_kwargs)
+
+        if tool.name != self.name:
+            raise ValueError(
+                f"Tool loaded from {self.import_path} is named {tool.name}, "
+                f"expected {self.name}."
+            )
+
+        return tool
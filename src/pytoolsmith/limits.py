@@ -0,0 +1,243 @@
+"""Concurrency limits and token-bucket rate limits for tools and tool groups."""
+
+import asyncio
+from collections import deque
+from dataclasses import dataclass
+import threading
+import time
+
+from .execution import ToolQueueTimeoutError
+
+
+@dataclass(frozen=True)
+class RateLimit:
+    """A token bucket allowing `rate` calls per second, in bursts of up to `burst`."""
+
+    rate: float
+    """Calls per second, on average."""
+
+    burst: int = 1
+    """The most calls that can start at once after the tool has been idle."""
+
+
+@dataclass(frozen=True)
+class LimitStats:
+    """A snapshot of a limiter's counters."""
+
+    active: int
+    """Calls holding a concurrency slot."""
+
+    queued: int
+    """Calls waiting for a concurrency slot right now."""
+
+    total_queued: int
+    """Calls that have had to wait for a concurrency slot."""
+
+    throttled: int
+    """Calls that have been delayed by the rate limit."""
+
+
+class _Waiter:
+    """A call waiting for a concurrency slot, from a thread or an event loop."""
+
+    __slots__ = ("event", "loop", "future", "granted")
+
+    def __init__(self, event: threading.Event | None = None,
+                 loop: asyncio.AbstractEventLoop | None = None):
+        self.event = event
+        self.loop = loop
+        self.future = None if loop is None else loop.create_future()
+        self.granted = False
+
+    def grant(self) -> bool:
+        """Hands the waiter a slot. Must be called with the limiter's lock held."""
+        if self.event is not None:
+            self.granted = True
+            self.event.set()
+            return True
+        try:
+            self.loop.call_soon_threadsafe(_resolve, self.future)
+        except RuntimeError:
+            # The waiter's event loop is closed.
+            return False
+        self.granted = True
+        return True
+
+
+def _resolve(future: asyncio.Future) -> None:
+    if not future.done():
+        future.set_result(None)
+
+
+class Limiter:
+    """
+    Enforces a concurrency limit and a rate limit across every thread and event loop
+    in the process. Slots are handed to waiting calls in the order they arrived.
+    """
+
+    def __init__(self, max_concurrency: int | None = None,
+                 rate_limit: RateLimit | None = None):
+        if max_concurrency is not None and max_concurrency < 1:
+            raise ValueError("max_concurrency must be at least 1")
+        if rate_limit is not None and (rate_limit.rate <= 0 or rate_limit.burst < 1):
+            raise ValueError("A rate limit needs a positive rate and a burst of at "
+                             "least 1")
+
+        self.max_concurrency = max_concurrency
+        self.rate_limit = rate_limit
+        self._lock = threading.Lock()
+        self._active = 0
+        self._waiters: deque[_Waiter] = deque()
+        self._tokens = float(rate_limit.burst) if rate_limit is not None else 0.0
+        self._updated = time.monotonic()
+        self._total_queued = 0
+        self._throttled = 0
+
+    def _reserve_token(self) -> float:
+        """Takes a token, returning how many seconds to wait until it is due."""
+        rate_limit = self.rate_limit
+        if rate_limit is None:
+            return 0.0
+
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(float(rate_limit.burst),
+                               self._tokens + (now - self._updated) * rate_limit.rate)
+            self._updated = now
+            self._tokens -= 1
+            if self._tokens >= 0:
+                return 0.0
+            self._throttled += 1
+            return -self._tokens / rate_limit.rate
+
+    def _refund_token(self) -> None:
+        with self._lock:
+            self._tokens += 1
+
+    def _take_slot_or_wait(self, waiter: _Waiter) -> bool:
+        """Takes a free slot, or queues the waiter and returns False."""
+        with self._lock:
+            if self._active < self.max_concurrency and not self._waiters:
+                self._active += 1
+                return True
+            self._waiters.append(waiter)
+            self._total_queued += 1
+            return False
+
+    def _abandon(self, waiter: _Waiter) -> bool:
+        """Stops waiting, returning whether the waiter was given a slot anyway."""
+        with self._lock:
+            if waiter.granted:
+                return True
+            self._waiters.remove(waiter)
+            return False
+
+    def acquire(self, timeout: float | None = None) -> bool:
+        """
+        Waits for a rate limit token and a concurrency slot, returning False if that
+        would take longer than `timeout` seconds.
+        """
+        start = time.monotonic()
+        wait = self._reserve_token()
+        if wait:
+            if timeout is not None and wait > timeout:
+                self._refund_token()
+                return False
+            time.sleep(wait)
+
+        if self.max_concurrency is None:
+            return True
+
+        waiter = _Waiter(event=threading.Event())
+        if self._take_slot_or_wait(waiter):
+            return True
+
+        remaining = None if timeout is None else timeout - (time.monotonic() - start)
+        if waiter.event.wait(remaining):
+            return True
+        return self._abandon(waiter)
+
+    async def acquire_async(self, timeout: float | None = None) -> bool:
+        """Async version of `acquire`, which waits without blocking the event loop."""
+        start = time.monotonic()
+        wait = self._reserve_token()
+        if wait:
+            if timeout is not None and wait > timeout:
+                self._refund_token()
+                return False
+            try:
+                await asyncio.sleep(wait)
+            except asyncio.CancelledError:
+                self._refund_token()
+                raise
+
+        if self.max_concurrency is None:
+            return True
+
+        waiter = _Waiter(loop=asyncio.get_running_loop())
+        if self._take_slot_or_wait(waiter):
+            return True
+
+        remaining = None if timeout is None else timeout - (time.monotonic() - start)
+        try:
+            async with asyncio.timeout(remaining):
+                await waiter.future
+            return True
+        except TimeoutError:
+            return self._abandon(waiter)
+        except asyncio.CancelledError:
+            if self._abandon(waiter):
+                self.release()
+            raise
+
+    def release(self) -> None:
+        """Frees a concurrency slot, handing it to the longest-waiting call."""
+        if self.max_concurrency is None:
+            return
+
+        with self._lock:
+            while self._waiters:
+                if self._waiters.popleft().grant():
+                    return
+            self._active -= 1
+
+    def stats(self) -> LimitStats:
+        with self._lock:
+            return LimitStats(active=self._active, queued=len(self._waiters),
+                              total_queued=self._total_queued,
+                              throttled=self._throttled)
+
+
+def acquire_limiters(tool_name: str, limiters: tuple[Limiter, ...],
+                     timeout: float | None) -> None:
+    """
+    Acquires every limiter in order, raising `ToolQueueTimeoutError` if that takes
+    longer than the timeout.
+    """
+    start = time.monotonic()
+    for i, limiter in enumerate(limiters):
+        remaining = None if timeout is None else timeout - (time.monotonic() - start)
+        if not limiter.acquire(remaining):
+            release_limiters(limiters[:i])
+            raise ToolQueueTimeoutError(tool_name, timeout)
+
+
+async def acquire_limiters_async(tool_name: str, limiters: tuple[Limiter, ...],
+                                 timeout: float | None) -> None:
+    """Async version of `acquire_limiters`."""
+    start = time.monotonic()
+    for i, limiter in enumerate(limiters):
+        remaining = None if timeout is None else timeout - (time.monotonic() - start)
+        try:
+            acquired = await limiter.acquire_async(remaining)
+        except asyncio.CancelledError:
+            release_limiters(limiters[:i])
+            raise
+        if not acquired:
+            release_limiters(limiters[:i])
+            raise ToolQueueTimeoutError(tool_name, timeout)
+
+
+def release_limiters(limiters: tuple[Limiter, ...]) -> None:
+    for limiter in reversed(limiters):
+        limiter.release()
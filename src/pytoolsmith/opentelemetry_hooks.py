@@ -0,0 +1,66 @@
+"""
+Hooks that trace tool calls as OpenTelemetry spans. The OpenTelemetry API is only
+imported when the hooks are created, so it stays an optional dependency.
+"""
+
+from typing import Any
+
+from .hooks import CallEvent, ToolHooks
+
+
+class OpenTelemetryHooks(ToolHooks):
+    """
+    Traces each tool call as an `execute_tool {name}` span, following the
+    OpenTelemetry conventions for generative AI. A batch tool call's span is the
+    parent of the spans of its invocations, wherever the batch runner runs them, and
+    spans started by a tool are children of its call's span.
+    """
+
+    def __init__(self, tracer: Any = None):
+        """
+        Args:
+            tracer: The OpenTelemetry tracer to start spans with. Defaults to the
+                global tracer provider's `pytoolsmith` tracer.
+        """
+        try:
+            from opentelemetry import context, trace
+        except ImportError as e:
+            raise ImportError(
+                "OpenTelemetryHooks requires the OpenTelemetry API. "
+                "Install it with `pip install pytoolsmith[opentelemetry]`."
+            ) from e
+
+        self._context = context
+        self._trace = trace
+        self._tracer = tracer if tracer is not None else trace.get_tracer("pytoolsmith")
+
+    def on_call_start(self, event: CallEvent) -> None:
+        parent_span = None if event.parent is None else event.parent.data.get(self)
+        parent_context = None if parent_span is None \
+            else self._trace.set_span_in_context(parent_span[0])
+
+        span = self._tracer.start_span(
+            f"execute_tool {event.tool_name}", context=parent_context,
+            kind=self._trace.SpanKind.INTERNAL,
+            attributes={"gen_ai.operation.name": "execute_tool",
+                        "gen_ai.tool.name": event.tool_name,
+                        "pytoolsmith.batched": event.batched})
+        # Batched calls aren't the current call, so their spans aren't made current.
+        token = None if event.batched else self._context.attach(
+            self._trace.set_span_in_context(span))
+        event.data[self] = (span, token)
+
+    def on_error(self, event: CallEvent) -> None:
+        span, _ = event.data[self]
+        span.record_exception(event.error)
+        span.set_status(self._trace.Status(self._trace.StatusCode.ERROR,
+                                           str(event.error)))
+        span.set_attribute("error.type", type(event.error).__qualname__)
+
+    def on_call_end(self, event: CallEvent) -> None:
+        span, token = event.data[self]
+        if event.result_size is not None:
+            span.set_attribute("pytoolsmith.result_size", event.result_size)
+        if token is not None:
+            self._context.detach(token)
+        span.end()
@@ -0,0 +1,122 @@
+"""
+Runs tools with `execution="process"` in worker processes. Closures can't be pickled,
+so each call is sent as a `ProcessInvocation` describing where to import the tool from
+and the arguments to call it with.
+"""
+
+import asyncio
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any
+
+from .pytoolsmith_config.process_pool import get_process_pool
+
+if TYPE_CHECKING:
+    from .lazy_tool import LazyToolDefinition
+
+
+@dataclass(frozen=True)
+class ProcessInvocation:
+    """A picklable description of one tool call."""
+
+    import_path: str
+    """Where to import the tool function from, in the form `package.module:function`."""
+
+    injected_parameters: tuple[str, ...]
+
+    validate_arguments: bool
+
+    llm_parameters: dict[str, Any]
+
+    hardset_parameters: dict[str, Any]
+    """Only the hard-set parameters the tool injects, so they must be picklable."""
+
+
+_WORKER_TOOLS: dict[tuple[str, tuple[str, ...], bool], "LazyToolDefinition"] = {}
+"""The tools each worker process has loaded, kept warm between calls."""
+
+
+def run_invocation(invocation: ProcessInvocation) -> Any:
+    """Runs a tool call inside a worker process."""
+    # Imported here since the lazy tool module imports the tool definition module,
+    # which imports this one.
+    from .lazy_tool import LazyToolDefinition
+
+    key = (invocation.import_path, invocation.injected_parameters,
+           invocation.validate_arguments)
+    lazy_tool = _WORKER_TOOLS.get(key)
+    if lazy_tool is None:
+        lazy_tool = LazyToolDefinition(
+            import_path=invocation.import_path,
+            tool_kwargs={
+                "injected_parameters": list(invocation.injected_parameters),
+                "validate_arguments": invocation.validate_arguments,
+            }
+        )
+        _WORKER_TOOLS[key] = lazy_tool
+
+    return lazy_tool.load().call_tool(invocation.llm_parameters,
+                                      invocation.hardset_parameters)
+
+
+def get_import_path(function: Callable[..., Any]) -> str:
+    """Returns the path worker processes import the function from."""
+    qualname = getattr(function, "__qualname__", "")
+    if "<locals>" in qualname or "<lambda>" in qualname or not qualname:
+        raise ValueError(
+            f"{qualname or function} can't run in a process pool. Tools with "
+            f"execution='process' must be importable, module-level functions."
+        )
+    return f"{function.__module__}:{qualname}"
+
+
+def _build_invocation(import_path: str,
+                      injected_parameters: tuple[str, ...],
+                      validate_arguments: bool,
+                      llm_parameters: dict[str, Any],
+                      hardset_parameters: dict[str, Any]) -> ProcessInvocation:
+    return ProcessInvocation(
+        import_path=import_path,
+        injected_parameters=injected_parameters,
+        validate_arguments=validate_arguments,
+        llm_parameters=llm_parameters,
+        hardset_parameters={name: hardset_parameters[name]
+                            for name in injected_parameters},
+    )
+
+
+def compile_process_invoker(
+        function: Callable[..., Any],
+        injected_parameters: tuple[str, ...],
+        validate_arguments: bool,
+) -> Callable[[dict[str, Any], dict[str, Any]], Any]:
+    """Builds a `call_tool` invoker that runs the tool in the process pool."""
+    import_path = get_import_path(function)
+
+    def invoke(llm_parameters: dict[str, Any],
+               hardset_parameters: dict[str, Any]) -> Any:
+        invocation = _build_invocation(import_path, injected_parameters,
+                                       validate_arguments, llm_parameters,
+                                       hardset_parameters)
+        return get_process_pool().submit(run_invocation, invocation).result()
+
+    return invoke
+
+
+def compile_async_process_invoker(
+        function: Callable[..., Any],
+        injected_parameters: tuple[str, ...],
+        validate_arguments: bool,
+) -> Callable[[dict[str, Any], dict[str, Any]], Awaitable[Any]]:
+    """Builds a `call_tool_async` invoker that awaits the tool in the process pool."""
+    import_path = get_import_path(function)
+
+    async def invoke_async(llm_parameters: dict[str, Any],
+                           hardset_parameters: dict[str, Any]) -> Any:
+        invocation = _build_invocation(import_path, injected_parameters,
+                                       validate_arguments, llm_parameters,
+                                       hardset_parameters)
+        return await asyncio.wrap_future(
+            get_process_pool().submit(run_invocation, invocation))
+
+    return invoke_async
@@ -1,6 +1,28 @@
 """Configuration for the PyToolSmith library."""
 
-from .batch_runner import set_batch_runner, unset_batch_runner
+from .admission_control import (
+    get_admission_stats,
+    set_admission_control,
+    unset_admission_control,
+)
+from .async_executor import (
+    get_async_executor,
+    set_async_executor,
+    unset_async_executor,
+)
+from .batch_runner import (
+    AsyncioBatchRunner,
+    ThreadPoolBatchRunner,
+    set_async_batch_runner,
+    set_batch_runner,
+    unset_async_batch_runner,
+    unset_batch_runner,
+)
+from .circuit_breakers import (
+    set_tool_group_circuit_breaker,
+    unset_tool_group_circuit_breaker,
+)
+from .hedge_budget import set_hedge_budget, unset_hedge_budget
 from .mappings import (
     get_format_map,
     get_type_map,
@@ -9,16 +31,41 @@ from .mappings import (
     update_format_map,
     update_type_map,
 )
+from .process_pool import set_process_pool, unset_process_pool
 from .serialization import set_batch_tool_serializer
+from .tool_group_limits import (
+    get_tool_group_limit_stats,
+    set_tool_group_limits,
+    unset_tool_group_limits,
+)
 
 __all__ = [
+    AsyncioBatchRunner,
+    ThreadPoolBatchRunner,
+    get_admission_stats,
+    get_async_executor,
     get_format_map,
+    get_tool_group_limit_stats,
     get_type_map,
     reset_format_map,
     reset_type_map,
+    set_admission_control,
+    set_async_batch_runner,
+    set_async_executor,
     set_batch_runner,
     set_batch_tool_serializer,
+    set_hedge_budget,
+    set_process_pool,
+    set_tool_group_circuit_breaker,
+    set_tool_group_limits,
     update_format_map,
     update_type_map,
+    unset_admission_control,
+    unset_async_batch_runner,
+    unset_async_executor,
     unset_batch_runner,
+    unset_hedge_budget,
+    unset_process_pool,
+    unset_tool_group_circuit_breaker,
+    unset_tool_group_limits,
 ]
@@ -0,0 +1,56 @@
+from collections.abc import Hashable
+
+from ..admission import AdmissionController, AdmissionStats
+from .policy_version import bump_policy_version
+
+_ADMISSION_CONTROLLER: AdmissionController | None = None
+
+
+def set_admission_control(max_concurrency: int, max_queue: int | None = None,
+                          max_wait: float | None = None, tenant_key: str | None = None,
+                          tenant_weights: dict[Hashable, float] | None = None) -> None:
+    """
+    Caps how many tool calls run at once across the whole process, whether they come
+    from `call_tool`, `call_tool_async` or a batch runner, so many concurrent batches
+    can't overload the process or its dependencies.
+
+    Args:
+        max_concurrency: The most tool calls that can run at once.
+        max_queue: The most calls that can wait for a slot. Calls beyond it fail
+            right away with a `ToolOverloadedError`. `None` means no limit.
+        max_wait: The most seconds a call waits for a slot before it fails with a
+            `ToolOverloadedError`. `None` means it waits until its timeout, if any.
+        tenant_key: A hard-set parameter, such as `"tenant_id"`, that identifies who a
+            call is for. Waiting calls are then shared out fairly between tenants, so 
+            one tenant's large batches can't starve everyone else's calls. Without it, 
+            waiting calls run in the order they arrived.
+        tenant_weights: The share of slots each tenant gets relative to others when 
+            they compete. Tenants that aren't listed have a weight of 1.
+    """
+    global _ADMISSION_CONTROLLER
+    _ADMISSION_CONTROLLER = AdmissionController(
+        max_concurrency, max_queue=max_queue, max_wait=max_wait, tenant_key=tenant_key,
+        tenant_weights=tenant_weights)
+    bump_policy_version()
+
+
+def unset_admission_control() -> None:
+    """Removes the process-wide cap. Calls already admitted finish normally."""
+    global _ADMISSION_CONTROLLER
+    _ADMISSION_CONTROLLER = None
+    bump_policy_version()
+
+
+def get_admission_controller() -> AdmissionController | None:
+    return _ADMISSION_CONTROLLER
+
+
+def get_admission_stats() -> AdmissionStats | None:
+    """
+    Returns the queue depth, wait time and load shedding counters of the admission
+    control, or `None` if it isn't set.
+    """
+    controller = _ADMISSION_CONTROLLER
+    if controller is None:
+        return None
+    return controller.stats()
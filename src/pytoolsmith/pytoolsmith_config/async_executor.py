@@ -0,0 +1,26 @@
+from concurrent.futures import Executor
+
+_ASYNC_EXECUTOR: Executor | None = None
+
+
+def get_async_executor() -> Executor | None:
+    """
+    Returns the executor that sync tools run in when called with `call_tool_async`.
+    `None` means the event loop's default executor.
+    """
+    return _ASYNC_EXECUTOR
+
+
+def set_async_executor(executor: Executor) -> None:
+    """
+    Sets the executor that sync tools run in when called with `call_tool_async`, so
+    they don't block the event loop.
+    """
+    global _ASYNC_EXECUTOR
+    _ASYNC_EXECUTOR = executor
+
+
+def unset_async_executor() -> None:
+    """Goes back to running sync tools in the event loop's default executor."""
+    global _ASYNC_EXECUTOR
+    _ASYNC_EXECUTOR = None
@@ -1,10 +1,29 @@
-from collections.abc import Callable
-from typing import TypeVar
+import asyncio
+import atexit
+from collections.abc import Awaitable, Callable, Hashable
+from concurrent.futures import Future, ThreadPoolExecutor
+import contextvars
+import threading
+from typing import Any, TypeVar
+
+from ..admission import _FairQueue
+from .admission_control import get_admission_controller
+from .policy_version import bump_policy_version
 
 T = TypeVar("T")
 
 BatchRunnerType = Callable[[list[Callable[[], T]]], list[T]]
 
+AsyncBatchRunnerType = Callable[[list[Callable[[], Awaitable[T]]]], Awaitable[list[T]]]
+
+
+BATCH_TENANT: contextvars.ContextVar[Hashable] = contextvars.ContextVar(
+    "pytoolsmith_batch_tenant", default=None)
+"""
+The tenant of the batch a batch runner is running, by the admission control's 
+`tenant_key`, so runners can share their workers fairly between tenants.
+"""
+
 
 def DEFAULT_BATCH_RUNNER(callables: list[Callable[[], T]]) -> list[T]:
     results = []
@@ -14,8 +33,153 @@ def DEFAULT_BATCH_RUNNER(callables: list[Callable[[], T]]) -> list[T]:
     return results
 
 
+class ThreadPoolBatchRunner:
+    """
+    Batch runner that runs callables in parallel on a thread pool. The pool is created 
+    on first use and shared by every batch, then shut down when the interpreter exits.
+
+    Results are returned in the same order as the callables. If a callable raises, its 
+    exception is returned in its place rather than failing the whole batch.
+
+    When admission control schedules calls by tenant, the pool is shared the same 
+    way. Callables wait in a queue of their own rather than the pool's, and a free 
+    thread takes the next one by start-time fair queueing, so one tenant's large 
+    batch can't hold up another tenant's batch behind it.
+    """
+
+    def __init__(self, max_workers: int | None = None,
+                 thread_name_prefix: str = "pytoolsmith-batch"):
+        """
+        Args:
+            max_workers: The most callables to run at once, across all batches. 
+                Defaults to the `ThreadPoolExecutor` default.
+            thread_name_prefix: Prefix for the names of the pool's threads.
+        """
+        self.max_workers = max_workers
+        self.thread_name_prefix = thread_name_prefix
+        self._executor: ThreadPoolExecutor | None = None
+        self._lock = threading.Lock()
+        self._queue = _FairQueue()
+        """Callables waiting for a thread, with their futures, by tenant."""
+
+        self._queue_lock = threading.Lock()
+        atexit.register(self.shutdown)
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        executor = self._executor
+        if executor is not None:
+            return executor
+
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers,
+                    thread_name_prefix=self.thread_name_prefix
+                )
+            return self._executor
+
+    def __call__(self, callables: list[Callable[[], T]]) -> list[T | Exception]:
+        executor = self._get_executor()
+        controller = get_admission_controller()
+        if controller is None or controller.tenant_key is None:
+            futures = [executor.submit(callable) for callable in callables]
+        else:
+            tenant = BATCH_TENANT.get()
+            futures = self._submit_fairly(
+                executor, callables, tenant, controller.tenant_weights.get(tenant, 1.0))
+
+        results = []
+        for future in futures:
+            try:
+                results.append(future.result())
+            except Exception as e:
+                results.append(e)
+        return results
+
+    def _submit_fairly(self, executor: ThreadPoolExecutor,
+                       callables: list[Callable[[], T]], tenant: Hashable,
+                       weight: float) -> list[Future]:
+        """
+        Queues the callables by tenant, and submits a job per callable that runs 
+        whichever callable is next when it starts.
+        """
+        futures: list[Future] = [Future() for _ in callables]
+        with self._queue_lock:
+            for callable, future in zip(callables, futures):
+                self._queue.push((callable, future), tenant, weight)
+        for _ in callables:
+            executor.submit(self._run_next).add_done_callback(self._cancel_next)
+        return futures
+
+    def _take_next(self) -> tuple[Callable[[], Any], Future]:
+        with self._queue_lock:
+            callable, future = self._queue.pop()
+            if not self._queue:
+                self._queue.forget_usage()
+        return callable, future
+
+    def _run_next(self) -> None:
+        callable, future = self._take_next()
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            result = callable()
+        except BaseException as e:
+            future.set_exception(e)
+        else:
+            future.set_result(result)
+
+    def _cancel_next(self, job: Future) -> None:
+        """Cancels a queued callable in place of a job the pool cancelled."""
+        if job.cancelled():
+            self._take_next()[1].cancel()
+
+    def shutdown(self, wait: bool = True) -> None:
+        """
+        Shuts down the pool, cancelling anything that hasn't started. The runner can 
+        still be used afterwards and will start a new pool.
+        """
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait, cancel_futures=True)
+
+
+class AsyncioBatchRunner:
+    """
+    Async batch runner that awaits every callable with `asyncio.gather`, keeping the
+    results in order.
+    """
+
+    def __init__(self, max_concurrency: int | None = None):
+        """
+        Args:
+            max_concurrency: The most callables to run at once. `None` runs them all
+                at the same time.
+        """
+        if max_concurrency is not None and max_concurrency < 1:
+            raise ValueError("max_concurrency must be at least 1")
+        self.max_concurrency = max_concurrency
+
+    async def __call__(self, callables: list[Callable[[], Awaitable[T]]]) -> list[T]:
+        if self.max_concurrency is None:
+            return list(await asyncio.gather(*(c() for c in callables)))
+
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def run(callable: Callable[[], Awaitable[T]]) -> T:
+            async with semaphore:
+                return await callable()
+
+        return list(await asyncio.gather(*(run(c) for c in callables)))
+
+
+DEFAULT_ASYNC_BATCH_RUNNER = AsyncioBatchRunner()
+
 SET_RUNNER: BatchRunnerType | None = None
 
+SET_ASYNC_RUNNER: AsyncBatchRunnerType | None = None
+
 
 def get_batch_runner() -> BatchRunnerType:
     if SET_RUNNER is not None:
@@ -26,8 +190,32 @@ def get_batch_runner() -> BatchRunnerType:
 def set_batch_runner(batch_runner: BatchRunnerType) -> None:
     global SET_RUNNER
     SET_RUNNER = batch_runner
+    bump_policy_version()
 
 
 def unset_batch_runner() -> None:
     global SET_RUNNER
     SET_RUNNER = None
+    bump_policy_version()
+
+
+def get_async_batch_runner() -> AsyncBatchRunnerType:
+    if SET_ASYNC_RUNNER is not None:
+        return SET_ASYNC_RUNNER
+    return DEFAULT_ASYNC_BATCH_RUNNER
+
+
+def set_async_batch_runner(batch_runner: AsyncBatchRunnerType) -> None:
+    """
+    Sets the runner used when the batch tool is called with `call_tool_async`. It is
+    given a list of async callables and should return their results in order.
+    """
+    global SET_ASYNC_RUNNER
+    SET_ASYNC_RUNNER = batch_runner
+    bump_policy_version()
+
+
+def unset_async_batch_runner() -> None:
+    global SET_ASYNC_RUNNER
+    SET_ASYNC_RUNNER = None
+    bump_policy_version()
@@ -0,0 +1,35 @@
+import threading
+
+from ..circuit_breaker import CircuitBreaker, CircuitBreakerPolicy
+from .policy_version import bump_policy_version
+
+_GROUP_BREAKERS: dict[str, CircuitBreaker] = {}
+_LOCK = threading.Lock()
+
+
+def set_tool_group_circuit_breaker(tool_group: str,
+                                   policy: CircuitBreakerPolicy) -> None:
+    """
+    Guards every tool in a `tool_group` with one shared circuit breaker, for groups 
+    that depend on the same service. Tools can also have their own breakers.
+    """
+    global _GROUP_BREAKERS
+    breaker = CircuitBreaker(policy)
+    with _LOCK:
+        _GROUP_BREAKERS = {**_GROUP_BREAKERS, tool_group: breaker}
+    bump_policy_version()
+
+
+def unset_tool_group_circuit_breaker(tool_group: str) -> None:
+    """Removes a group's circuit breaker."""
+    global _GROUP_BREAKERS
+    with _LOCK:
+        _GROUP_BREAKERS = {group: breaker for group, breaker in _GROUP_BREAKERS.items()
+                           if group != tool_group}
+    bump_policy_version()
+
+
+def get_tool_group_circuit_breaker(tool_group: str | None) -> CircuitBreaker | None:
+    if tool_group is None:
+        return None
+    return _GROUP_BREAKERS.get(tool_group)
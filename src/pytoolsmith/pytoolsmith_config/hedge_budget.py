@@ -0,0 +1,36 @@
+from ..hedging import HedgeBudget
+
+_DEFAULT_HEDGE_BUDGET = HedgeBudget()
+_HEDGE_BUDGET: HedgeBudget | None = None
+
+
+def get_hedge_budget() -> HedgeBudget:
+    """
+    Returns the budget shared by every hedged tool. Unless one has been set, hedges
+    are limited to 5% of hedgeable calls, after a burst of 10, and 10 running at once.
+    """
+    budget = _HEDGE_BUDGET
+    if budget is not None:
+        return budget
+    return _DEFAULT_HEDGE_BUDGET
+
+
+def set_hedge_budget(ratio: float, burst: int = 10, max_concurrent: int = 10) -> None:
+    """
+    Sets how much extra traffic hedged calls can add across the whole process.
+
+    Args:
+        ratio: The most hedges per hedgeable call, such as 0.05 for 5% extra calls.
+        burst: How many hedges can be made at once before the ratio applies.
+        max_concurrent: The most hedges that can run at once. Slow calls that would 
+            go over it aren't hedged.
+    """
+    global _HEDGE_BUDGET
+    _HEDGE_BUDGET = HedgeBudget(ratio=ratio, burst=burst,
+                                max_concurrent=max_concurrent)
+
+
+def unset_hedge_budget() -> None:
+    """Goes back to the default hedge budget."""
+    global _HEDGE_BUDGET
+    _HEDGE_BUDGET = None
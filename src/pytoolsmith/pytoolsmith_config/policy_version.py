@@ -0,0 +1,22 @@
+import itertools
+
+_VERSIONS = itertools.count(1)
+_POLICY_VERSION = 0
+"""
+Changes whenever a process-wide policy that tools compile into their call paths is
+set or unset, so tools know to compile them again.
+"""
+
+
+def get_policy_version() -> int:
+    return _POLICY_VERSION
+
+
+def bump_policy_version() -> None:
+    """
+    Called after changing group circuit breakers, group limits, admission control or
+    batch runners.
+    """
+    global _POLICY_VERSION
+    # `next` on a count is atomic, so concurrent changes each get a new version.
+    _POLICY_VERSION = next(_VERSIONS)
@@ -0,0 +1,51 @@
+import atexit
+from concurrent.futures import Executor, ProcessPoolExecutor
+import threading
+
+_PROCESS_POOL: Executor | None = None
+_OWNS_PROCESS_POOL = False
+_LOCK = threading.Lock()
+
+
+def get_process_pool() -> Executor:
+    """
+    Returns the pool that tools with `execution="process"` run in. Unless one has
+    been set, a `ProcessPoolExecutor` is created on first use and shut down when the
+    interpreter exits.
+    """
+    global _PROCESS_POOL, _OWNS_PROCESS_POOL
+    pool = _PROCESS_POOL
+    if pool is not None:
+        return pool
+
+    with _LOCK:
+        if _PROCESS_POOL is None:
+            _PROCESS_POOL = ProcessPoolExecutor()
+            _OWNS_PROCESS_POOL = True
+        return _PROCESS_POOL
+
+
+def set_process_pool(executor: Executor) -> None:
+    """
+    Sets the pool that tools with `execution="process"` run in, for example a 
+    `ProcessPoolExecutor` with a set number of workers. The caller is responsible for 
+    shutting it down.
+    """
+    global _PROCESS_POOL, _OWNS_PROCESS_POOL
+    unset_process_pool()
+    with _LOCK:
+        _PROCESS_POOL = executor
+        _OWNS_PROCESS_POOL = False
+
+
+def unset_process_pool() -> None:
+    """Goes back to the default pool, shutting it down if it was created by us."""
+    global _PROCESS_POOL, _OWNS_PROCESS_POOL
+    with _LOCK:
+        pool, owns_pool = _PROCESS_POOL, _OWNS_PROCESS_POOL
+        _PROCESS_POOL, _OWNS_PROCESS_POOL = None, False
+    if pool is not None and owns_pool:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+atexit.register(unset_process_pool)
@@ -0,0 +1,46 @@
+import threading
+
+from ..limits import Limiter, LimitStats, RateLimit
+from .policy_version import bump_policy_version
+
+_GROUP_LIMITERS: dict[str, Limiter] = {}
+_LOCK = threading.Lock()
+
+
+def set_tool_group_limits(tool_group: str, max_concurrency: int | None = None,
+                          rate_limit: RateLimit | None = None) -> None:
+    """
+    Limits every tool in a `tool_group`, across all libraries and threads in the 
+    process, on top of any limits the tools set themselves.
+
+    Args:
+        tool_group: The group to limit.
+        max_concurrency: The most calls to the group's tools that can run at once. 
+            Other calls wait in line.
+        rate_limit: How quickly calls to the group's tools can start.
+    """
+    global _GROUP_LIMITERS
+    limiter = Limiter(max_concurrency=max_concurrency, rate_limit=rate_limit)
+    with _LOCK:
+        _GROUP_LIMITERS = {**_GROUP_LIMITERS, tool_group: limiter}
+    bump_policy_version()
+
+
+def unset_tool_group_limits(tool_group: str) -> None:
+    """Removes the limits on a group."""
+    global _GROUP_LIMITERS
+    with _LOCK:
+        _GROUP_LIMITERS = {group: limiter for group, limiter in _GROUP_LIMITERS.items()
+                           if group != tool_group}
+    bump_policy_version()
+
+
+def get_tool_group_limiter(tool_group: str | None) -> Limiter | None:
+    if tool_group is None:
+        return None
+    return _GROUP_LIMITERS.get(tool_group)
+
+
+def get_tool_group_limit_stats() -> dict[str, LimitStats]:
+    """Returns the limit statistics of every group with limits."""
+    return {group: limiter.stats() for group, limiter in _GROUP_LIMITERS.items()}
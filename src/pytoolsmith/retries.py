@@ -0,0 +1,167 @@
+"""Retrying tool calls that fail with transient errors."""
+
+import asyncio
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
+import random
+import threading
+import time
+from typing import Any
+
+from .execution import ToolQueueTimeoutError, ToolTimeoutError
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    """
+    Describes how a tool retries failed calls, waiting longer after each attempt. Only
+    use this for tools that are safe to call again after a failure.
+    """
+
+    retry_on: tuple[type[BaseException], ...] = (ConnectionError, TimeoutError)
+    """
+    The exception types worth retrying. Anything else fails the call right away. A
+    `ToolTimeoutError` is only retried if it is listed itself, since the call has used
+    up its timeout, and a `ToolQueueTimeoutError`, from a call that timed out waiting
+    for a slot, only if that is listed, since waiting again rarely helps.
+    """
+
+    max_attempts: int = 3
+    """The most times to call the tool, including the first attempt."""
+
+    initial_delay: float = 0.1
+    """Seconds to wait before the first retry."""
+
+    multiplier: float = 2.0
+    """How much the wait grows after each retry."""
+
+    max_delay: float = 5.0
+    """The longest wait between attempts."""
+
+    jitter: float = 1.0
+    """
+    The fraction of each wait that is random, from 0 for fixed waits to 1 for "full
+    jitter", so calls that failed together don't retry together.
+    """
+
+
+@dataclass(frozen=True)
+class RetryStats:
+    """A snapshot of a tool's retry counters."""
+
+    calls: int
+
+    attempts: int
+    """Attempts across every call, including first attempts."""
+
+    retried_calls: int
+    """Calls that needed more than one attempt."""
+
+    exhausted: int
+    """Calls that still failed with a retryable error when they ran out of attempts
+    or time."""
+
+
+class Retrier:
+    """Runs calls under a `RetryPolicy`, counting their attempts."""
+
+    def __init__(self, policy: RetryPolicy):
+        if policy.max_attempts < 1:
+            raise ValueError("max_attempts must be at least 1")
+        if not 0 <= policy.jitter <= 1:
+            raise ValueError("jitter must be between 0 and 1")
+
+        self.policy = policy
+        self._retries_timeouts = ToolTimeoutError in policy.retry_on
+        self._retries_queue_timeouts = ToolQueueTimeoutError in policy.retry_on
+        self._lock = threading.Lock()
+        self._calls = 0
+        self._attempts = 0
+        self._retried_calls = 0
+        self._exhausted = 0
+
+    def _get_delay(self, attempt: int, deadline: float | None) -> float | None:
+        """
+        Returns how long to wait before the next attempt, or `None` if the call is out
+        of attempts or the wait would run past the deadline.
+        """
+        policy = self.policy
+        if attempt >= policy.max_attempts:
+            return None
+
+        delay = min(policy.max_delay,
+                    policy.initial_delay * policy.multiplier ** (attempt - 1))
+        delay -= delay * policy.jitter * random.random()
+        if deadline is not None and time.monotonic() + delay >= deadline:
+            return None
+        return delay
+
+    def _is_retried(self, error: BaseException) -> bool:
+        """Whether an error that `retry_on` matches is retried."""
+        if isinstance(error, ToolQueueTimeoutError):
+            return self._retries_queue_timeouts
+        if isinstance(error, ToolTimeoutError):
+            return self._retries_timeouts
+        return True
+
+    def _record(self, attempts: int, exhausted: bool = False) -> None:
+        with self._lock:
+            self._calls += 1
+            self._attempts += attempts
+            if attempts > 1:
+                self._retried_calls += 1
+            if exhausted:
+                self._exhausted += 1
+
+    def call(self, func: Callable[[], Any], deadline: float | None = None) -> Any:
+        """Calls the function, retrying it while it raises a retryable error."""
+        attempt = 1
+        while True:
+            try:
+                result = func()
+            except self.policy.retry_on as e:
+                if not self._is_retried(e):
+                    self._record(attempt)
+                    raise
+                delay = self._get_delay(attempt, deadline)
+                if delay is None:
+                    self._record(attempt, exhausted=True)
+                    raise
+                attempt += 1
+                time.sleep(delay)
+            except BaseException:
+                self._record(attempt)
+                raise
+            else:
+                self._record(attempt)
+                return result
+
+    async def call_async(self, func: Callable[[], Awaitable[Any]],
+                         deadline: float | None = None) -> Any:
+        """Async version of `call`."""
+        attempt = 1
+        while True:
+            try:
+                result = await func()
+            except self.policy.retry_on as e:
+                if not self._is_retried(e):
+                    self._record(attempt)
+                    raise
+                delay = self._get_delay(attempt, deadline)
+                if delay is None:
+                    self._record(attempt, exhausted=True)
+                    raise
+                attempt += 1
+                await asyncio.sleep(delay)
+            except BaseException:
+                self._record(attempt)
+                raise
+            else:
+                self._record(attempt)
+                return result
+
+    def stats(self) -> RetryStats:
+        with self._lock:
+            return RetryStats(calls=self._calls, attempts=self._attempts,
+                              retried_calls=self._retried_calls,
+                              exhausted=self._exhausted)
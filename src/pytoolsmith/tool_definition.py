@@ -1,7 +1,11 @@
-from collections.abc import Callable
+from collections.abc import Awaitable, Callable
+import contextvars
 from dataclasses import dataclass, field
 from enum import EnumType
+import functools
 import inspect
+import threading
+import time
 from types import GenericAlias, UnionType
 
 # noinspection PyUnresolvedReferences
@@ -19,16 +23,103 @@ from typing import (
 
 from typing_extensions import TypeVar
 
-from .pytoolsmith_config import get_format_map
+from .admission import AdmissionController
+from .batch_functions import build_columns, get_column_parameters
+from .caching import (
+    CACHE_MISS,
+    TAG_INDEX,
+    CachePolicy,
+    CacheStats,
+    ResultCache,
+    get_template_fields,
+    invalidate_cache_tags,
+    make_cache_key,
+    resolve_tags,
+)
+from .circuit_breaker import (
+    CircuitBreaker,
+    CircuitBreakerPolicy,
+    CircuitState,
+    combine_states,
+    enter_breakers,
+    exit_breakers,
+)
+from .execution import (
+    SingleFlight,
+    call_with_timeout,
+    call_with_timeout_async,
+    hold_until_done,
+    run_in_executor,
+)
+from .hedging import HedgePolicy, Hedger, HedgeStats
+from .hooks import CallEvent, ToolHooks, emit_schema_build, end_call, start_call
+from .latency import LatencyTracker
+from .limits import (
+    Limiter,
+    LimitStats,
+    RateLimit,
+    acquire_limiters,
+    acquire_limiters_async,
+    release_limiters,
+)
+from .process_execution import (
+    compile_async_process_invoker,
+    compile_process_invoker,
+)
+from .pytoolsmith_config import get_async_executor, get_format_map
+from .pytoolsmith_config.admission_control import get_admission_controller
+from .pytoolsmith_config.batch_runner import (
+    DEFAULT_ASYNC_BATCH_RUNNER,
+    DEFAULT_BATCH_RUNNER,
+    get_async_batch_runner,
+    get_batch_runner,
+)
+from .pytoolsmith_config.circuit_breakers import get_tool_group_circuit_breaker
+from .pytoolsmith_config.hedge_budget import get_hedge_budget
 from .pytoolsmith_config.mappings import get_type_map
-from .pytoolsmith_config.serialization import serialize_batch_tool_args
+from .pytoolsmith_config.policy_version import get_policy_version
+from .pytoolsmith_config.tool_group_limits import get_tool_group_limiter
+from .retries import Retrier, RetryPolicy, RetryStats
 from .tool_parameters import ToolParameters
+from .tool_stats import StatsRecorder, ToolStats
+from .validation import ToolArgumentValidationError, compile_argument_validator
 
 if TYPE_CHECKING:
     from .tool_library import ToolLibrary
 
 R = TypeVar("R", dict, str, list[str])
 
+_Call = Callable[[Any, dict[str, Any], float | None], Any]
+"""Makes a call with its parameters, hard-set parameters and deadline."""
+
+_AsyncCall = Callable[[Any, dict[str, Any], float | None], Awaitable[Any]]
+
+
+@dataclass(frozen=True)
+class _CallPath:
+    """
+    A tool's invokers wrapped in its policies, for the process-wide policies as of
+    `version`.
+    """
+
+    version: int
+    execute: _Call
+    """Runs the tool through its cache and policies."""
+
+    execute_async: _AsyncCall
+    run_batch: _Call | None
+    """Calls the `batch_function` with columns of parameters, if the tool has one."""
+
+    run_batch_async: _AsyncCall | None
+
+
+def _release_slots(limiters: tuple[Limiter, ...],
+                   controller: AdmissionController | None) -> None:
+    if controller is not None:
+        controller.release()
+    if limiters:
+        release_limiters(limiters)
+
 
 @dataclass
 class ToolDefinition:
@@ -68,14 +159,174 @@ class ToolDefinition:
     Can be used as a way to filter which tools the LLM gets using `subset`.
     """
 
+    validate_arguments: bool = False
+    """
+    If True, the LLM's arguments are validated against the function's signature and 
+    coerced to the annotated types (UUIDs, datetimes, enums, pydantic models, ...) 
+    before the tool runs. Invalid calls raise a `ToolArgumentValidationError`.
+    Requires pydantic.
+    """
+
+    execution: Literal["inline", "process"] = "inline"
+    """
+    Where the tool runs. `"process"` sends each call to a worker process (see 
+    `pytoolsmith_config.set_process_pool`), which suits CPU-heavy tools. The function 
+    must be importable from its module, and its arguments, injected parameters and 
+    result must be picklable.
+    """
+
+    timeout: float | None = None
+    """
+    The most seconds a call may take before a `ToolTimeoutError` is raised, in all,
+    counting waits for limits and any retries. Sync tools can't be interrupted, so a
+    timed-out call is abandoned rather than stopped.
+    """
+
+    cache: CachePolicy | None = None
+    """
+    If set, results are cached in memory and repeat calls with the same arguments are 
+    answered from the cache. Only use this for read-only tools.
+    """
+
+    cache_tags: list[str] = field(default_factory=list)
+    """
+    Tags for cached results, filled in from the call's parameters, such as
+    `["user:{user_id}"]`. Tagged results are removed when a tool that `invalidates`
+    the same tag succeeds. Requires `cache`.
+    """
+
+    invalidates: list[str] = field(default_factory=list)
+    """
+    Tags to invalidate after a successful call, filled in from the call's parameters, 
+    such as `["user:{user_id}"]` on an `update_user` tool.
+    """
+
+    single_flight: bool = False
+    """
+    If True, concurrent calls with the same arguments and injected parameters share 
+    one execution, and all of them get its result or exception. Only use this for 
+    read-only tools.
+    """
+
+    max_concurrency: int | None = None
+    """
+    The most calls of the tool that can run at once across the process. Other calls 
+    wait in line, see `get_limit_stats`. Limits for a whole `tool_group` are set with 
+    `pytoolsmith_config.set_tool_group_limits`.
+    """
+
+    rate_limit: RateLimit | None = None
+    """How quickly calls of the tool can start, across the process."""
+
+    retry: RetryPolicy | None = None
+    """
+    If set, calls that fail with a retryable error are tried again after a growing, 
+    jittered wait. Retries stop at the batch deadline.
+    """
+
+    hedge: HedgePolicy | None = None
+    """
+    If set, a call that is still running after the tool's usual latency gets a second, 
+    identical call raced against it, and the first to succeed is used. Only for 
+    idempotent tools. Hedges are capped process-wide by 
+    `pytoolsmith_config.set_hedge_budget`. Calls of a `batch_function` aren't hedged.
+    """
+
+    circuit_breaker: CircuitBreakerPolicy | None = None
+    """
+    If set, the tool stops being called after repeated failures, and calls fail right 
+    away with a `CircuitOpenError` until probe calls show it has recovered. A breaker 
+    shared by a whole `tool_group` is set with 
+    `pytoolsmith_config.set_tool_group_circuit_breaker`.
+    """
+
+    batch_dedupe: bool = True
+    """
+    If True, identical invocations of the tool within one batch only run once, and 
+    each of them gets the result. Set this to False for tools with side effects.
+    """
+
+    batch_function: Callable[..., list[Any]] | None = None
+    """
+    An optional vectorized version of the tool for the batch tool, such as 
+    `get_users_by_ids` for `get_user_by_id`. It is called once with every invocation of 
+    the tool in a batch, with a list of values for each of the tool's parameters and 
+    the injected parameters as usual. It returns one result per invocation, in order, 
+    and an item can be an exception to fail just that invocation.
+    """
+
+    hooks: list[ToolHooks] = field(default_factory=list)
+    """
+    Instrumentation hooks told about the tool's calls and schema builds, see 
+    `ToolHooks`. Hooks for every tool in a library are added with 
+    `ToolLibrary.add_hooks`.
+    """
+
     _schema_cache: dict[str, ToolParameters] = field(default_factory=dict, init=False,
                                                      repr=False)
-    """Cached versions of the schema for the tool."""
+    """Cached versions of the schema for the tool. Replaced, never mutated, so it can 
+    be read without locking."""
+
+    _lock: threading.Lock = field(default_factory=threading.Lock, init=False,
+                                  repr=False, compare=False)
 
     _tool_library: "ToolLibrary | None" = field(default=None, init=False, repr=False)
 
+    _invoke: Callable[[dict[str, Any], dict[str, Any]], Any] = field(
+        default=None, init=False, repr=False, compare=False)
+    """Compiled call path for the tool, see `_compile_invoker`."""
+
+    _invoke_async: Callable[[dict[str, Any], dict[str, Any]], Awaitable[Any]] = field(
+        default=None, init=False, repr=False, compare=False)
+    """Compiled call path for `call_tool_async`."""
+
+    _call_path: _CallPath = field(default=None, init=False, repr=False,
+                                    compare=False)
+    """The invokers wrapped in the tool's policies, see `_compile_call_path`."""
+
+    _result_cache: ResultCache | None = field(default=None, init=False, repr=False,
+                                              compare=False)
+
+    _single_flight: SingleFlight | None = field(default=None, init=False, repr=False,
+                                                compare=False)
+
+    _limiters: tuple[Limiter, ...] = field(default=(), init=False, repr=False,
+                                           compare=False)
+
+    _retrier: Retrier | None = field(default=None, init=False, repr=False,
+                                     compare=False)
+
+    _breakers: tuple[CircuitBreaker, ...] = field(default=(), init=False, repr=False,
+                                                  compare=False)
+
+    _latency: LatencyTracker = field(default_factory=LatencyTracker, init=False,
+                                     repr=False, compare=False)
+
+    _hedger: Hedger | None = field(default=None, init=False, repr=False,
+                                   compare=False)
+
+    _stats: StatsRecorder = field(default_factory=StatsRecorder, init=False,
+                                  repr=False, compare=False)
+
+    _hooks: tuple[ToolHooks, ...] = field(default=(), init=False, repr=False,
+                                          compare=False)
+    """The tool's hooks and its library's. Empty unless hooks were added, which keeps 
+    calls of tools without hooks on the fast path."""
+
+    _tag_defaults: dict[str, Any] = field(default_factory=dict, init=False,
+                                          repr=False, compare=False)
+    """The defaults of parameters used in tags, for calls that leave them out."""
+
+    _column_parameters: tuple[tuple[str, Any], ...] = field(
+        default=(), init=False, repr=False, compare=False)
+    """The parameters passed to `batch_function` as columns, with their defaults."""
+
+    _validate_item: Callable[[dict[str, Any]], dict[str, Any]] | None = field(
+        default=None, init=False, repr=False, compare=False)
+
     def __post_init__(self) -> None:
         """Validate the schema can be built after initialization."""
+        self._hooks = tuple(self.hooks)
         try:
             self.build_json_schema()
         except KeyError as e:
@@ -86,6 +337,58 @@ class ToolDefinition:
         except Exception as e:
             raise ValueError(f"Error building tool: {e}")
 
+        if self.execution not in ("inline", "process"):
+            raise ValueError(f"Invalid execution: {self.execution}")
+        if self.execution == "process" and inspect.iscoroutinefunction(self.function):
+            raise ValueError("Async tools can't use execution='process'.")
+
+        if self.cache is not None:
+            self._result_cache = ResultCache(self.cache)
+        elif self.cache_tags:
+            raise ValueError("cache_tags can only be set on tools with a cache.")
+
+        if self.single_flight:
+            self._single_flight = SingleFlight()
+
+        if self.retry is not None:
+            self._retrier = Retrier(self.retry)
+
+        if self.circuit_breaker is not None:
+            self._breakers = (CircuitBreaker(self.circuit_breaker),)
+
+        if self.hedge is not None:
+            self._hedger = Hedger(self.hedge, self._latency)
+
+        if self.max_concurrency is not None or self.rate_limit is not None:
+            self._limiters = (Limiter(max_concurrency=self.max_concurrency,
+                                      rate_limit=self.rate_limit),)
+
+        if self.batch_function is not None:
+            if self.execution == "process":
+                raise ValueError("Tools with a batch_function can't use "
+                                 "execution='process'.")
+            self._column_parameters = get_column_parameters(
+                self.function, tuple(self.injected_parameters))
+            if self.validate_arguments:
+                self._validate_item = compile_argument_validator(
+                    self.name, self.function, tuple(self.injected_parameters))
+
+        parameters = inspect.signature(self.function).parameters
+        for template in self.cache_tags + self.invalidates:
+            fields = get_template_fields(template)
+            unknown_fields = fields - set(parameters)
+            if unknown_fields:
+                names = ", ".join("{" + name + "}" for name in sorted(unknown_fields))
+                raise ValueError(f"Tag {template} uses {names}, which are not "
+                                 f"parameters of {self.name}.")
+            self._tag_defaults.update(
+                (name, parameters[name].default) for name in fields
+                if parameters[name].default is not inspect.Parameter.empty)
+
+        self._invoke = self._compile_invoker()
+        self._invoke_async = self._compile_async_invoker()
+        self._call_path = self._compile_call_path()
+
     @property
     def name(self) -> str:
         return self.function.__name__
@@ -93,6 +396,12 @@ class ToolDefinition:
     def set_tool_library(self, tool_library: "ToolLibrary"):
         self._tool_library = tool_library
 
+    def add_hooks(self, *hooks: ToolHooks) -> None:
+        """Adds instrumentation hooks to the tool, skipping ones it already has."""
+        with self._lock:
+            self._hooks += tuple(hook for hook in dict.fromkeys(hooks)
+                                 if hook not in self._hooks)
+
     def build_json_schema(
             self, schema_vals: dict[str, str] | None = None
     ) -> ToolParameters:
@@ -116,9 +425,11 @@ class ToolDefinition:
 
         # use a stringified version of the vars dict as a key to cache the schema
         var_key = str(schema_vals)
-        if var_key in self._schema_cache:
-            return self._schema_cache[var_key]
+        cached = self._schema_cache.get(var_key)
+        if cached is not None:
+            return cached
 
+        start = time.perf_counter()
         func = self.function
         additional_parameters = self.additional_parameters
 
@@ -155,7 +466,15 @@ class ToolDefinition:
         # Post process the input properties using the overwrite method
         self._replace_properties_with_overwritten_values(params.input_properties)
 
-        self._schema_cache[var_key] = params
+        with self._lock:
+            # Another thread may have built the same schema while we were working.
+            cached = self._schema_cache.get(var_key)
+            if cached is not None:
+                return cached
+            self._schema_cache = {**self._schema_cache, var_key: params}
+        if self._hooks:
+            emit_schema_build(self._hooks, self.name, schema_vals,
+                              time.perf_counter() - start, params)
         return params
 
 
@@ -197,18 +516,40 @@ class ToolDefinition:
         Calls the tool with the given parameters. 
         If `include_message` is True, will also return a user message.
         """
-        # So, for the batch tool, we need to change the hard-set 
-        # parameters to include the tool library.
-        if self.name == "batch_tool":
-            hardset_parameters = {
-                "tool_library": self._tool_library,
-                "hardset_parameters": hardset_parameters
-            }
+        result = self._execute(llm_parameters, hardset_parameters)
 
-        # Merge the library parameters with the LLM parameters
-        parameters = self._combine_parameters(llm_parameters, hardset_parameters)
+        if include_message:
+            message = self.format_message_for_call(llm_parameters, hardset_parameters)
 
-        result = self.function(**parameters)
+            return result, message
+        return result
+
+    @overload
+    async def call_tool_async(self, llm_parameters: dict[str, Any],
+                              hardset_parameters: dict[str, Any],
+                              include_message: Literal[False] = False) -> Any:
+        ...
+
+    @overload
+    async def call_tool_async(
+            self, llm_parameters: dict[str, Any],
+            hardset_parameters: dict[str, Any],
+            include_message: Literal[True] = True) -> tuple[Any, str | None]:
+        ...
+
+    async def call_tool_async(
+            self,
+            llm_parameters: dict[str, Any],
+            hardset_parameters: dict[str, Any],
+            include_message: bool = False
+    ) -> Any | tuple[Any, str | None]:
+        """
+        Calls the tool from async code. Coroutine functions are awaited directly, while
+        regular functions run in the executor set with 
+        `pytoolsmith_config.set_async_executor` so they don't block the event loop.
+        If `include_message` is True, will also return a user message.
+        """
+        result = await self._execute_async(llm_parameters, hardset_parameters)
 
         if include_message:
             message = self.format_message_for_call(llm_parameters, hardset_parameters)
@@ -216,23 +557,739 @@ class ToolDefinition:
             return result, message
         return result
 
+    def _get_timeout(self, deadline: float | None) -> float | None:
+        """The time the call has left, given the tool's timeout and any deadline."""
+        if deadline is None:
+            return self.timeout
+        remaining = deadline - time.monotonic()
+        return remaining if self.timeout is None else min(self.timeout, remaining)
+
+    def get_cache_stats(self) -> CacheStats | None:
+        """Returns the hit and miss counts of the result cache, if it has one."""
+        if self._result_cache is None:
+            return None
+        return self._result_cache.stats()
+
+    def clear_cache(self) -> None:
+        """Removes every cached result for the tool."""
+        if self._result_cache is not None:
+            self._result_cache.clear()
+
+    def _execute(self, llm_parameters: dict[str, Any],
+                 hardset_parameters: dict[str, Any],
+                 deadline: float | None = None) -> Any:
+        """
+        Runs the tool, applying its execution policies, and records the call in the 
+        tool's statistics.
+        
+        Args:
+            llm_parameters: The parameters from the LLM.
+            hardset_parameters: The hard-set parameters.
+            deadline: A `time.monotonic()` time the call must finish by, such as the 
+                deadline of the batch it's part of.
+        """
+        if self._hooks:
+            return self._execute_hooked(llm_parameters, hardset_parameters, deadline)
+
+        start = time.perf_counter()
+        try:
+            result = self._get_call_path().execute(
+                llm_parameters, hardset_parameters, deadline)
+        except Exception:
+            self._stats.record(time.perf_counter() - start, None, errored=True)
+            raise
+        self._stats.record(time.perf_counter() - start, result)
+        return result
+
+    async def _execute_async(self, llm_parameters: dict[str, Any],
+                             hardset_parameters: dict[str, Any],
+                             deadline: float | None = None) -> Any:
+        """Async version of `_execute`."""
+        if self._hooks:
+            return await self._execute_hooked_async(llm_parameters, hardset_parameters,
+                                                    deadline)
+
+        start = time.perf_counter()
+        try:
+            result = await self._get_call_path().execute_async(
+                llm_parameters, hardset_parameters, deadline)
+        except Exception:
+            self._stats.record(time.perf_counter() - start, None, errored=True)
+            raise
+        self._stats.record(time.perf_counter() - start, result)
+        return result
+
+    def _execute_hooked(self, llm_parameters: dict[str, Any],
+                        hardset_parameters: dict[str, Any],
+                        deadline: float | None) -> Any:
+        """`_execute`, telling the tool's hooks about the call."""
+        hooks = self._hooks
+        event = CallEvent(self.name, llm_parameters, hardset_parameters)
+        token = start_call(hooks, event)
+        try:
+            result = self._get_call_path().execute(
+                llm_parameters, hardset_parameters, deadline)
+        except BaseException as e:
+            end_call(hooks, event, token, error=e)
+            if isinstance(e, Exception):
+                self._stats.record(event.elapsed, None, errored=True)
+            raise
+        end_call(hooks, event, token, result)
+        self._stats.record(event.elapsed, result)
+        return result
+
+    async def _execute_hooked_async(self, llm_parameters: dict[str, Any],
+                                    hardset_parameters: dict[str, Any],
+                                    deadline: float | None) -> Any:
+        """Async version of `_execute_hooked`."""
+        hooks = self._hooks
+        event = CallEvent(self.name, llm_parameters, hardset_parameters)
+        token = start_call(hooks, event)
+        try:
+            result = await self._get_call_path().execute_async(
+                llm_parameters, hardset_parameters, deadline)
+        except BaseException as e:
+            end_call(hooks, event, token, error=e)
+            if isinstance(e, Exception):
+                self._stats.record(event.elapsed, None, errored=True)
+            raise
+        end_call(hooks, event, token, result)
+        self._stats.record(event.elapsed, result)
+        return result
+
+    def _resolve_tags(self, templates: list[str], llm_parameters: dict[str, Any],
+                      hardset_parameters: dict[str, Any]) -> tuple[str, ...]:
+        if not templates:
+            return ()
+        parameters = self._combine_parameters(llm_parameters, hardset_parameters)
+        if self._tag_defaults:
+            parameters = {**self._tag_defaults, **parameters}
+        return resolve_tags(tuple(templates), parameters)
+
+    def _execute_many(self, llm_parameter_list: list[dict[str, Any]],
+                      hardset_parameters: dict[str, Any],
+                      deadline: float | None = None) -> list[Any]:
+        """
+        Runs several calls of the tool with a single call to its `batch_function`, 
+        applying the same policies as `_execute`. Calls that fail have their exception 
+        in place of a result.
+        """
+        events = self._start_many(llm_parameter_list, hardset_parameters) \
+            if self._hooks else None
+        start = time.perf_counter()
+        results, pending, columns, keys = self._prepare_many(llm_parameter_list,
+                                                             hardset_parameters)
+        if pending:
+            generation = TAG_INDEX.generation
+            try:
+                outputs = self._get_call_path().run_batch(columns, hardset_parameters,
+                                                          deadline)
+            except Exception as e:
+                outputs = [e] * len(pending)
+            self._finish_many(llm_parameter_list, hardset_parameters, results,
+                              pending, keys, outputs, generation)
+        self._record_many(time.perf_counter() - start, results)
+        if events is not None:
+            self._end_many(events, results)
+        return results
+
+    async def _execute_many_async(self, llm_parameter_list: list[dict[str, Any]],
+                                  hardset_parameters: dict[str, Any],
+                                  deadline: float | None = None) -> list[Any]:
+        """Async version of `_execute_many`."""
+        events = self._start_many(llm_parameter_list, hardset_parameters) \
+            if self._hooks else None
+        start = time.perf_counter()
+        results, pending, columns, keys = self._prepare_many(llm_parameter_list,
+                                                             hardset_parameters)
+        if pending:
+            generation = TAG_INDEX.generation
+            try:
+                outputs = await self._get_call_path().run_batch_async(
+                    columns, hardset_parameters, deadline)
+            except Exception as e:
+                outputs = [e] * len(pending)
+            self._finish_many(llm_parameter_list, hardset_parameters, results,
+                              pending, keys, outputs, generation)
+        self._record_many(time.perf_counter() - start, results)
+        if events is not None:
+            self._end_many(events, results)
+        return results
+
+    def _start_many(self, llm_parameter_list: list[dict[str, Any]],
+                    hardset_parameters: dict[str, Any]) -> list[CallEvent]:
+        """Starts a hook event for each call of a batch function call."""
+        events = [CallEvent(self.name, llm_parameters, hardset_parameters, batched=True)
+                  for llm_parameters in llm_parameter_list]
+        for event in events:
+            start_call(self._hooks, event)
+        return events
+
+    def _end_many(self, events: list[CallEvent], results: list[Any]) -> None:
+        for event, result in zip(events, results):
+            if isinstance(result, Exception):
+                end_call(self._hooks, event, None, error=result)
+            else:
+                end_call(self._hooks, event, None, result)
+
+    def _record_many(self, elapsed: float, results: list[Any]) -> None:
+        """Records each call of a batch function call, which all took as long."""
+        for result in results:
+            self._stats.record(elapsed, result, errored=isinstance(result, Exception))
+
+    def _prepare_many(
+            self, llm_parameter_list: list[dict[str, Any]],
+            hardset_parameters: dict[str, Any]
+    ) -> tuple[list[Any], list[int], dict[str, list[Any]], list[str | None]]:
+        """
+        Answers what it can from the cache and validates the rest, returning the 
+        results so far, the positions still to run, their columns and cache keys.
+        """
+        count = len(llm_parameter_list)
+        results: list[Any] = [None] * count
+        keys: list[str | None] = [None] * count
+        to_run: list[int] = []
+        to_run_parameters: list[dict[str, Any]] = []
+
+        result_cache = self._result_cache
+        for position, llm_parameters in enumerate(llm_parameter_list):
+            if result_cache is not None:
+                key = keys[position] = make_cache_key(
+                    llm_parameters, hardset_parameters, result_cache.key_params)
+                cached = result_cache.get(key)
+                if cached is not CACHE_MISS:
+                    results[position] = cached
+                    continue
+
+            if self._validate_item is not None:
+                try:
+                    llm_parameters = self._validate_item(llm_parameters)
+                except ToolArgumentValidationError as e:
+                    results[position] = e
+                    continue
+
+            to_run.append(position)
+            to_run_parameters.append(llm_parameters)
+
+        columns, column_positions, errors = build_columns(
+            self.name, self._column_parameters, to_run_parameters)
+        for column_position, error in errors.items():
+            results[to_run[column_position]] = error
+
+        return results, [to_run[i] for i in column_positions], columns, keys
+
+    def _finish_many(self, llm_parameter_list: list[dict[str, Any]],
+                     hardset_parameters: dict[str, Any], results: list[Any],
+                     pending: list[int], keys: list[str | None], outputs: Any,
+                     generation: int) -> None:
+        """Scatters the batch function's outputs into the results and caches them."""
+        if not isinstance(outputs, list) or len(outputs) != len(pending):
+            error = ValueError(
+                f"The batch_function of {self.name} must return a list of "
+                f"{len(pending)} results."
+            )
+            outputs = [error] * len(pending)
+
+        result_cache = self._result_cache
+        for position, output in zip(pending, outputs):
+            results[position] = output
+            if isinstance(output, Exception):
+                continue
+
+            llm_parameters = llm_parameter_list[position]
+            if result_cache is not None:
+                result_cache.set(keys[position], output, self._resolve_tags(
+                    self.cache_tags, llm_parameters, hardset_parameters), generation)
+            if self.invalidates:
+                invalidate_cache_tags(self._resolve_tags(
+                    self.invalidates, llm_parameters, hardset_parameters))
+
+    def _invoke_batch(self, columns: dict[str, list[Any]],
+                      hardset_parameters: dict[str, Any]) -> Any:
+        parameters = dict(columns)
+        for name in self.injected_parameters:
+            parameters[name] = hardset_parameters[name]
+        return self.batch_function(**parameters)
+
+    async def _invoke_batch_async(self, columns: dict[str, list[Any]],
+                                  hardset_parameters: dict[str, Any]) -> Any:
+        if inspect.iscoroutinefunction(self.batch_function):
+            return await self._invoke_batch(columns, hardset_parameters)
+
+        func_call = functools.partial(contextvars.copy_context().run,
+                                      self._invoke_batch, columns, hardset_parameters)
+        return await run_in_executor(get_async_executor(), func_call)
+
+    def get_expected_latency(self) -> float | None:
+        """
+        Returns the moving average of how long the tool's successful calls have 
+        taken, in seconds, or `None` if it hasn't completed a call yet. The batch tool 
+        uses it to start the slowest invocations first. Latency is only tracked for 
+        hedged tools, and while a batch runner is set that isn't the default.
+        """
+        return self._latency.average
+
+    def _tracks_latency(self) -> bool:
+        """Whether anything reads the tool's latency, so calls need to time it."""
+        return (self._hedger is not None
+                or get_batch_runner() is not DEFAULT_BATCH_RUNNER
+                or get_async_batch_runner() is not DEFAULT_ASYNC_BATCH_RUNNER)
+
+    def _get_breakers(self) -> tuple[CircuitBreaker, ...]:
+        group_breaker = get_tool_group_circuit_breaker(self.tool_group)
+        if group_breaker is None:
+            return self._breakers
+        return (group_breaker, *self._breakers)
+
+    def get_circuit_state(self) -> CircuitState | None:
+        """
+        Returns the state of the tool's circuit breakers, counting its group's, or 
+        `None` if it has none. The tool is open if any of them is.
+        """
+        breakers = self._get_breakers()
+        if not breakers:
+            return None
+        return combine_states([breaker.state for breaker in breakers])
+
+    def _get_limiters(self) -> tuple[Limiter, ...]:
+        group_limiter = get_tool_group_limiter(self.tool_group)
+        if group_limiter is None:
+            return self._limiters
+        return (group_limiter, *self._limiters)
+
+    def _get_call_path(self) -> _CallPath:
+        """
+        Returns the tool's compiled call path, compiling it again if process-wide 
+        policies have changed since.
+        """
+        call_path = self._call_path
+        if call_path.version != get_policy_version():
+            call_path = self._call_path = self._compile_call_path()
+        return call_path
+
+    def _compile_call_path(self) -> _CallPath:
+        """
+        Chains the tool's policies around its invokers, leaving out the ones that 
+        aren't configured, so a call only pays for the policies it uses. Group circuit 
+        breakers, group limits, admission control and the batch runners are read 
+        here, once per change to them, rather than on every call.
+        """
+        version = get_policy_version()
+        breakers = self._get_breakers()
+        limiters = self._get_limiters()
+        controller = get_admission_controller()
+
+        execute = self._compile_cached(self._compile_budget(self._compile_run(
+            self._compile_chain(self._invoke, breakers, limiters, controller))))
+        execute_async = self._compile_cached_async(self._compile_budget_async(
+            self._compile_run_async(self._compile_chain_async(
+                self._invoke_async, breakers, limiters, controller))))
+        run_batch = run_batch_async = None
+        if self.batch_function is not None:
+            run_batch = self._compile_budget(self._compile_chain(
+                self._invoke_batch, breakers, limiters, controller))
+            run_batch_async = self._compile_budget_async(self._compile_chain_async(
+                self._invoke_batch_async, breakers, limiters, controller))
+        return _CallPath(version, execute, execute_async, run_batch, run_batch_async)
+
+    def _compile_budget(self, call: _Call) -> _Call:
+        """
+        Makes the tool's timeout a budget for the whole call, by turning it into a
+        deadline, or bringing the batch's deadline forward to it. Retries and waits
+        for slots then share the timeout rather than each getting all of it.
+        """
+        timeout = self.timeout
+        if timeout is None:
+            return call
+
+        def budgeted(parameters: Any, hardset_parameters: dict[str, Any],
+                     deadline: float | None) -> Any:
+            budget_deadline = time.monotonic() + timeout
+            if deadline is None or budget_deadline < deadline:
+                deadline = budget_deadline
+            return call(parameters, hardset_parameters, deadline)
+
+        return budgeted
+
+    def _compile_budget_async(self, call: _AsyncCall) -> _AsyncCall:
+        """Async version of `_compile_budget`."""
+        timeout = self.timeout
+        if timeout is None:
+            return call
+
+        async def budgeted(parameters: Any, hardset_parameters: dict[str, Any],
+                           deadline: float | None) -> Any:
+            budget_deadline = time.monotonic() + timeout
+            if deadline is None or budget_deadline < deadline:
+                deadline = budget_deadline
+            return await call(parameters, hardset_parameters, deadline)
+
+        return budgeted
+
+    def _compile_cached(self, run: _Call) -> _Call:
+        """Adds the tool's result cache and cache invalidation, if any, to a run."""
+        result_cache = self._result_cache
+        invalidates = self.invalidates
+        if result_cache is None and not invalidates:
+            return run
+
+        cache_tags = self.cache_tags
+        resolve_tags = self._resolve_tags
+
+        def execute(llm_parameters: dict[str, Any],
+                    hardset_parameters: dict[str, Any],
+                    deadline: float | None) -> Any:
+            if result_cache is None:
+                result = run(llm_parameters, hardset_parameters, deadline)
+            else:
+                key = make_cache_key(llm_parameters, hardset_parameters,
+                                     result_cache.key_params)
+                result = result_cache.get(key)
+                if result is CACHE_MISS:
+                    generation = TAG_INDEX.generation
+                    result = run(llm_parameters, hardset_parameters, deadline)
+                    result_cache.set(key, result, resolve_tags(
+                        cache_tags, llm_parameters, hardset_parameters), generation)
+
+            if invalidates:
+                invalidate_cache_tags(resolve_tags(
+                    invalidates, llm_parameters, hardset_parameters))
+            return result
+
+        return execute
+
+    def _compile_cached_async(self, run_async: _AsyncCall) -> _AsyncCall:
+        """Async version of `_compile_cached`."""
+        result_cache = self._result_cache
+        invalidates = self.invalidates
+        if result_cache is None and not invalidates:
+            return run_async
+
+        cache_tags = self.cache_tags
+        resolve_tags = self._resolve_tags
+
+        async def execute(llm_parameters: dict[str, Any],
+                          hardset_parameters: dict[str, Any],
+                          deadline: float | None) -> Any:
+            if result_cache is None:
+                result = await run_async(llm_parameters, hardset_parameters, deadline)
+            else:
+                key = make_cache_key(llm_parameters, hardset_parameters,
+                                     result_cache.key_params)
+                result = result_cache.get(key)
+                if result is CACHE_MISS:
+                    generation = TAG_INDEX.generation
+                    result = await run_async(llm_parameters, hardset_parameters,
+                                             deadline)
+                    result_cache.set(key, result, resolve_tags(
+                        cache_tags, llm_parameters, hardset_parameters), generation)
+
+            if invalidates:
+                invalidate_cache_tags(resolve_tags(
+                    invalidates, llm_parameters, hardset_parameters))
+            return result
+
+        return execute
+
+    def _compile_run(self, call: _Call) -> _Call:
+        """
+        Adds hedging of slow calls, latency tracking if anything reads it, and single 
+        flight around a compiled chain of the tool's policies.
+        """
+        hedger = self._hedger
+        if hedger is not None:
+            guarded = call
+
+            def call(parameters: Any, hardset_parameters: dict[str, Any],
+                     deadline: float | None) -> Any:
+                return hedger.call(functools.partial(guarded, parameters,
+                                                     hardset_parameters, deadline),
+                                   get_hedge_budget())
+
+        run = call
+        if self._tracks_latency():
+            latency = self._latency
+
+            def run(llm_parameters: dict[str, Any], hardset_parameters: dict[str, Any],
+                    deadline: float | None) -> Any:
+                start = time.perf_counter()
+                result = call(llm_parameters, hardset_parameters, deadline)
+                latency.record(time.perf_counter() - start)
+                return result
+
+        single_flight = self._single_flight
+        if single_flight is None:
+            return run
+
+        injected_parameters = tuple(self.injected_parameters)
+
+        def run_shared(llm_parameters: dict[str, Any],
+                       hardset_parameters: dict[str, Any],
+                       deadline: float | None) -> Any:
+            key = make_cache_key(llm_parameters, hardset_parameters,
+                                 injected_parameters)
+            return single_flight.do(
+                key, lambda: run(llm_parameters, hardset_parameters, deadline))
+
+        return run_shared
+
+    def _compile_run_async(self, call: _AsyncCall) -> _AsyncCall:
+        """Async version of `_compile_run`."""
+        hedger = self._hedger
+        if hedger is not None:
+            guarded = call
+
+            async def call(parameters: Any, hardset_parameters: dict[str, Any],
+                           deadline: float | None) -> Any:
+                return await hedger.call_async(
+                    functools.partial(guarded, parameters, hardset_parameters,
+                                      deadline),
+                    get_hedge_budget())
+
+        run = call
+        if self._tracks_latency():
+            latency = self._latency
+
+            async def run(llm_parameters: dict[str, Any],
+                          hardset_parameters: dict[str, Any],
+                          deadline: float | None) -> Any:
+                start = time.perf_counter()
+                result = await call(llm_parameters, hardset_parameters, deadline)
+                latency.record(time.perf_counter() - start)
+                return result
+
+        single_flight = self._single_flight
+        if single_flight is None:
+            return run
+
+        injected_parameters = tuple(self.injected_parameters)
+
+        async def run_shared(llm_parameters: dict[str, Any],
+                             hardset_parameters: dict[str, Any],
+                             deadline: float | None) -> Any:
+            key = make_cache_key(llm_parameters, hardset_parameters,
+                                 injected_parameters)
+            return await single_flight.do_async(
+                key, lambda: run(llm_parameters, hardset_parameters, deadline))
+
+        return run_shared
+
+    def _compile_chain(self, invoke: Callable[[Any, dict[str, Any]], Any],
+                       breakers: tuple[CircuitBreaker, ...],
+                       limiters: tuple[Limiter, ...],
+                       controller: AdmissionController | None) -> _Call:
+        """
+        Wraps an invoker in the timeout, then the limits and admission control, then 
+        retries, then the circuit breakers.
+        """
+        call = self._compile_timed(invoke)
+        if limiters or controller is not None:
+            call = self._compile_limited(call, limiters, controller)
+        if self._retrier is not None:
+            call = self._compile_retrying(call, self._retrier)
+        if breakers:
+            call = self._compile_guarded(call, breakers)
+        return call
+
+    def _compile_chain_async(
+            self, invoke_async: Callable[[Any, dict[str, Any]], Awaitable[Any]],
+            breakers: tuple[CircuitBreaker, ...], limiters: tuple[Limiter, ...],
+            controller: AdmissionController | None) -> _AsyncCall:
+        """Async version of `_compile_chain`."""
+        call = self._compile_timed_async(invoke_async)
+        if limiters or controller is not None:
+            call = self._compile_limited_async(call, limiters, controller)
+        if self._retrier is not None:
+            call = self._compile_retrying_async(call, self._retrier)
+        if breakers:
+            call = self._compile_guarded_async(call, breakers)
+        return call
+
+    def _compile_guarded(self, call: _Call,
+                         breakers: tuple[CircuitBreaker, ...]) -> _Call:
+        """
+        Only makes a call if the tool's and its group's circuit breakers allow it. A 
+        call counts once, however many times it is retried.
+        """
+        name = self.name
+
+        def guarded(parameters: Any, hardset_parameters: dict[str, Any],
+                    deadline: float | None) -> Any:
+            probes = enter_breakers(name, breakers)
+            try:
+                result = call(parameters, hardset_parameters, deadline)
+            except BaseException as e:
+                exit_breakers(breakers, probes, e)
+                raise
+            exit_breakers(breakers, probes, None)
+            return result
+
+        return guarded
+
+    def _compile_guarded_async(self, call: _AsyncCall,
+                               breakers: tuple[CircuitBreaker, ...]) -> _AsyncCall:
+        """Async version of `_compile_guarded`."""
+        name = self.name
+
+        async def guarded(parameters: Any, hardset_parameters: dict[str, Any],
+                          deadline: float | None) -> Any:
+            probes = enter_breakers(name, breakers)
+            try:
+                result = await call(parameters, hardset_parameters, deadline)
+            except BaseException as e:
+                exit_breakers(breakers, probes, e)
+                raise
+            exit_breakers(breakers, probes, None)
+            return result
+
+        return guarded
+
+    @staticmethod
+    def _compile_retrying(call: _Call, retrier: Retrier) -> _Call:
+        """Retries a call as the tool's `retry` policy allows."""
+        def retrying(parameters: Any, hardset_parameters: dict[str, Any],
+                     deadline: float | None) -> Any:
+            return retrier.call(
+                lambda: call(parameters, hardset_parameters, deadline), deadline)
+
+        return retrying
+
+    @staticmethod
+    def _compile_retrying_async(call: _AsyncCall, retrier: Retrier) -> _AsyncCall:
+        """Async version of `_compile_retrying`."""
+        async def retrying(parameters: Any, hardset_parameters: dict[str, Any],
+                           deadline: float | None) -> Any:
+            return await retrier.call_async(
+                lambda: call(parameters, hardset_parameters, deadline), deadline)
+
+        return retrying
+
+    def _compile_limited(self, call: _Call, limiters: tuple[Limiter, ...],
+                         controller: AdmissionController | None) -> _Call:
+        """
+        Makes a call once the tool's and its group's limits, and then the 
+        process-wide admission control, allow it, within the timeout. Waiting for them 
+        counts towards the timeout. A call that times out keeps its slots until it 
+        actually returns, so the limits hold even for calls that hang.
+        """
+        name = self.name
+        get_timeout = self._get_timeout
+        release_slots = functools.partial(_release_slots, limiters, controller)
+
+        def limited(parameters: Any, hardset_parameters: dict[str, Any],
+                    deadline: float | None) -> Any:
+            if limiters:
+                acquire_limiters(name, limiters, get_timeout(deadline))
+            try:
+                if controller is not None:
+                    controller.acquire(name, get_timeout(deadline),
+                                       controller.get_tenant(hardset_parameters))
+            except BaseException:
+                if limiters:
+                    release_limiters(limiters)
+                raise
+
+            with hold_until_done(release_slots):
+                return call(parameters, hardset_parameters, deadline)
+
+        return limited
+
+    def _compile_limited_async(self, call: _AsyncCall,
+                               limiters: tuple[Limiter, ...],
+                               controller: AdmissionController | None
+                               ) -> _AsyncCall:
+        """
+        Async version of `_compile_limited`. Sync tools run on a thread that can't be 
+        stopped, so one that times out or is cancelled keeps its slots until it 
+        returns.
+        """
+        name = self.name
+        get_timeout = self._get_timeout
+        release_slots = functools.partial(_release_slots, limiters, controller)
+
+        async def limited(parameters: Any, hardset_parameters: dict[str, Any],
+                          deadline: float | None) -> Any:
+            if limiters:
+                await acquire_limiters_async(name, limiters, get_timeout(deadline))
+            try:
+                if controller is not None:
+                    await controller.acquire_async(
+                        name, get_timeout(deadline),
+                        controller.get_tenant(hardset_parameters))
+            except BaseException:
+                if limiters:
+                    release_limiters(limiters)
+                raise
+
+            with hold_until_done(release_slots):
+                return await call(parameters, hardset_parameters, deadline)
+
+        return limited
+
+    def _compile_timed(self, invoke: Callable[[Any, dict[str, Any]], Any]) -> _Call:
+        """Makes a call within the tool's timeout and the deadline, if any."""
+        name = self.name
+        timeout = self.timeout
+        get_timeout = self._get_timeout
+
+        def timed(parameters: Any, hardset_parameters: dict[str, Any],
+                  deadline: float | None) -> Any:
+            if deadline is None and timeout is None:
+                return invoke(parameters, hardset_parameters)
+            return call_with_timeout(name, invoke, parameters, hardset_parameters,
+                                     get_timeout(deadline))
+
+        return timed
+
+    def _compile_timed_async(
+            self, invoke_async: Callable[[Any, dict[str, Any]], Awaitable[Any]]
+    ) -> _AsyncCall:
+        """Async version of `_compile_timed`."""
+        name = self.name
+        timeout = self.timeout
+        get_timeout = self._get_timeout
+
+        async def timed(parameters: Any, hardset_parameters: dict[str, Any],
+                        deadline: float | None) -> Any:
+            if deadline is None and timeout is None:
+                return await invoke_async(parameters, hardset_parameters)
+            return await call_with_timeout_async(name, invoke_async, parameters,
+                                                 hardset_parameters,
+                                                 get_timeout(deadline))
+
+        return timed
+
+    def get_stats(self) -> ToolStats:
+        """
+        Returns the tool's call and error counts, and histograms of its latency and 
+        result sizes.
+        """
+        return self._stats.snapshot()
+
+    def get_hedge_stats(self) -> HedgeStats | None:
+        """Returns the tool's hedging counters, or `None` if it isn't hedged."""
+        if self._hedger is None:
+            return None
+        return self._hedger.stats()
+
+    def get_retry_stats(self) -> RetryStats | None:
+        """Returns the tool's retry counters, or `None` if it doesn't retry."""
+        if self._retrier is None:
+            return None
+        return self._retrier.stats()
+
+    def get_limit_stats(self) -> LimitStats | None:
+        """
+        Returns the statistics of the tool's own concurrency and rate limits, or 
+        `None` if it has none.
+        """
+        if not self._limiters:
+            return None
+        return self._limiters[0].stats()
+
     def format_message_for_call(self, llm_parameters: dict[str, Any],
                                 hardset_parameters: dict[str, Any]) -> str | None:
         """Formats the user message for the tool call."""
-        if self.name == "batch_tool":
-            # Handle the batch tool differently:
-            msgs = []
-            for invocation in llm_parameters["invocations"]:
-                tool = self._tool_library.get_tool_from_name(invocation["name"])
-                msg = tool.format_message_for_call(
-                    llm_parameters=serialize_batch_tool_args(invocation["arguments"]),
-                    hardset_parameters=hardset_parameters
-                )
-                if msg:
-                    msgs.append(msg)
-
-            return "\n".join(msgs) if msgs else None
-
         parameters = self._combine_parameters(llm_parameters, hardset_parameters)
         message = self.user_message
         if message and "{{" in message:
@@ -243,13 +1300,73 @@ class ToolDefinition:
     def _combine_parameters(self, llm_parameters: dict[str, Any],
                             hardset_parameters: dict[str, Any]) -> dict[str, Any]:
         """Merge the library parameters with the LLM parameters"""
-        parameters = {}
-        for k, v in llm_parameters.items():
-            parameters[k] = v
+        parameters = dict(llm_parameters)
         for injected_parameter in self.injected_parameters:
             parameters[injected_parameter] = hardset_parameters[injected_parameter]
         return parameters
 
+    def _compile_invoker(self) -> Callable[[dict[str, Any], dict[str, Any]], Any]:
+        """
+        Builds the function that `call_tool` uses to run the tool. Everything that
+        doesn't depend on the call's arguments is worked out here, once, so a call only
+        has to merge the injected parameters in.
+        """
+        function = self.function
+        injected_parameters = tuple(self.injected_parameters)
+
+        if self.execution == "process":
+            return compile_process_invoker(function, injected_parameters,
+                                           self.validate_arguments)
+
+        if self.validate_arguments:
+            # The validator returns a new dictionary, so it replaces the copy below.
+            prepare = compile_argument_validator(
+                self.name, function, injected_parameters)
+        elif not injected_parameters:
+            def invoke(llm_parameters: dict[str, Any],
+                       hardset_parameters: dict[str, Any]) -> Any:
+                return function(**llm_parameters)
+
+            return invoke
+        else:
+            prepare = dict
+
+        def invoke(llm_parameters: dict[str, Any],
+                   hardset_parameters: dict[str, Any]) -> Any:
+            parameters = prepare(llm_parameters)
+            for name in injected_parameters:
+                parameters[name] = hardset_parameters[name]
+            return function(**parameters)
+
+        return invoke
+
+    def _compile_async_invoker(
+            self
+    ) -> Callable[[dict[str, Any], dict[str, Any]], Awaitable[Any]]:
+        """Builds the function that `call_tool_async` uses to run the tool."""
+        if self.execution == "process":
+            return compile_async_process_invoker(
+                self.function, tuple(self.injected_parameters), self.validate_arguments)
+
+        invoke = self._invoke
+
+        if inspect.iscoroutinefunction(self.function):
+            async def invoke_async(llm_parameters: dict[str, Any],
+                                   hardset_parameters: dict[str, Any]) -> Any:
+                return await invoke(llm_parameters, hardset_parameters)
+
+            return invoke_async
+
+        async def invoke_async(llm_parameters: dict[str, Any],
+                               hardset_parameters: dict[str, Any]) -> Any:
+            # Copy the context across so context variables behave like
+            # `asyncio.to_thread`.
+            func_call = functools.partial(contextvars.copy_context().run, invoke,
+                                          llm_parameters, hardset_parameters)
+            return await run_in_executor(get_async_executor(), func_call)
+
+        return invoke_async
+
     def _get_type_for_parameter(
             self,
             param_name: str,
@@ -1,8 +1,28 @@
-from collections import defaultdict
+from collections.abc import AsyncIterator, Callable, Iterator
 from dataclasses import asdict
-
-from .batch_tool import batch_tool_definition, batch_tool_parameters
+import functools
+import threading
+import time
+from typing import Any
+
+from .batch_tool import (
+    BatchResult,
+    batch_tool_parameters,
+    create_batch_tool_definition,
+    iter_batch,
+    iter_batch_async,
+    run_batch,
+    run_batch_async,
+)
+from .caching import CacheStats
+from .circuit_breaker import CircuitState
+from .hedging import HedgeStats
+from .hooks import ToolHooks, emit_render
+from .lazy_tool import LazyToolDefinition
+from .limits import LimitStats
+from .retries import RetryStats
 from .tool_definition import ToolDefinition
+from .tool_stats import ToolStats
 from .types.bedrock_types import (
     AwsBedrockCachePointObject,
     AwsBedrockConverseToolConfig,
@@ -15,24 +35,58 @@ from .types.gemini_types import (
 from .utils import remove_keys
 
 
+def _emits_render(format: str):
+    """Tells the library's hooks when the decorated `to_*` method renders its tools."""
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self: "ToolLibrary", *args, **kwargs):
+            if not self._hooks:
+                return method(self, *args, **kwargs)
+            start = time.perf_counter()
+            rendered = method(self, *args, **kwargs)
+            emit_render(self._hooks, format, rendered, time.perf_counter() - start)
+            return rendered
+
+        return wrapper
+
+    return decorator
+
+
 class ToolLibrary:
 
-    def __init__(self, include_batch_tool: bool = False):
+    def __init__(self, include_batch_tool: bool = False,
+                 batch_deadline: float | None = None,
+                 batch_fail_fast: bool = False):
         """
         Args:
             include_batch_tool: If true, will include the batch tool used to make
                 parallel tool calls with Claude 3.7.
+            batch_deadline: The most seconds a batch tool call may take. Invocations 
+                that haven't started by then are skipped, and running ones are timed 
+                out. Either way they are reported as errored.
+            batch_fail_fast: If true, invocations in a batch that haven't started are 
+                skipped once one of them fails. In async batches, invocations that are 
+                running are cancelled too. Running sync invocations can't be stopped, 
+                so they finish and are reported as usual.
         """
-        self._tools: dict[str, ToolDefinition] = {}
-        self._tool_groups: dict[str, list[str]] = defaultdict(list)
+        # The registry is read-mostly: writers build a new snapshot under the lock and
+        # swap it in, so readers never need to lock or see a half-applied update.
+        self._lock = threading.Lock()
+        self._tools: dict[str, ToolDefinition | LazyToolDefinition] = {}
+        self._tool_groups: dict[str, tuple[str, ...]] = {}
         """Map of groups to the tool names inside of them."""
         self._include_batch_tool = include_batch_tool
+        self._batch_deadline = batch_deadline
+        self._batch_fail_fast = batch_fail_fast
+        self._batch_tool = create_batch_tool_definition(self) \
+            if include_batch_tool else None
 
         self._schema_vars: dict[str, str] = {}
+        self._hooks: tuple[ToolHooks, ...] = ()
 
     def set_schema_vars(self, schema_vars: dict[str, str]):
         """Sets the schema variables for the library."""
-        self._schema_vars = schema_vars
+        self._schema_vars = dict(schema_vars)
 
     def get_schema_vars(self) -> dict[str, str]:
         return self._schema_vars
@@ -41,31 +95,201 @@ class ToolLibrary:
         """Clears out the schema variables for the library."""
         self._schema_vars = {}
 
-    def add_tool(self, tool: ToolDefinition):
-        if tool.name in self._tools:
-            raise ValueError(f"Duplicate tool name: {tool.name}")
+    def add_hooks(self, *hooks: ToolHooks):
+        """
+        Adds instrumentation hooks to the library, which are told when it renders its 
+        tools, and to every tool in it, including the batch tool and tools added or 
+        lazily loaded later. Tools shared with a library made by `subset` or `exclude` 
+        get the hooks in both.
+        """
+        with self._lock:
+            self._hooks += tuple(hook for hook in dict.fromkeys(hooks)
+                                 if hook not in self._hooks)
+        for entry in self._tools.values():
+            if isinstance(entry, ToolDefinition) or entry.is_loaded:
+                self._load_entry(entry).add_hooks(*self._hooks)
+        if self._batch_tool is not None:
+            self._batch_tool.add_hooks(*self._hooks)
 
+    def add_tool(self, tool: ToolDefinition):
         tool.set_tool_library(self)
+        if self._hooks:
+            tool.add_hooks(*self._hooks)
+        self._add_entry(tool)
 
-        self._tools[tool.name] = tool
+    def add_lazy(self, import_path: str, **tool_kwargs):
+        """
+        Registers a tool by its import path without importing it. The module is only
+        imported, and the `ToolDefinition` only built, the first time the tool is
+        rendered or called.
 
-        if tool.tool_group:
-            self._tool_groups[tool.tool_group].append(tool.name)
+        Args:
+            import_path: Path to the tool function, like `mypkg.billing.tools:refund`.
+            **tool_kwargs: Arguments to pass to the `ToolDefinition` when it is built,
+                such as `injected_parameters` or `tool_group`.
+        """
+        self._add_entry(LazyToolDefinition(import_path=import_path,
+                                           tool_kwargs=tool_kwargs))
+
+    def _add_entry(self, entry: ToolDefinition | LazyToolDefinition):
+        self._add_entries([entry])
+
+    def _add_entries(self, entries: list[ToolDefinition | LazyToolDefinition]):
+        """Adds entries to the registry with a single snapshot swap."""
+        with self._lock:
+            tools = dict(self._tools)
+            tool_groups = dict(self._tool_groups)
+
+            for entry in entries:
+                if entry.name in tools:
+                    raise ValueError(f"Duplicate tool name: {entry.name}")
+
+                tools[entry.name] = entry
+
+                if entry.tool_group:
+                    tool_groups[entry.tool_group] = (
+                            tool_groups.get(entry.tool_group, ()) + (entry.name,))
+
+            self._tool_groups = tool_groups
+            self._tools = tools
+
+    def _load_entry(self, entry: ToolDefinition | LazyToolDefinition) -> ToolDefinition:
+        """Returns the tool for a library entry, building lazy tools if needed."""
+        if isinstance(entry, ToolDefinition):
+            return entry
+
+        is_first_load = not entry.is_loaded
+        tool = entry.load()
+        if is_first_load:
+            tool.set_tool_library(self)
+            if self._hooks:
+                tool.add_hooks(*self._hooks)
+        return tool
+
+    def _iter_tools(self, exclude_open_circuits: bool = False):
+        for entry in self._tools.values():
+            tool = self._load_entry(entry)
+            if exclude_open_circuits and tool.get_circuit_state() == "open":
+                continue
+            yield tool
 
     def get_tool_from_name(self, name: str) -> ToolDefinition:
-        if self._include_batch_tool and name == "batch_tool":
-            batch_tool_definition.set_tool_library(self)
-            return batch_tool_definition
+        if self._batch_tool is not None and name == "batch_tool":
+            return self._batch_tool
 
-        if name not in self._tools:
+        entry = self._tools.get(name)
+        if entry is None:
             raise ValueError(f"Tool not found: {name}")
-        return self._tools[name]
+        return self._load_entry(entry)
+
+    def run_batch(self, invocations: list[dict[str, Any]],
+                  hardset_parameters: dict[str, Any]) -> list[BatchResult]:
+        """
+        Runs a batch of invocations like the batch tool, returning a `BatchResult` per 
+        invocation, in order, instead of a string. Use `BatchResult.format()` for the 
+        text the batch tool would show the LLM.
+
+        Every invocation's tool is found and its arguments parsed before anything runs, 
+        and a `ValueError` lists any that are invalid.
+
+        Args:
+            invocations: The tool invocations, each with a `name` and its `arguments` 
+                as a JSON string, in the same form the batch tool takes them.
+            hardset_parameters: The hard-set parameters to pass through.
+        """
+        return run_batch(self, hardset_parameters, invocations)
+
+    async def run_batch_async(self, invocations: list[dict[str, Any]],
+                              hardset_parameters: dict[str, Any]
+                              ) -> list[BatchResult]:
+        """Async version of `run_batch`, run with the async batch runner."""
+        return await run_batch_async(self, hardset_parameters, invocations)
+
+    def iter_batch(self, invocations: list[dict[str, Any]],
+                   hardset_parameters: dict[str, Any]) -> Iterator[BatchResult]:
+        """
+        Like `run_batch`, but yields each `BatchResult` as soon as it is ready instead 
+        of returning them all at the end.
+        """
+        return iter_batch(self, hardset_parameters, invocations)
+
+    def iter_batch_async(self, invocations: list[dict[str, Any]],
+                         hardset_parameters: dict[str, Any]
+                         ) -> AsyncIterator[BatchResult]:
+        """Async version of `iter_batch`, run with the async batch runner."""
+        return iter_batch_async(self, hardset_parameters, invocations)
+
+    def _collect_stats(self, get_stats: Callable[[ToolDefinition], Any]
+                       ) -> dict[str, Any]:
+        """
+        Collects the statistics of every loaded tool that has them. Lazy tools that 
+        haven't been loaded yet are left out rather than loaded.
+        """
+        stats = {}
+        for name, entry in self._tools.items():
+            if isinstance(entry, LazyToolDefinition):
+                if not entry.is_loaded:
+                    continue
+                entry = entry.load()
+            tool_stats = get_stats(entry)
+            if tool_stats is not None:
+                stats[name] = tool_stats
+        return stats
+
+    def get_cache_stats(self) -> dict[str, CacheStats]:
+        """
+        Returns the result cache statistics of every tool that caches its results. 
+        Lazy tools that haven't been loaded yet are left out.
+        """
+        return self._collect_stats(ToolDefinition.get_cache_stats)
+
+    def get_limit_stats(self) -> dict[str, LimitStats]:
+        """
+        Returns the concurrency and rate limit statistics of every tool with its own 
+        limits. Lazy tools that haven't been loaded yet are left out. Group limits are 
+        reported by `pytoolsmith_config.get_tool_group_limit_stats`.
+        """
+        return self._collect_stats(ToolDefinition.get_limit_stats)
+
+    def get_retry_stats(self) -> dict[str, RetryStats]:
+        """
+        Returns the retry counters, including attempts per call, of every tool with a 
+        `retry` policy. Lazy tools that haven't been loaded yet are left out.
+        """
+        return self._collect_stats(ToolDefinition.get_retry_stats)
+
+    def stats_snapshot(self) -> dict[str, ToolStats]:
+        """
+        Returns the call counts, error counts and latency and result size histograms 
+        of every loaded tool, including the batch tool. Lazy tools that haven't been 
+        loaded yet are left out. Pass the result to `format_prometheus_metrics` to 
+        export it.
+        """
+        stats = self._collect_stats(ToolDefinition.get_stats)
+        if self._batch_tool is not None:
+            stats["batch_tool"] = self._batch_tool.get_stats()
+        return stats
+
+    def get_hedge_stats(self) -> dict[str, HedgeStats]:
+        """
+        Returns the hedging counters of every tool with a `hedge` policy. Lazy tools 
+        that haven't been loaded yet are left out.
+        """
+        return self._collect_stats(ToolDefinition.get_hedge_stats)
+
+    def get_circuit_states(self) -> dict[str, CircuitState]:
+        """
+        Returns the circuit breaker state of every tool with a breaker of its own or 
+        through its group. Lazy tools that haven't been loaded yet are left out.
+        """
+        return self._collect_stats(ToolDefinition.get_circuit_state)
 
     def get_tool_names_in_group(self, group: str) -> list[str]:
         """Gets the names of all the tools in the group"""
-        if group not in self._tool_groups:
+        names = self._tool_groups.get(group)
+        if names is None:
             raise ValueError(f"Group not found: {group}")
-        return self._tool_groups[group]
+        return list(names)
 
     def get_all_tool_names(self) -> list[str]:
         """Returns a list of the names of all the tools in the library."""
@@ -80,26 +304,35 @@ class ToolLibrary:
         Returns a mapping tool names with the descriptions of the tool in the library.
         """
         return {
-            name: tool.build_json_schema(schema_vals=self._schema_vars).description
-            for name, tool in self._tools.items()
+            tool.name: tool.build_json_schema(schema_vals=self._schema_vars).description
+            for tool in self._iter_tools()
         }
 
-    def to_openai(self, *, strict_mode=True, exclude_fields: list[str] = None):
+    @_emits_render("openai")
+    def to_openai(self, *, strict_mode=True, exclude_fields: list[str] = None,
+                  exclude_open_circuits: bool = False):
         return [
             asdict(t.build_json_schema(schema_vals=self._schema_vars).to_openai(
                 strict_mode=strict_mode, exclude_fields=exclude_fields))
-            for t in self._tools.values()
+            for t in self._iter_tools(exclude_open_circuits)
         ]
 
+    @_emits_render("anthropic")
     def to_anthropic(self, *, use_cache_control: bool = False,
-                     exclude_fields: list[str] = None):
+                     exclude_fields: list[str] = None,
+                     exclude_open_circuits: bool = False):
+        """
+        Generates a list of tool definitions for Anthropic. If `exclude_open_circuits` 
+        is True, tools whose circuit breaker is open are left out, so the model isn't 
+        offered tools that would fail right away.
+        """
         tools_params = [
             batch_tool_parameters
         ] if self._include_batch_tool else []
 
         tools_params.extend([
             t.build_json_schema(schema_vals=self._schema_vars) for t in
-            self._tools.values()
+            self._iter_tools(exclude_open_circuits)
         ])
 
         ret_dict = []
@@ -114,8 +347,10 @@ class ToolLibrary:
 
         return ret_dict
 
+    @_emits_render("bedrock")
     def to_bedrock(self, use_cache_control: bool = False,
-                   exclude_fields: list[str] = None) -> dict:
+                   exclude_fields: list[str] = None,
+                   exclude_open_circuits: bool = False) -> dict:
         batch_tool_addition = [
             AwsBedrockToolSpecListObject(toolSpec=batch_tool_parameters.to_bedrock(
                 as_dict=True))
@@ -129,18 +364,22 @@ class ToolLibrary:
                               exclude_fields=exclude_fields
                           )
                       )
-                      for t in self._tools.values()
+                      for t in self._iter_tools(exclude_open_circuits)
                   ] + batch_tool_addition
         )
         if use_cache_control:
             bedrock_config.tools.append(AwsBedrockCachePointObject())
         return asdict(bedrock_config)
 
-    def to_gemini(self, exclude_fields: list[str] = None) -> list:
+    @_emits_render("gemini")
+    def to_gemini(self, exclude_fields: list[str] = None,
+                  exclude_open_circuits: bool = False) -> list:
         """
         Generates a list of tool descriptions for Gemini.
         Args:
             exclude_fields: Any fields that should be excluded from the definitions.
+            exclude_open_circuits: If True, tools whose circuit breaker is open are 
+                left out.
 
         Returns:
 
@@ -150,7 +389,7 @@ class ToolLibrary:
 
         tool_list = []
 
-        for tool in self._tools.values():
+        for tool in self._iter_tools(exclude_open_circuits):
             tool_def = tool.build_json_schema(schema_vals=self._schema_vars)
 
             tool_list.append(
@@ -183,21 +422,21 @@ class ToolLibrary:
         Will shadow the original library in terms of having the batch tool.
         """
         names = names or []
+        tools = self._tools
 
         all_accepted_tool_names = set(names)
         if groups:
             for group in groups:
                 all_accepted_tool_names.update(self.get_tool_names_in_group(group))
 
-        if not all(name in self._tools for name in all_accepted_tool_names):
+        if not all(name in tools for name in all_accepted_tool_names):
             raise ValueError(
                 f"Not all tools in {', '.join(all_accepted_tool_names)} are in the "
                 f"library."
             )
 
-        subset = ToolLibrary(include_batch_tool=self._include_batch_tool)
-        for name in all_accepted_tool_names:
-            subset.add_tool(self.get_tool_from_name(name))
+        subset = self._new_empty_library()
+        subset._add_entries([tools[name] for name in all_accepted_tool_names])
         return subset
 
     def exclude(self, names: list[str] | None = None,
@@ -210,7 +449,8 @@ class ToolLibrary:
         """
 
         # Start with the full set of tool names, then remove there
-        all_accepted_tool_names = set(self.get_all_tool_names())
+        tools = self._tools
+        all_accepted_tool_names = set(tools)
 
         names_to_remove = set(names or [])
 
@@ -221,7 +461,14 @@ class ToolLibrary:
             if name in all_accepted_tool_names:
                 all_accepted_tool_names.remove(name)
 
-        subset = ToolLibrary(include_batch_tool=self._include_batch_tool)
-        for name in all_accepted_tool_names:
-            subset.add_tool(self.get_tool_from_name(name))
+        subset = self._new_empty_library()
+        subset._add_entries([tools[name] for name in all_accepted_tool_names])
         return subset
+
+    def _new_empty_library(self) -> "ToolLibrary":
+        """Returns an empty library with the same batch tool settings and hooks."""
+        library = ToolLibrary(include_batch_tool=self._include_batch_tool,
+                              batch_deadline=self._batch_deadline,
+                              batch_fail_fast=self._batch_fail_fast)
+        library.add_hooks(*self._hooks)
+        return library
@@ -0,0 +1,279 @@
+"""
+Per-tool call statistics. Each thread records into its own shard, so recording never
+waits on a lock, and shards are merged when a snapshot is taken. A thread's shard is
+folded into its recorder's totals once the thread ends.
+"""
+
+from bisect import bisect_left
+from dataclasses import dataclass
+import threading
+from typing import Any
+import weakref
+
+from .latency import LATENCY_BOUNDS, LATENCY_BUCKETS, latency_bucket
+
+_MIN_SIZE = 16
+_SIZE_GROWTH = 2
+_SIZE_BUCKETS = 22
+"""Enough buckets to reach 32 MiB. Larger results share the last one."""
+
+
+SIZE_BOUNDS = tuple(_MIN_SIZE * _SIZE_GROWTH ** i for i in range(_SIZE_BUCKETS))
+_SIZE_LIMITS = SIZE_BOUNDS[:-1]
+
+_UNSIZED_TYPES = frozenset({dict, list, tuple, int, float, bool, type(None)})
+"""Common result types that aren't sized, so they skip `get_result_size`."""
+
+
+@dataclass(frozen=True)
+class Histogram:
+    """
+    A log-bucketed histogram. Bucket `i` counts values up to `bounds[i]`, and the last
+    bucket also counts everything above it. Histograms with the same bounds, such as
+    a tool's latency in several processes, can be merged.
+    """
+
+    bounds: tuple[float, ...]
+    counts: tuple[int, ...]
+    sum: float
+
+    @property
+    def count(self) -> int:
+        return sum(self.counts)
+
+    @property
+    def mean(self) -> float:
+        count = self.count
+        return self.sum / count if count else 0.0
+
+    def quantile(self, q: float) -> float | None:
+        """
+        Returns the upper bound of the bucket that the `q` quantile falls in, or
+        `None` if the histogram is empty.
+        """
+        count = self.count
+        if not count:
+            return None
+        seen = 0
+        for bound, bucket_count in zip(self.bounds, self.counts):
+            seen += bucket_count
+            if seen >= q * count:
+                return bound
+        return self.bounds[-1]
+
+    def merge(self, other: "Histogram") -> "Histogram":
+        if self.bounds != other.bounds:
+            raise ValueError("Only histograms with the same bounds can be merged")
+        return Histogram(bounds=self.bounds,
+                         counts=tuple(a + b for a, b in zip(self.counts, other.counts)),
+                         sum=self.sum + other.sum)
+
+
+@dataclass(frozen=True)
+class ToolStats:
+    """A snapshot of a tool's call statistics."""
+
+    calls: int
+    """Calls of the tool, from `call_tool`, `call_tool_async` and batches, including
+    cache hits."""
+
+    errors: int
+    """Calls that raised, or failed within a batch."""
+
+    latency: Histogram
+    """How long calls took, in seconds."""
+
+    result_size: Histogram
+    """The size of string and bytes results, in bytes. Other results aren't
+    counted."""
+
+    @property
+    def error_rate(self) -> float:
+        return self.errors / self.calls if self.calls else 0.0
+
+    def merge(self, other: "ToolStats") -> "ToolStats":
+        return ToolStats(calls=self.calls + other.calls,
+                         errors=self.errors + other.errors,
+                         latency=self.latency.merge(other.latency),
+                         result_size=self.result_size.merge(other.result_size))
+
+
+def get_result_size(result: Any) -> int | None:
+    """Returns the size of a string or bytes result in bytes, or `None` otherwise."""
+    if isinstance(result, str):
+        # `isascii` is constant time, so only non-ASCII results are encoded.
+        return len(result) if result.isascii() else len(result.encode())
+    if isinstance(result, (bytes, bytearray)):
+        return len(result)
+    return None
+
+
+class _Shard:
+    """The counters of one thread. Only that thread writes to them."""
+
+    __slots__ = ("calls", "errors", "latency_counts", "latency_sum", "size_counts",
+                 "size_sum")
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.latency_counts = [0] * LATENCY_BUCKETS
+        self.latency_sum = 0.0
+        self.size_counts = [0] * _SIZE_BUCKETS
+        self.size_sum = 0
+
+    def add(self, other: "_Shard") -> None:
+        self.calls += other.calls
+        self.errors += other.errors
+        for i, count in enumerate(other.latency_counts):
+            self.latency_counts[i] += count
+        self.latency_sum += other.latency_sum
+        for i, count in enumerate(other.size_counts):
+            self.size_counts[i] += count
+        self.size_sum += other.size_sum
+
+
+class _ShardOwner:
+    """
+    Kept only in a thread's locals, so it is collected when the thread ends, which
+    retires the thread's shard.
+    """
+
+    __slots__ = ("__weakref__",)
+
+
+def _retire_shard(recorder_ref: "weakref.ref[StatsRecorder]", shard: _Shard) -> None:
+    recorder = recorder_ref()
+    if recorder is not None:
+        recorder._retire(shard)
+
+
+class _LocalShard(threading.local):
+    """
+    A recorder's shard for the current thread. `threading.local` runs `__init__` the
+    first time each thread touches it, so recording never has to check for a shard.
+    """
+
+    def __init__(self, recorder_ref: "weakref.ref[StatsRecorder]"):
+        self.shard = shard = _Shard()
+        self.owner = owner = _ShardOwner()
+        weakref.finalize(owner, _retire_shard, recorder_ref, shard).atexit = False
+        recorder = recorder_ref()
+        if recorder is not None:
+            with recorder._lock:
+                recorder._shards.add(shard)
+
+
+class StatsRecorder:
+    """Records a tool's calls into per-thread shards."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._shards: set[_Shard] = set()
+        # The totals of threads that have ended.
+        self._retired = _Shard()
+        self._local = _LocalShard(weakref.ref(self))
+
+    def _retire(self, shard: _Shard) -> None:
+        with self._lock:
+            self._shards.discard(shard)
+            self._retired.add(shard)
+
+    def record(self, seconds: float, result: Any, errored: bool = False) -> None:
+        shard = self._local.shard
+        shard.calls += 1
+        shard.latency_counts[latency_bucket(seconds)] += 1
+        shard.latency_sum += seconds
+        if errored:
+            shard.errors += 1
+            return
+
+        result_type = result.__class__
+        if result_type is str and result.isascii():
+            size = len(result)
+        elif result_type in _UNSIZED_TYPES:
+            return
+        else:
+            size = get_result_size(result)
+            if size is None:
+                return
+        shard.size_counts[bisect_left(_SIZE_LIMITS, size)] += 1
+        shard.size_sum += size
+
+    def snapshot(self) -> ToolStats:
+        """
+        Merges the shards. Calls being recorded at the same time may be counted in
+        some totals and not yet in others.
+        """
+        total = _Shard()
+        # The lock keeps a shard from being retired while it is added, which would
+        # count it twice.
+        with self._lock:
+            total.add(self._retired)
+            for shard in self._shards:
+                total.add(shard)
+
+        return ToolStats(
+            calls=total.calls,
+            errors=total.errors,
+            latency=Histogram(bounds=LATENCY_BOUNDS,
+                              counts=tuple(total.latency_counts),
+                              sum=total.latency_sum),
+            result_size=Histogram(bounds=SIZE_BOUNDS, counts=tuple(total.size_counts),
+                                  sum=total.size_sum),
+        )
+
+
+def _escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_histogram(lines: list[str], name: str, tool_label: str,
+                      histogram: Histogram, step: int) -> None:
+    """
+    Adds a histogram's samples, with cumulative buckets at every `step`-th bound. The
+    last bound is left out, since its bucket also counts larger values.
+    """
+    cumulative = 0
+    for i, (bound, count) in enumerate(zip(histogram.bounds, histogram.counts)):
+        cumulative += count
+        if i % step == 0 and i < len(histogram.bounds) - 1:
+            lines.append(f'{name}_bucket{{{tool_label},le="{bound:.6g}"}} {cumulative}')
+    lines.append(f'{name}_bucket{{{tool_label},le="+Inf"}} {cumulative}')
+    lines.append(f"{name}_sum{{{tool_label}}} {histogram.sum:.6g}")
+    lines.append(f"{name}_count{{{tool_label}}} {cumulative}")
+
+
+def format_prometheus_metrics(stats: dict[str, ToolStats],
+                              namespace: str = "pytoolsmith") -> str:
+    """
+    Formats tool statistics, such as those from `ToolLibrary.stats_snapshot()`, in
+    the Prometheus text exposition format, to serve from a `/metrics` endpoint.
+    Latency buckets are reported at every doubling, from 0.1 ms to 52 seconds.
+    """
+    calls = f"{namespace}_tool_calls_total"
+    errors = f"{namespace}_tool_errors_total"
+    latency = f"{namespace}_tool_latency_seconds"
+    size = f"{namespace}_tool_result_size_bytes"
+    lines = [
+        f"# HELP {calls} Calls of the tool, including cache hits.",
+        f"# TYPE {calls} counter",
+        *(f'{calls}{{tool="{_escape_label(name)}"}} {tool_stats.calls}'
+          for name, tool_stats in stats.items()),
+        f"# HELP {errors} Calls of the tool that failed.",
+        f"# TYPE {errors} counter",
+        *(f'{errors}{{tool="{_escape_label(name)}"}} {tool_stats.errors}'
+          for name, tool_stats in stats.items()),
+        f"# HELP {latency} How long calls of the tool took.",
+        f"# TYPE {latency} histogram",
+    ]
+    for name, tool_stats in stats.items():
+        _format_histogram(lines, latency, f'tool="{_escape_label(name)}"',
+                          tool_stats.latency, step=4)
+
+    lines += [f"# HELP {size} The size of the tool's string and bytes results.",
+              f"# TYPE {size} histogram"]
+    for name, tool_stats in stats.items():
+        _format_histogram(lines, size, f'tool="{_escape_label(name)}"',
+                          tool_stats.result_size, step=1)
+    return "\n".join(lines) + "\n"
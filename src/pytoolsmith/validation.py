@@ -0,0 +1,140 @@
+"""
+Opt-in validation and coercion of LLM arguments before a tool runs. Requires pydantic,
+which is only imported when a tool turns validation on.
+"""
+
+from collections.abc import Callable
+from functools import cache
+import inspect
+from typing import Any
+
+_PASS_THROUGH = object()
+"""Marks a parameter whose type pydantic can't validate, so its value is used as-is."""
+
+_INJECTED = object()
+"""Marks a parameter that is injected, so any value from the LLM is dropped."""
+
+
+class ToolArgumentValidationError(ValueError):
+    """Raised when the LLM's arguments for a tool don't match its signature."""
+
+    def __init__(self, tool_name: str, errors: list[dict[str, Any]]):
+        self.tool_name = tool_name
+        self.errors = errors
+        """One entry per problem, each with a `loc` tuple, a `msg` and a `type`."""
+
+        details = "; ".join(
+            f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}"
+            for error in errors
+        )
+        super().__init__(f"Invalid arguments for {tool_name}: {details}")
+
+
+def _import_pydantic():
+    try:
+        import pydantic
+    except ImportError:
+        raise ImportError(
+            "Argument validation requires pydantic. Install it with "
+            "`pip install pydantic`."
+        )
+    return pydantic
+
+
+@cache
+def _get_cached_type_adapter(annotation: Any) -> Any:
+    return _build_type_adapter(annotation)
+
+
+def _build_type_adapter(annotation: Any) -> Any:
+    pydantic = _import_pydantic()
+    try:
+        return pydantic.TypeAdapter(annotation)
+    except (pydantic.PydanticSchemaGenerationError, pydantic.PydanticUserError):
+        # Custom types from the type map (e.g. ObjectId) and pydantic v1 models
+        # can't be validated by pydantic v2, so they are passed through untouched.
+        return _PASS_THROUGH
+
+
+def get_type_adapter(annotation: Any) -> Any:
+    """Returns a pydantic `TypeAdapter` for the annotation, shared across tools."""
+    try:
+        return _get_cached_type_adapter(annotation)
+    except TypeError:
+        # Unhashable annotations can't be cached.
+        return _build_type_adapter(annotation)
+
+
+def compile_argument_validator(
+        tool_name: str,
+        function: Callable[..., Any],
+        injected_parameters: tuple[str, ...],
+) -> Callable[[dict[str, Any]], dict[str, Any]]:
+    """
+    Builds a function that validates and coerces the LLM's arguments for a tool in a
+    single pass, raising a `ToolArgumentValidationError` listing every problem.
+
+    The parameters and annotations are read from the signature the same way the JSON
+    schema is built, so the validator accepts what the schema describes.
+    """
+    pydantic = _import_pydantic()
+
+    adapters: dict[str, Any] = {}
+    required: list[str] = []
+    accepts_extra = False
+
+    for param_name, param_info in inspect.signature(function).parameters.items():
+        if param_name in injected_parameters:
+            adapters[param_name] = _INJECTED
+            continue
+        if param_info.kind is inspect.Parameter.VAR_KEYWORD:
+            accepts_extra = True
+            continue
+        if param_info.kind is inspect.Parameter.VAR_POSITIONAL:
+            continue
+
+        if param_info.default is inspect.Parameter.empty:
+            required.append(param_name)
+
+        if param_info.annotation is inspect.Parameter.empty:
+            adapters[param_name] = _PASS_THROUGH
+        else:
+            adapters[param_name] = get_type_adapter(param_info.annotation)
+
+    required_parameters = tuple(required)
+    validation_error = pydantic.ValidationError
+
+    def validate(llm_parameters: dict[str, Any]) -> dict[str, Any]:
+        parameters = {}
+        errors = []
+
+        for name, value in llm_parameters.items():
+            adapter = adapters.get(name)
+            if adapter is None:
+                if accepts_extra:
+                    parameters[name] = value
+                else:
+                    errors.append({"loc": (name,), "msg": "Unexpected argument",
+                                   "type": "unexpected_argument"})
+            elif adapter is _PASS_THROUGH:
+                parameters[name] = value
+            elif adapter is not _INJECTED:
+                try:
+                    parameters[name] = adapter.validate_python(value)
+                except validation_error as e:
+                    errors.extend(
+                        {"loc": (name, *error["loc"]), "msg": error["msg"],
+                         "type": error["type"]}
+                        for error in e.errors(include_url=False)
+                    )
+
+        for name in required_parameters:
+            if name not in llm_parameters:
+                errors.append({"loc": (name,), "msg": "Field required",
+                               "type": "missing"})
+
+        if errors:
+            raise ToolArgumentValidationError(tool_name, errors)
+        return parameters
+
+    return validate
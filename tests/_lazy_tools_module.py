@@ -0,0 +1,10 @@
+"""Module only imported by the lazy registration tests."""
+
+
+def refund(order_id: str, tenant_id: str) -> str:
+    """
+    Refunds an order.
+    Args:
+        order_id: The order to refund.
+    """
+    return f"Refunded {order_id} for {tenant_id}"
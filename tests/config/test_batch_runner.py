@@ -1,3 +1,9 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
 from pytoolsmith.pytoolsmith_config import batch_runner
 
 
@@ -117,3 +123,71 @@ def test_batch_runner_with_different_return_types():
 
     # Check that return values with different types were collected correctly
     assert output == [42, "hello", [1, 2, 3]]
+
+
+def test_asyncio_batch_runner_respects_max_concurrency():
+    running = 0
+    max_running = 0
+
+    def make_callable(i):
+        async def func():
+            nonlocal running, max_running
+            running += 1
+            max_running = max(max_running, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+            return i
+
+        return func
+
+    runner = batch_runner.AsyncioBatchRunner(max_concurrency=3)
+    output = asyncio.run(runner([make_callable(i) for i in range(10)]))
+
+    assert output == list(range(10))
+    assert max_running == 3
+
+    with pytest.raises(ValueError):
+        batch_runner.AsyncioBatchRunner(max_concurrency=0)
+
+
+def test_set_and_unset_async_batch_runner():
+    runner = batch_runner.AsyncioBatchRunner(max_concurrency=1)
+
+    batch_runner.set_async_batch_runner(runner)
+    assert batch_runner.get_async_batch_runner() is runner
+
+    batch_runner.unset_async_batch_runner()
+    assert (batch_runner.get_async_batch_runner()
+            is batch_runner.DEFAULT_ASYNC_BATCH_RUNNER)
+
+
+def test_thread_pool_batch_runner():
+    runner = batch_runner.ThreadPoolBatchRunner(max_workers=4)
+
+    def sleep_and_return(i):
+        def func():
+            time.sleep(0.05)
+            if i == 3:
+                raise ValueError("bad item")
+            return threading.current_thread().name
+
+        return func
+
+    start = time.perf_counter()
+    output = runner([sleep_and_return(i) for i in range(8)])
+
+    # Two rounds of four, rather than eight in a row.
+    assert time.perf_counter() - start < 0.3
+    assert isinstance(output[3], ValueError)
+    assert all(name.startswith("pytoolsmith-batch")
+               for i, name in enumerate(output) if i != 3)
+
+    # The same pool is reused between batches.
+    executor = runner._executor
+    runner([sleep_and_return(0)])
+    assert runner._executor is executor
+
+    runner.shutdown()
+    assert runner._executor is None
+    assert runner([lambda: "restarted"]) == ["restarted"]
+    runner.shutdown()
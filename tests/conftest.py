@@ -1,8 +1,14 @@
+from collections.abc import Callable
+import threading
+import time
+
 from pydantic import BaseModel
 from pydantic.v1 import BaseModel as BaseModelV1
 import pytest
 
-from pytoolsmith import pytoolsmith_config
+from pytoolsmith import ToolDefinition, ToolLibrary, pytoolsmith_config
+
+USERS = {"1": "Ada", "2": "Grace", "3": "Edsger"}
 
 
 @pytest.fixture(autouse=True)
@@ -55,3 +61,161 @@ def pydantic_company_model_v1() -> type[BaseModelV1]:
         employees: list[User]
 
     return Company
+
+
+@pytest.fixture
+def failing_tool() -> Callable[..., tuple[ToolDefinition, dict]]:
+    """
+    Returns a builder for tools that raise a `ConnectionError` until their state is
+    marked healthy.
+    """
+
+    def build(**tool_kwargs) -> tuple[ToolDefinition, dict]:
+        state = {"calls": 0, "healthy": False}
+
+        def fetch(x: int) -> int:
+            state["calls"] += 1
+            if not state["healthy"]:
+                raise ConnectionError("downstream is down")
+            return x
+
+        return ToolDefinition(function=fetch, **tool_kwargs), state
+
+    return build
+
+
+@pytest.fixture
+def flaky_tool() -> Callable[..., tuple[ToolDefinition, list]]:
+    """Returns a builder for tools whose first few attempts fail."""
+
+    def build(failures: int, error: type[Exception] = ConnectionError,
+              **tool_kwargs) -> tuple[ToolDefinition, list]:
+        attempts = []
+
+        def fetch(x: int) -> int:
+            attempts.append(x)
+            if len(attempts) <= failures:
+                raise error("downstream is flaky")
+            return x
+
+        return ToolDefinition(function=fetch, **tool_kwargs), attempts
+
+    return build
+
+
+@pytest.fixture
+def sometimes_slow_tool() -> Callable[..., tuple[ToolDefinition, list]]:
+    """
+    Returns a builder for tools whose calls with the given numbers, counting
+    from 1, are slow.
+    """
+
+    def build(slow_calls: set[int], **tool_kwargs) -> tuple[ToolDefinition, list]:
+        calls = []
+        lock = threading.Lock()
+
+        def fetch(x: int) -> str:
+            with lock:
+                calls.append(x)
+                call_number = len(calls)
+            if call_number in slow_calls:
+                time.sleep(0.3)
+                return "slow"
+            return "fast"
+
+        return ToolDefinition(function=fetch, **tool_kwargs), calls
+
+    return build
+
+
+@pytest.fixture
+def counting_tool() -> Callable[..., tuple[ToolDefinition, list]]:
+    """Returns a builder for tools that count their calls, for testing caches."""
+
+    def build(**tool_kwargs) -> tuple[ToolDefinition, list]:
+        calls = []
+
+        def get_account(account_id: str, fields: list[str] | None = None,
+                        tenant_id: str = "") -> str:
+            calls.append(account_id)
+            return f"{tenant_id}/{account_id}/{len(calls)}"
+
+        return ToolDefinition(function=get_account, injected_parameters=["tenant_id"],
+                              **tool_kwargs), calls
+
+    return build
+
+
+@pytest.fixture
+def blocking_tool() -> Callable[..., tuple[ToolDefinition, list, threading.Event]]:
+    """
+    Returns a builder for tools whose calls block until the returned event is set.
+    Calls for the report ID "bad" then raise a `ValueError`.
+    """
+
+    def build(**tool_kwargs) -> tuple[ToolDefinition, list, threading.Event]:
+        calls = []
+        release = threading.Event()
+
+        def get_report(report_id: str, tenant_id: str = "") -> str:
+            calls.append(report_id)
+            release.wait(timeout=5)
+            if report_id == "bad":
+                raise ValueError("Report not found")
+            return f"{tenant_id}/{report_id}/{len(calls)}"
+
+        return ToolDefinition(function=get_report, injected_parameters=["tenant_id"],
+                              **tool_kwargs), calls, release
+
+    return build
+
+
+@pytest.fixture
+def user_library() -> Callable[..., tuple[ToolLibrary, list]]:
+    """
+    Returns a builder for libraries with a batch tool and a user lookup that can only
+    run through its batch function, along with the batch function's calls.
+    """
+
+    def build(**tool_kwargs) -> tuple[ToolLibrary, list]:
+        bulk_calls = []
+
+        def get_user(user_id: str, uppercase: bool = False, tenant_id: str = "") -> str:
+            raise AssertionError("The batch tool should use the batch function")
+
+        def get_users(user_id: list[str], uppercase: list[bool],
+                      tenant_id: str) -> list[str | Exception]:
+            bulk_calls.append((user_id, uppercase, tenant_id))
+            results = []
+            for uid, upper in zip(user_id, uppercase):
+                if uid not in USERS:
+                    results.append(KeyError(f"No user {uid}"))
+                else:
+                    results.append(USERS[uid].upper() if upper else USERS[uid])
+            return results
+
+        def square(x: int) -> str:
+            return str(x * x)
+
+        library = ToolLibrary(include_batch_tool=True)
+        library.add_tool(ToolDefinition(function=get_user, batch_function=get_users,
+                                        injected_parameters=["tenant_id"],
+                                        **tool_kwargs))
+        library.add_tool(ToolDefinition(function=square))
+        return library, bulk_calls
+
+    return build
+
+
+@pytest.fixture
+def wait_for() -> Callable[[Callable[[], bool]], None]:
+    """Returns a function that waits up to 5 seconds for a condition to become true."""
+
+    def wait(condition: Callable[[], bool]) -> None:
+        for _ in range(500):
+            if condition():
+                return
+            threading.Event().wait(0.01)
+        raise AssertionError("Condition never became true")
+
+    return wait
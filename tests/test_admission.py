@@ -0,0 +1,255 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import time
+
+import pytest
+
+from pytoolsmith import (
+    ToolDefinition,
+    ToolLibrary,
+    ToolOverloadedError,
+    ToolTimeoutError,
+    pytoolsmith_config,
+)
+
+
+@pytest.fixture(autouse=True)
+def _reset_admission_control():
+    yield
+    pytoolsmith_config.unset_admission_control()
+
+
+def test_caps_calls_across_tools():
+    lock = threading.Lock()
+    running = peak = 0
+
+    def _track() -> None:
+        nonlocal running, peak
+        with lock:
+            running += 1
+            peak = max(peak, running)
+        time.sleep(0.02)
+        with lock:
+            running -= 1
+
+    def lookup_a() -> str:
+        _track()
+        return "a"
+
+    def lookup_b() -> str:
+        _track()
+        return "b"
+
+    library = ToolLibrary(include_batch_tool=True)
+    library.add_tool(ToolDefinition(function=lookup_a))
+    library.add_tool(ToolDefinition(function=lookup_b))
+    pytoolsmith_config.set_admission_control(max_concurrency=2)
+    pytoolsmith_config.set_batch_runner(
+        pytoolsmith_config.ThreadPoolBatchRunner(max_workers=4))
+    try:
+        batch = [{"name": name, "arguments": "{}"}
+                 for name in ["lookup_a", "lookup_b"] * 2]
+        with ThreadPoolExecutor(max_workers=3) as pool:
+            runs = list(pool.map(lambda _: library.run_batch(batch, {}), range(3)))
+    finally:
+        pytoolsmith_config.unset_batch_runner()
+
+    assert all(not result.errored for results in runs for result in results)
+    assert peak == 2
+    stats = pytoolsmith_config.get_admission_stats()
+    assert (stats.active, stats.queued) == (0, 0)
+    assert stats.peak_queued > 0 and stats.max_wait_time > 0
+    assert stats.admitted == 6 and stats.shed == 0
+
+
+def test_batch_tool_calls_dont_take_a_slot():
+    def lookup(x: int) -> int:
+        return x
+
+    library = ToolLibrary(include_batch_tool=True)
+    library.add_tool(ToolDefinition(function=lookup))
+    batch = library.get_tool_from_name("batch_tool")
+    pytoolsmith_config.set_admission_control(max_concurrency=1, max_wait=1)
+    invocations = {"invocations": [{"name": "lookup", "arguments": '{"x": 1}'},
+                                   {"name": "lookup", "arguments": '{"x": 2}'}]}
+    expected = "#0 (lookup) Result: 1\n#1 (lookup) Result: 2"
+
+    assert batch.call_tool(invocations, {}) == expected
+    assert asyncio.run(batch.call_tool_async(invocations, {})) == expected
+
+    # More concurrent batches than slots still finish.
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        assert list(pool.map(lambda _: batch.call_tool(invocations, {}),
+                             range(3))) == [expected] * 3
+    assert pytoolsmith_config.get_admission_stats().admitted == 10
+
+
+def test_sheds_load_when_the_queue_is_full(blocking_tool):
+    tool, _, release = blocking_tool()
+    library = ToolLibrary()
+    library.add_tool(tool)
+    pytoolsmith_config.set_admission_control(max_concurrency=1, max_queue=0)
+
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        running = pool.submit(tool.call_tool, {"report_id": "r"}, {"tenant_id": "t"})
+        while pytoolsmith_config.get_admission_stats().active == 0:
+            time.sleep(0.001)
+
+        results = library.run_batch([{"name": "get_report",
+                                      "arguments": '{"report_id": "s"}'}],
+                                    {"tenant_id": "t"})
+        assert results[0].errored
+        assert results[0].result.startswith("Too many tool calls are running")
+        release.set()
+        assert running.result() == "t/r/1"
+
+    assert pytoolsmith_config.get_admission_stats().shed == 1
+
+
+def test_sheds_calls_that_wait_too_long(blocking_tool):
+    tool, _, release = blocking_tool()
+    pytoolsmith_config.set_admission_control(max_concurrency=1, max_wait=0.02)
+
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        running = pool.submit(tool.call_tool, {"report_id": "r"}, {"tenant_id": "t"})
+        while pytoolsmith_config.get_admission_stats().active == 0:
+            time.sleep(0.001)
+
+        with pytest.raises(ToolOverloadedError):
+            tool.call_tool({"report_id": "s"}, {"tenant_id": "t"})
+        # A shorter timeout runs out first.
+        with pytest.raises(ToolTimeoutError):
+            ToolDefinition(function=tool.function, timeout=0.01).call_tool(
+                {"report_id": "s", "tenant_id": "t"}, {})
+
+        release.set()
+        running.result()
+
+    stats = pytoolsmith_config.get_admission_stats()
+    assert (stats.active, stats.queued, stats.shed) == (0, 0, 1)
+
+
+def test_async_calls_wait_for_a_slot():
+    async def fetch(x: int) -> int:
+        await asyncio.sleep(0.01)
+        return x
+
+    tool = ToolDefinition(function=fetch)
+    pytoolsmith_config.set_admission_control(max_concurrency=1)
+
+    async def main():
+        return await asyncio.gather(*(tool.call_tool_async({"x": x}, {})
+                                      for x in range(3)))
+
+    assert asyncio.run(main()) == [0, 1, 2]
+    stats = pytoolsmith_config.get_admission_stats()
+    assert (stats.admitted, stats.peak_queued) == (3, 2)
+    assert stats.mean_wait_time > 0
+
+    pytoolsmith_config.unset_admission_control()
+    assert pytoolsmith_config.get_admission_stats() is None
+
+
+def _run_queued_calls(tenant_weights=None) -> list[str]:
+    """Runs calls from two tenants through one slot, returning the order they ran."""
+    release = threading.Event()
+    order = []
+
+    def work(label: str) -> str:
+        if label == "blocker":
+            release.wait(5)
+        order.append(label)
+        return label
+
+    tool = ToolDefinition(function=work)
+    pytoolsmith_config.set_admission_control(max_concurrency=1, tenant_key="tenant_id",
+                                             tenant_weights=tenant_weights)
+    calls = [("blocker", "a")] + [(f"a{i}", "a") for i in range(4)] + \
+        [(f"b{i}", "b") for i in range(2)]
+
+    with ThreadPoolExecutor(max_workers=len(calls)) as pool:
+        futures = []
+        for queued, (label, tenant) in enumerate(calls):
+            futures.append(pool.submit(tool.call_tool, {"label": label},
+                                       {"tenant_id": tenant}))
+            # Wait for each call to queue up, so they arrive in a known order.
+            while pytoolsmith_config.get_admission_stats().queued < queued:
+                time.sleep(0.001)
+
+        assert pytoolsmith_config.get_admission_stats().queued_by_tenant == \
+            {"a": 4, "b": 2}
+        release.set()
+        for future in futures:
+            future.result()
+
+    return order[1:]
+
+
+def test_tenants_share_slots_fairly():
+    # Tenant b gets every other slot, even though it queued after a's whole batch.
+    assert _run_queued_calls() == ["b0", "a0", "b1", "a1", "a2", "a3"]
+
+
+def test_tenants_share_the_batch_runner_fairly():
+    order = []
+
+    def work(x: int, tenant_id: str) -> int:
+        time.sleep(0.005)
+        order.append(tenant_id)
+        return x
+
+    library = ToolLibrary()
+    library.add_tool(ToolDefinition(function=work, injected_parameters=["tenant_id"]))
+    runner = pytoolsmith_config.ThreadPoolBatchRunner(max_workers=4)
+    pytoolsmith_config.set_batch_runner(runner)
+    pytoolsmith_config.set_admission_control(max_concurrency=2, tenant_key="tenant_id")
+    try:
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            large = pool.submit(library.run_batch, [
+                {"name": "work", "arguments": f'{{"x": {x}}}'} for x in range(60)
+            ], {"tenant_id": "a"})
+            while not order:
+                time.sleep(0.001)
+
+            results = library.run_batch([{"name": "work", "arguments": '{"x": 0}'}],
+                                        {"tenant_id": "b"})
+            assert not results[0].errored
+            # Tenant b's call runs next, rather than after the rest of a's batch.
+            assert order.index("b") < 10
+            assert all(not result.errored for result in large.result())
+    finally:
+        pytoolsmith_config.unset_batch_runner()
+        runner.shutdown()
+
+
+def test_tenant_weights():
+    assert _run_queued_calls(tenant_weights={"b": 0.5}) == \
+        ["b0", "a0", "a1", "b1", "a2", "a3"]
+
+
+def test_lone_tenant_uses_every_slot():
+    lock = threading.Lock()
+    running = peak = 0
+
+    def work(x: int) -> int:
+        nonlocal running, peak
+        with lock:
+            running += 1
+            peak = max(peak, running)
+        time.sleep(0.02)
+        with lock:
+            running -= 1
+        return x
+
+    tool = ToolDefinition(function=work)
+    pytoolsmith_config.set_admission_control(max_concurrency=3, tenant_key="tenant_id",
+                                             tenant_weights={"other": 10})
+
+    with ThreadPoolExecutor(max_workers=6) as pool:
+        list(pool.map(lambda x: tool.call_tool({"x": x}, {"tenant_id": "a"}), range(6)))
+    assert peak == 3
+
+    with pytest.raises(ValueError, match="positive"):
+        pytoolsmith_config.set_admission_control(max_concurrency=1,
+                                                 tenant_weights={"a": 0})
@@ -0,0 +1,129 @@
+from datetime import datetime
+from enum import Enum
+from typing import Literal
+import uuid
+
+from bson import ObjectId
+from pydantic import BaseModel
+import pytest
+
+from pytoolsmith import (
+    ToolArgumentValidationError,
+    ToolDefinition,
+    ToolLibrary,
+    pytoolsmith_config,
+)
+
+
+class Color(Enum):
+    RED = "red"
+    BLUE = "blue"
+
+
+class Address(BaseModel):
+    street: str
+    city: str
+
+
+def place_order(
+        tenant_id: str,
+        order_id: uuid.UUID,
+        placed_at: datetime,
+        color: Color,
+        size: Literal["S", "M", "L"],
+        item_ids: list[uuid.UUID],
+        address: Address,
+        note: str | None = None,
+) -> dict:
+    return {
+        "tenant_id": tenant_id,
+        "order_id": order_id,
+        "placed_at": placed_at,
+        "color": color,
+        "size": size,
+        "item_ids": item_ids,
+        "address": address,
+        "note": note,
+    }
+
+
+_VALID_ARGUMENTS = {
+    "order_id": "123e4567-e89b-12d3-a456-426614174000",
+    "placed_at": "2025-03-01T12:30:00",
+    "color": "red",
+    "size": "M",
+    "item_ids": ["123e4567-e89b-12d3-a456-426614174001"],
+    "address": {"street": "1 Main St", "city": "Springfield"},
+}
+
+
+def test_validation_coerces_arguments():
+    tool = ToolDefinition(function=place_order, injected_parameters=["tenant_id"],
+                          validate_arguments=True)
+
+    result = tool.call_tool(_VALID_ARGUMENTS, {"tenant_id": "t1"})
+
+    assert result == {
+        "tenant_id": "t1",
+        "order_id": uuid.UUID("123e4567-e89b-12d3-a456-426614174000"),
+        "placed_at": datetime(2025, 3, 1, 12, 30),
+        "color": Color.RED,
+        "size": "M",
+        "item_ids": [uuid.UUID("123e4567-e89b-12d3-a456-426614174001")],
+        "address": Address(street="1 Main St", city="Springfield"),
+        "note": None,
+    }
+
+
+def test_validation_rejects_bad_calls_before_running():
+    calls = []
+
+    def record(order_id: uuid.UUID, size: Literal["S", "M"]) -> str:
+        calls.append(order_id)
+        return "ok"
+
+    tool = ToolDefinition(function=record, validate_arguments=True)
+
+    with pytest.raises(ToolArgumentValidationError) as excinfo:
+        tool.call_tool({"order_id": "not-a-uuid", "extra": 1}, {})
+
+    assert calls == []
+    assert [(e["loc"], e["type"]) for e in excinfo.value.errors] == [
+        (("order_id",), "uuid_parsing"),
+        (("extra",), "unexpected_argument"),
+        (("size",), "missing"),
+    ]
+    assert str(excinfo.value).startswith("Invalid arguments for record: order_id:")
+
+
+def test_validation_errors_are_reported_in_batches():
+    library = ToolLibrary(include_batch_tool=True)
+    library.add_tool(ToolDefinition(function=place_order,
+                                    injected_parameters=["tenant_id"],
+                                    validate_arguments=True))
+
+    result = library.get_tool_from_name("batch_tool").call_tool(
+        {"invocations": [{"name": "place_order", "arguments": '{"size": "XL"}'}]},
+        {"tenant_id": "t1"})
+
+    assert result.startswith("#0 (place_order) Result (note: errored): "
+                             "Invalid arguments for place_order: size:")
+
+
+def test_validation_passes_through_custom_types():
+    pytoolsmith_config.update_type_map({ObjectId: "string"})
+
+    def get_object(object_id: ObjectId) -> str:
+        return object_id
+
+    tool = ToolDefinition(function=get_object, validate_arguments=True)
+
+    assert tool.call_tool({"object_id": "abc"}, {}) == "abc"
+
+
+def test_validation_is_off_by_default():
+    tool = ToolDefinition(function=place_order, injected_parameters=["tenant_id"])
+
+    result = tool.call_tool(_VALID_ARGUMENTS, {"tenant_id": "t1"})
+
+    assert result["order_id"] == _VALID_ARGUMENTS["order_id"]
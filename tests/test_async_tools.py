@@ -0,0 +1,71 @@
+import asyncio
+import concurrent.futures
+import threading
+import time
+
+from pytoolsmith import ToolDefinition, pytoolsmith_config
+
+
+async def fetch_user(user_id: str, tenant_id: str) -> str:
+    """
+    Fetches a user.
+    Args:
+        user_id: The user to fetch.
+    """
+    await asyncio.sleep(0.05)
+    return f"{tenant_id}/{user_id}"
+
+
+def fetch_user_sync(user_id: str, tenant_id: str) -> str:
+    """
+    Fetches a user.
+    Args:
+        user_id: The user to fetch.
+    """
+    return threading.current_thread().name
+
+
+def test_async_tool_schema_matches_sync_tool():
+    async_tool = ToolDefinition(function=fetch_user, injected_parameters=["tenant_id"])
+    sync_tool = ToolDefinition(function=fetch_user_sync,
+                               injected_parameters=["tenant_id"])
+
+    async_schema = async_tool.build_json_schema()
+    sync_schema = sync_tool.build_json_schema()
+
+    assert async_schema.name == "fetch_user"
+    assert async_schema.input_properties == sync_schema.input_properties
+    assert async_schema.description == sync_schema.description
+
+
+def test_call_tool_async_awaits_coroutines_concurrently():
+    tool = ToolDefinition(function=fetch_user, injected_parameters=["tenant_id"],
+                          user_message="Fetching {{user_id}}")
+
+    async def run():
+        return await asyncio.gather(*[
+            tool.call_tool_async({"user_id": str(i)}, {"tenant_id": "t"},
+                                 include_message=True)
+            for i in range(100)
+        ])
+
+    start = time.perf_counter()
+    results = asyncio.run(run())
+
+    assert time.perf_counter() - start < 1
+    assert results[3] == ("t/3", "Fetching 3")
+
+
+def test_call_tool_async_offloads_sync_tools():
+    tool = ToolDefinition(function=fetch_user_sync, injected_parameters=["tenant_id"])
+
+    with concurrent.futures.ThreadPoolExecutor(
+            thread_name_prefix="tool-executor") as executor:
+        pytoolsmith_config.set_async_executor(executor)
+        try:
+            result = asyncio.run(tool.call_tool_async({"user_id": "1"},
+                                                      {"tenant_id": "t"}))
+        finally:
+            pytoolsmith_config.unset_async_executor()
+
+    assert result.startswith("tool-executor")
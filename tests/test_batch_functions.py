@@ -0,0 +1,102 @@
+import asyncio
+import json
+
+import pytest
+
+from pytoolsmith import CachePolicy, ToolDefinition, ToolLibrary
+
+
+def _invocations(*calls: tuple[str, dict]) -> dict:
+    return {"invocations": [{"name": name, "arguments": json.dumps(arguments)}
+                            for name, arguments in calls]}
+
+
+def test_batch_function_runs_once_per_batch(user_library):
+    library, bulk_calls = user_library()
+    invocations = _invocations(
+        ("get_user", {"user_id": "1"}),
+        ("square", {"x": 3}),
+        ("get_user", {"user_id": "2", "uppercase": True}),
+        ("get_user", {"user_id": "9"}),
+        ("get_user", {}),
+    )
+
+    result = library.get_tool_from_name("batch_tool").call_tool(
+        invocations, {"tenant_id": "t"})
+
+    assert result.split("\n") == [
+        "#0 (get_user) Result: Ada",
+        "#1 (square) Result: 9",
+        "#2 (get_user) Result: GRACE",
+        "#3 (get_user) Result (note: errored): 'No user 9'",
+        "#4 (get_user) Result (note: errored): "
+        "get_user() got missing required argument 'user_id'",
+    ]
+    # Defaults are filled in and the injected parameters are passed as usual.
+    assert bulk_calls == [(["1", "2", "9"], [False, True, False], "t")]
+
+
+def test_batch_function_async(user_library):
+    library, bulk_calls = user_library()
+    invocations = _invocations(("get_user", {"user_id": "1"}),
+                               ("get_user", {"user_id": "3"}))
+
+    result = asyncio.run(library.get_tool_from_name("batch_tool").call_tool_async(
+        invocations, {"tenant_id": "t"}))
+
+    assert result == "#0 (get_user) Result: Ada\n#1 (get_user) Result: Edsger"
+    assert len(bulk_calls) == 1
+
+
+def test_async_batch_function():
+    async def fetch(x: int) -> int:
+        return x
+
+    async def fetch_many(x: list[int]) -> list[int]:
+        await asyncio.sleep(0)
+        return [value * 10 for value in x]
+
+    library = ToolLibrary(include_batch_tool=True)
+    library.add_tool(ToolDefinition(function=fetch, batch_function=fetch_many))
+
+    result = asyncio.run(library.get_tool_from_name("batch_tool").call_tool_async(
+        _invocations(("fetch", {"x": 1}), ("fetch", {"x": 2})), {}))
+
+    assert result == "#0 (fetch) Result: 10\n#1 (fetch) Result: 20"
+
+
+def test_batch_function_uses_the_cache(user_library):
+    library, bulk_calls = user_library(cache=CachePolicy())
+    batch = library.get_tool_from_name("batch_tool")
+
+    batch.call_tool(_invocations(("get_user", {"user_id": "1"})), {"tenant_id": "t"})
+    result = batch.call_tool(_invocations(("get_user", {"user_id": "1"}),
+                                          ("get_user", {"user_id": "2"})),
+                             {"tenant_id": "t"})
+
+    assert result == "#0 (get_user) Result: Ada\n#1 (get_user) Result: Grace"
+    # Only the uncached user is fetched the second time.
+    assert [call[0] for call in bulk_calls] == [["1"], ["2"]]
+
+
+def test_batch_function_failures():
+    def lookup(x: int) -> int:
+        return x
+
+    def wrong_length(x: list[int]) -> list[int]:
+        return [1]
+
+    library = ToolLibrary(include_batch_tool=True)
+    library.add_tool(ToolDefinition(function=lookup, batch_function=wrong_length))
+
+    result = library.get_tool_from_name("batch_tool").call_tool(
+        _invocations(("lookup", {"x": 1}), ("lookup", {"x": 2})), {})
+
+    assert result.split("\n")[1] == (
+        "#1 (lookup) Result (note: errored): "
+        "The batch_function of lookup must return a list of 2 results."
+    )
+
+    with pytest.raises(ValueError, match="execution='process'"):
+        ToolDefinition(function=lookup, batch_function=wrong_length,
+                       execution="process")
@@ -1,6 +1,10 @@
+import asyncio
 import json
+import time
 
-from pytoolsmith import ToolDefinition, ToolLibrary, pytoolsmith_config
+import pytest
+
+from pytoolsmith import HedgePolicy, ToolDefinition, ToolLibrary, pytoolsmith_config
 
 
 def test_batch_tool():
@@ -41,16 +45,265 @@ def test_batch_tool():
     assert result == ("#0 (square) Result: 4\n#1 (square) Result: 9\n"
                       "#2 (errors) Result (note: errored): This is an error")
 
-    # Should be twice as `include_message` will also use the function.
+    # Only once, as the message is formatted from the same parsed arguments.
     assert used_json_strs == [
         '{"x": 2}',
         '{"x": 3}',
         '{}',
-        '{"x": 2}',
-        '{"x": 3}',
-        '{}'
     ]
 
     call_message_2 = tool_to_call.format_message_for_call(llm_params, {})
     for msg in [call_message_1, call_message_2]:
         assert msg == "Squaring 2\nSquaring 3"
+
+
+def test_batch_tool_async():
+    async def remote_lookup(x: int) -> str:
+        await asyncio.sleep(0.1)
+        return str(x)
+
+    def square(x: int) -> str:
+        return str(x * x)
+
+    def errors() -> str:
+        raise ValueError("This is an error")
+
+    library = ToolLibrary(include_batch_tool=True)
+    library.add_tool(ToolDefinition(function=remote_lookup))
+    library.add_tool(ToolDefinition(function=square))
+    library.add_tool(ToolDefinition(function=errors))
+
+    invocations = [{"name": "remote_lookup", "arguments": json.dumps({"x": i})}
+                   for i in range(20)]
+    invocations += [{"name": "square", "arguments": '{"x": 3}'},
+                    {"name": "errors", "arguments": "{}"}]
+
+    start = time.perf_counter()
+    result = asyncio.run(library.get_tool_from_name("batch_tool").call_tool_async(
+        {"invocations": invocations}, {}))
+
+    # All twenty lookups share one round-trip's worth of waiting.
+    assert time.perf_counter() - start < 0.5
+    assert result.split("\n")[-3:] == [
+        "#19 (remote_lookup) Result: 19",
+        "#20 (square) Result: 9",
+        "#21 (errors) Result (note: errored): This is an error",
+    ]
+
+
+def test_batch_tool_deduplicates_invocations():
+    calls = []
+
+    def lookup(x: int, y: int = 0) -> str:
+        calls.append((x, y))
+        return str(x + y)
+
+    def record(x: int) -> str:
+        calls.append(("record", x))
+        return "ok"
+
+    library = ToolLibrary(include_batch_tool=True)
+    library.add_tool(ToolDefinition(function=lookup))
+    library.add_tool(ToolDefinition(function=record, batch_dedupe=False))
+    batch = library.get_tool_from_name("batch_tool")
+
+    invocations = {"invocations": [
+        {"name": "lookup", "arguments": '{"x": 1, "y": 2}'},
+        # The same arguments in a different order and spacing.
+        {"name": "lookup", "arguments": '{"y":2,"x":1}'},
+        {"name": "record", "arguments": '{"x": 1}'},
+        {"name": "record", "arguments": '{"x": 1}'},
+        # Tools that opt out may have side effects, so this runs again.
+        {"name": "lookup", "arguments": '{"x": 1, "y": 2}'},
+        {"name": "lookup", "arguments": '{"x": 1, "y": 2}'},
+    ]}
+
+    assert batch.call_tool(invocations, {}).split("\n") == [
+        "#0 (lookup) Result: 3",
+        "#1 (lookup) Result: 3",
+        "#2 (record) Result: ok",
+        "#3 (record) Result: ok",
+        "#4 (lookup) Result: 3",
+        "#5 (lookup) Result: 3",
+    ]
+    assert calls == [(1, 2), ("record", 1), ("record", 1), (1, 2)]
+
+    calls.clear()
+    result = asyncio.run(batch.call_tool_async(invocations, {}))
+    assert result.split("\n")[1] == "#1 (lookup) Result: 3"
+    assert len(calls) == 4
+
+
+def test_batch_tool_deduplicates_errors():
+    calls = []
+
+    def errors(x: int) -> str:
+        calls.append(x)
+        raise ValueError("This is an error")
+
+    library = ToolLibrary(include_batch_tool=True)
+    library.add_tool(ToolDefinition(function=errors))
+
+    result = library.get_tool_from_name("batch_tool").call_tool({"invocations": [
+        {"name": "errors", "arguments": '{"x": 1}'},
+        {"name": "errors", "arguments": '{"x": 1}'},
+    ]}, {})
+
+    assert result == ("#0 (errors) Result (note: errored): This is an error\n"
+                      "#1 (errors) Result (note: errored): This is an error")
+    assert calls == [1]
+
+
+def _sleepy_library() -> ToolLibrary:
+    def sleepy(seconds: float) -> str:
+        time.sleep(seconds)
+        return f"slept {seconds}"
+
+    async def sleepy_async(seconds: float) -> str:
+        await asyncio.sleep(seconds)
+        return f"slept {seconds}"
+
+    def errors() -> str:
+        raise ValueError("This is an error")
+
+    library = ToolLibrary()
+    library.add_tool(ToolDefinition(function=sleepy))
+    library.add_tool(ToolDefinition(function=sleepy_async))
+    library.add_tool(ToolDefinition(function=errors))
+    return library
+
+
+def test_iter_batch_yields_in_completion_order():
+    library = _sleepy_library()
+    invocations = [
+        {"name": "sleepy", "arguments": '{"seconds": 0.2}'},
+        {"name": "sleepy", "arguments": '{"seconds": 0}'},
+        {"name": "errors", "arguments": "{}"},
+        {"name": "sleepy", "arguments": '{"seconds": 0}'},
+    ]
+
+    pytoolsmith_config.set_batch_runner(
+        pytoolsmith_config.ThreadPoolBatchRunner(max_workers=4))
+    try:
+        start = time.perf_counter()
+        stream = library.iter_batch(invocations, {})
+        first = next(stream)
+        time_to_first = time.perf_counter() - start
+        rest = list(stream)
+    finally:
+        pytoolsmith_config.unset_batch_runner()
+
+    assert time_to_first < 0.15
+    assert first.index in (1, 2)
+    results = {result.index: result for result in [first, *rest]}
+    assert [result.index for result in rest][-1] == 0
+    assert results[0].result == "slept 0.2" and results[0].elapsed >= 0.2
+    assert results[2].errored and results[2].result == "This is an error"
+    # The duplicate of #1 is reported with it.
+    assert results[3][1:4] == ("sleepy", "slept 0", False)
+
+    # With the default runner, results still stream one at a time, in order.
+    assert [result.index for result in library.iter_batch(invocations, {})] == \
+        [0, 1, 3, 2]
+
+
+def test_iter_batch_async():
+    library = _sleepy_library()
+    invocations = [
+        {"name": "sleepy_async", "arguments": '{"seconds": 0.1}'},
+        {"name": "sleepy_async", "arguments": '{"seconds": 0}'},
+    ]
+
+    async def main():
+        return [(result.index, result.result)
+                async for result in library.iter_batch_async(invocations, {})]
+
+    assert asyncio.run(main()) == [(1, "slept 0"), (0, "slept 0.1")]
+
+
+def test_run_batch_returns_structured_results():
+    calls = []
+
+    def square(x: int) -> int:
+        calls.append(x)
+        return x * x
+
+    library = ToolLibrary(include_batch_tool=True)
+    library.add_tool(ToolDefinition(function=square))
+
+    results = library.run_batch([{"name": "square", "arguments": '{"x": 2}'},
+                                 {"name": "square", "arguments": '{"x": 3}'}], {})
+
+    assert [(r.index, r.tool_name, r.result, r.errored) for r in results] == \
+        [(0, "square", 4, False), (1, "square", 9, False)]
+    assert results[1].format() == "#1 (square) Result: 9"
+    assert asyncio.run(library.run_batch_async(
+        [{"name": "square", "arguments": '{"x": 4}'}], {}))[0].result == 16
+
+    # Unknown tools and bad JSON are rejected before anything runs.
+    calls.clear()
+    invalid = {"invocations": [{"name": "square", "arguments": '{"x": 5}'},
+                               {"name": "cube", "arguments": '{"x": 5}'},
+                               {"name": "square", "arguments": '{"x": '}]}
+    with pytest.raises(ValueError, match=r"#1 \(cube\): Tool not found: cube; "
+                                         r"#2 \(square\): Expecting value"):
+        library.get_tool_from_name("batch_tool").call_tool(invalid, {})
+    assert calls == []
+
+
+def test_slowest_invocations_start_first():
+    started = []
+
+    def quick(x: int) -> int:
+        started.append(f"quick {x}")
+        return x
+
+    def slow(x: int) -> int:
+        started.append(f"slow {x}")
+        time.sleep(0.02)
+        return x
+
+    library = ToolLibrary(include_batch_tool=True)
+    library.add_tool(ToolDefinition(function=quick))
+    library.add_tool(ToolDefinition(function=slow))
+    invocations = [{"name": "quick", "arguments": '{"x": 1}'},
+                   {"name": "quick", "arguments": '{"x": 2}'},
+                   {"name": "slow", "arguments": '{"x": 3}'}]
+
+    pytoolsmith_config.set_batch_runner(
+        pytoolsmith_config.ThreadPoolBatchRunner(max_workers=1))
+    try:
+        # Without history, invocations start in order.
+        library.run_batch(invocations, {})
+        assert started == ["quick 1", "quick 2", "slow 3"]
+        assert library.get_tool_from_name("slow").get_expected_latency() >= 0.02
+
+        started.clear()
+        results = library.run_batch(invocations, {})
+    finally:
+        pytoolsmith_config.unset_batch_runner()
+
+    assert started == ["slow 3", "quick 1", "quick 2"]
+    assert [result.result for result in results] == [1, 2, 3]
+
+
+def test_latency_is_only_tracked_when_used():
+    def ping() -> str:
+        return "pong"
+
+    tool = ToolDefinition(function=ping)
+    tool.call_tool({}, {})
+    asyncio.run(tool.call_tool_async({}, {}))
+    assert tool.get_expected_latency() is None
+
+    pytoolsmith_config.set_async_batch_runner(
+        pytoolsmith_config.AsyncioBatchRunner(max_concurrency=2))
+    try:
+        asyncio.run(tool.call_tool_async({}, {}))
+        assert tool.get_expected_latency() is not None
+    finally:
+        pytoolsmith_config.unset_async_batch_runner()
+
+    hedged = ToolDefinition(function=ping, hedge=HedgePolicy(delay=1))
+    hedged.call_tool({}, {})
+    assert hedged.get_expected_latency() is not None
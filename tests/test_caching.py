@@ -0,0 +1,263 @@
+import asyncio
+import json
+import threading
+import time
+
+import pytest
+
+from pytoolsmith import (
+    CachePolicy,
+    ToolDefinition,
+    ToolLibrary,
+    invalidate_cache_tags,
+)
+
+
+def test_cached_tool_calls(counting_tool):
+    tool, calls = counting_tool(cache=CachePolicy(key_params=["tenant_id"]))
+
+    first = tool.call_tool({"account_id": "a", "fields": ["x"]}, {"tenant_id": "t1"})
+    # The same arguments in a different order hit the cache.
+    assert tool.call_tool({"fields": ["x"], "account_id": "a"},
+                          {"tenant_id": "t1"}) == first
+    # Different tenants don't share results.
+    assert tool.call_tool({"account_id": "a", "fields": ["x"]},
+                          {"tenant_id": "t2"}) != first
+    assert calls == ["a", "a"]
+
+    stats = tool.get_cache_stats()
+    assert (stats.hits, stats.misses, stats.size) == (1, 2, 2)
+    assert stats.hit_rate == pytest.approx(1 / 3)
+
+    tool.clear_cache()
+    tool.call_tool({"account_id": "a", "fields": ["x"]}, {"tenant_id": "t1"})
+    assert len(calls) == 3
+
+
+def test_cache_ttl_and_lru_eviction(counting_tool):
+    tool, calls = counting_tool(cache=CachePolicy(ttl=0.05, max_entries=2))
+
+    for account_id in ["a", "b", "c", "a"]:
+        tool.call_tool({"account_id": account_id}, {"tenant_id": "t"})
+    # "a" was evicted by "c", so it ran twice.
+    assert calls == ["a", "b", "c", "a"]
+    assert tool.get_cache_stats().evictions == 2
+
+    tool.call_tool({"account_id": "a"}, {"tenant_id": "t"})
+    assert len(calls) == 4
+    time.sleep(0.06)
+    tool.call_tool({"account_id": "a"}, {"tenant_id": "t"})
+    assert len(calls) == 5
+
+
+def test_errors_are_not_cached():
+    calls = []
+
+    def flaky(x: int) -> int:
+        calls.append(x)
+        if len(calls) == 1:
+            raise ValueError("first call fails")
+        return x
+
+    tool = ToolDefinition(function=flaky, cache=CachePolicy())
+    with pytest.raises(ValueError):
+        tool.call_tool({"x": 1}, {})
+    assert tool.call_tool({"x": 1}, {}) == 1
+    assert tool.call_tool({"x": 1}, {}) == 1
+    assert calls == [1, 1]
+
+
+def test_cached_results_are_copies():
+    def get_profile(user_id: str) -> dict:
+        return {"user_id": user_id, "roles": ["reader"]}
+
+    tool = ToolDefinition(function=get_profile, cache=CachePolicy())
+    first = tool.call_tool({"user_id": "1"}, {})
+    first["roles"].append("admin")
+
+    second = tool.call_tool({"user_id": "1"}, {})
+    assert second == {"user_id": "1", "roles": ["reader"]}
+    second["roles"].clear()
+    assert tool.call_tool({"user_id": "1"}, {})["roles"] == ["reader"]
+    assert tool.get_cache_stats().hits == 2
+
+    shared = ToolDefinition(function=get_profile,
+                            cache=CachePolicy(copy_results=False))
+    assert shared.call_tool({"user_id": "1"}, {}) \
+        is shared.call_tool({"user_id": "1"}, {})
+
+
+def test_results_that_cant_be_copied_arent_cached():
+    calls = []
+
+    def open_session(user_id: str) -> dict:
+        calls.append(user_id)
+        return {"user_id": user_id, "lock": threading.Lock()}
+
+    tool = ToolDefinition(function=open_session, cache=CachePolicy())
+    assert tool.call_tool({"user_id": "1"}, {})["user_id"] == "1"
+    assert asyncio.run(tool.call_tool_async({"user_id": "1"}, {}))["user_id"] == "1"
+    assert calls == ["1", "1"]
+    assert tool.get_cache_stats().size == 0
+
+
+def test_cache_in_batch_and_async(counting_tool):
+    tool, calls = counting_tool(cache=CachePolicy(), batch_dedupe=False)
+    library = ToolLibrary(include_batch_tool=True)
+    library.add_tool(tool)
+    library.add_tool(ToolDefinition(function=uncached_tool))
+
+    invocations = {"invocations": [
+        {"name": "get_account", "arguments": json.dumps({"account_id": "a"})},
+        {"name": "get_account", "arguments": json.dumps({"account_id": "a"})},
+    ]}
+    library.get_tool_from_name("batch_tool").call_tool(invocations, {"tenant_id": "t"})
+    asyncio.run(tool.call_tool_async({"account_id": "a"}, {"tenant_id": "t"}))
+
+    assert calls == ["a"]
+    assert library.get_cache_stats() == {"get_account": tool.get_cache_stats()}
+    assert library.get_cache_stats()["get_account"].hits == 2
+
+
+def uncached_tool() -> str:
+    return "not cached"
+
+
+def _user_tools() -> tuple[ToolDefinition, ToolDefinition, dict]:
+    users = {"1": "Ada", "2": "Grace"}
+
+    def get_user(user_id: str) -> str:
+        return users[user_id]
+
+    def update_user(user_id: str, name: str) -> str:
+        users[user_id] = name
+        return "ok"
+
+    read_tool = ToolDefinition(function=get_user, cache=CachePolicy(),
+                               cache_tags=["user:{user_id}"])
+    write_tool = ToolDefinition(function=update_user, invalidates=["user:{user_id}"])
+    return read_tool, write_tool, users
+
+
+def test_writes_invalidate_tagged_results():
+    read_tool, write_tool, _ = _user_tools()
+
+    assert read_tool.call_tool({"user_id": "1"}, {}) == "Ada"
+    assert read_tool.call_tool({"user_id": "2"}, {}) == "Grace"
+
+    write_tool.call_tool({"user_id": "1", "name": "Ada L."}, {})
+
+    # Only user 1's entry was removed.
+    assert read_tool.get_cache_stats().size == 1
+    assert read_tool.call_tool({"user_id": "1"}, {}) == "Ada L."
+    assert read_tool.call_tool({"user_id": "2"}, {}) == "Grace"
+    assert read_tool.get_cache_stats().hits == 1
+
+
+def test_batch_writes_invalidate_tagged_results():
+    read_tool, write_tool, _ = _user_tools()
+    library = ToolLibrary(include_batch_tool=True)
+    library.add_tool(read_tool)
+    library.add_tool(write_tool)
+    batch = library.get_tool_from_name("batch_tool")
+
+    result = batch.call_tool({"invocations": [
+        {"name": "get_user", "arguments": '{"user_id": "1"}'},
+        {"name": "update_user", "arguments": '{"user_id": "1", "name": "Ada L."}'},
+        {"name": "get_user", "arguments": '{"user_id": "1"}'},
+    ]}, {})
+
+    assert result.split("\n") == ["#0 (get_user) Result: Ada",
+                                  "#1 (update_user) Result: ok",
+                                  "#2 (get_user) Result: Ada L."]
+
+
+def test_failed_writes_do_not_invalidate():
+    read_tool, _, users = _user_tools()
+    users["3"] = "Linus"
+
+    def delete_user(user_id: str) -> str:
+        raise ValueError("not allowed")
+
+    delete_tool = ToolDefinition(function=delete_user, invalidates=["user:{user_id}"])
+
+    read_tool.call_tool({"user_id": "3"}, {})
+    with pytest.raises(ValueError):
+        delete_tool.call_tool({"user_id": "3"}, {})
+    assert read_tool.get_cache_stats().size == 1
+
+    assert invalidate_cache_tags(["user:3"]) == 1
+    assert read_tool.get_cache_stats().size == 0
+
+
+def test_results_computed_during_a_write_are_not_cached():
+    started, release = threading.Event(), threading.Event()
+
+    def slow_get_user(user_id: str) -> str:
+        started.set()
+        release.wait()
+        return "stale"
+
+    read_tool = ToolDefinition(function=slow_get_user, cache=CachePolicy(),
+                               cache_tags=["user:{user_id}"])
+
+    def read_during(tags: list[str]) -> None:
+        started.clear()
+        release.clear()
+        thread = threading.Thread(target=read_tool.call_tool,
+                                  args=({"user_id": "1"}, {}))
+        thread.start()
+        started.wait()
+        invalidate_cache_tags(tags)
+        release.set()
+        thread.join()
+
+    read_during(["user:1"])
+    assert read_tool.get_cache_stats().size == 0
+
+    # Writes to other users don't stop the result being cached.
+    read_during(["user:2"])
+    assert read_tool.get_cache_stats().size == 1
+
+
+def test_invalid_tag_templates():
+    def get_user(user_id: str) -> str:
+        return user_id
+
+    with pytest.raises(ValueError):
+        ToolDefinition(function=get_user, cache_tags=["user:{user_id}"])
+
+    with pytest.raises(ValueError):
+        ToolDefinition(function=get_user, cache=CachePolicy(),
+                       cache_tags=["user:{id}"])
+
+    with pytest.raises(ValueError):
+        ToolDefinition(function=get_user, cache=CachePolicy(), cache_tags=["user:{}"])
+
+    # Attribute lookups are checked against the parameter they start from.
+    ToolDefinition(function=get_user, cache=CachePolicy(),
+                   cache_tags=["user:{user_id.upper}"])
+
+
+def test_tag_templates_use_parameter_defaults():
+    reads = 0
+
+    def get_user(user_id: str, region: str = "eu") -> str:
+        nonlocal reads
+        reads += 1
+        return f"{user_id} in {region}"
+
+    def move_users(region: str = "eu") -> str:
+        return "moved"
+
+    read_tool = ToolDefinition(function=get_user, cache=CachePolicy(),
+                               cache_tags=["region:{region}"])
+    write_tool = ToolDefinition(function=move_users, invalidates=["region:{region}"])
+
+    assert read_tool.call_tool({"user_id": "1"}, {}) == "1 in eu"
+    read_tool.call_tool({"user_id": "1"}, {})
+    assert reads == 1
+
+    write_tool.call_tool({}, {})
+    read_tool.call_tool({"user_id": "1"}, {})
+    assert reads == 2
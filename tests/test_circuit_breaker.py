@@ -0,0 +1,97 @@
+import asyncio
+import time
+
+import pytest
+
+from pytoolsmith import (
+    CircuitBreakerPolicy,
+    CircuitOpenError,
+    ToolArgumentValidationError,
+    ToolDefinition,
+    ToolLibrary,
+    pytoolsmith_config,
+)
+
+QUICK_BREAKER = CircuitBreakerPolicy(failure_threshold=2, reset_timeout=0.05)
+
+
+def test_opens_after_repeated_failures(failing_tool):
+    tool, state = failing_tool(circuit_breaker=QUICK_BREAKER)
+    library = ToolLibrary(include_batch_tool=True)
+    library.add_tool(tool)
+
+    for _ in range(2):
+        with pytest.raises(ConnectionError):
+            tool.call_tool({"x": 1}, {})
+    assert library.get_circuit_states() == {"fetch": "open"}
+
+    with pytest.raises(CircuitOpenError, match="fetch is unavailable"):
+        tool.call_tool({"x": 1}, {})
+    assert state["calls"] == 2
+
+    results = library.run_batch([{"name": "fetch", "arguments": '{"x": 2}'}], {})
+    assert results[0].errored
+    assert "fetch is unavailable after repeated failures" in results[0].result
+    assert state["calls"] == 2
+
+
+def test_half_open_probe_closes_the_circuit(failing_tool):
+    tool, state = failing_tool(circuit_breaker=QUICK_BREAKER)
+    for _ in range(2):
+        with pytest.raises(ConnectionError):
+            tool.call_tool({"x": 1}, {})
+
+    time.sleep(0.06)
+    assert tool.get_circuit_state() == "half_open"
+
+    # A failed probe opens the circuit again.
+    with pytest.raises(ConnectionError):
+        tool.call_tool({"x": 1}, {})
+    assert tool.get_circuit_state() == "open"
+
+    time.sleep(0.06)
+    state["healthy"] = True
+    assert asyncio.run(tool.call_tool_async({"x": 3}, {})) == 3
+    assert tool.get_circuit_state() == "closed"
+
+
+def test_invalid_arguments_are_not_failures(failing_tool):
+    tool, state = failing_tool(circuit_breaker=QUICK_BREAKER,
+                                validate_arguments=True)
+    state["healthy"] = True
+
+    for _ in range(3):
+        with pytest.raises(ToolArgumentValidationError):
+            tool.call_tool({"x": "not a number"}, {})
+    assert tool.get_circuit_state() == "closed"
+    assert failing_tool()[0].get_circuit_state() is None
+
+
+def test_group_breaker_and_open_tools_left_out_of_definitions(failing_tool):
+    tool, _ = failing_tool(tool_group="crm")
+
+    def ping() -> str:
+        return "pong"
+
+    library = ToolLibrary()
+    library.add_tool(tool)
+    library.add_tool(ToolDefinition(function=ping, tool_group="crm"))
+
+    pytoolsmith_config.set_tool_group_circuit_breaker("crm", QUICK_BREAKER)
+    try:
+        for _ in range(2):
+            with pytest.raises(ConnectionError):
+                tool.call_tool({"x": 1}, {})
+
+        assert library.get_circuit_states() == {"fetch": "open", "ping": "open"}
+        with pytest.raises(CircuitOpenError):
+            library.get_tool_from_name("ping").call_tool({}, {})
+
+        names = [t["name"] for t in library.to_anthropic(exclude_open_circuits=True)]
+        assert names == []
+        assert len(library.to_anthropic()) == 2
+    finally:
+        pytoolsmith_config.unset_tool_group_circuit_breaker("crm")
+
+    assert library.get_circuit_states() == {}
+    assert library.get_tool_from_name("ping").call_tool({}, {}) == "pong"
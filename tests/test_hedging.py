@@ -0,0 +1,115 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import time
+
+import pytest
+
+from pytoolsmith import HedgePolicy, ToolDefinition, ToolLibrary, pytoolsmith_config
+
+
+@pytest.fixture(autouse=True)
+def _reset_hedge_budget():
+    yield
+    pytoolsmith_config.unset_hedge_budget()
+
+
+def test_slow_calls_are_hedged_in_batches(sometimes_slow_tool):
+    tool, calls = sometimes_slow_tool({1}, hedge=HedgePolicy(delay=0.02))
+    library = ToolLibrary(include_batch_tool=True)
+    library.add_tool(tool)
+
+    pytoolsmith_config.set_batch_runner(
+        pytoolsmith_config.ThreadPoolBatchRunner(max_workers=2))
+    try:
+        start = time.perf_counter()
+        results = library.run_batch([{"name": "fetch", "arguments": '{"x": 1}'}], {})
+    finally:
+        pytoolsmith_config.unset_batch_runner()
+
+    assert time.perf_counter() - start < 0.2
+    assert results[0].result == "fast"
+    assert calls == [1, 1]
+    stats = library.get_hedge_stats()["fetch"]
+    assert (stats.calls, stats.hedged, stats.hedge_wins, stats.denied) == (1, 1, 1, 0)
+
+    # A call that finishes in time isn't hedged.
+    assert tool.call_tool({"x": 2}, {}) == "fast"
+    assert tool.get_hedge_stats().hedged == 1
+
+
+def test_async_hedge_cancels_the_slower_call():
+    calls = []
+    cancelled = []
+
+    async def fetch(x: int) -> str:
+        calls.append(x)
+        if len(calls) == 1:
+            try:
+                await asyncio.sleep(0.3)
+            except asyncio.CancelledError:
+                cancelled.append(x)
+                raise
+        return "done"
+
+    tool = ToolDefinition(function=fetch, hedge=HedgePolicy(delay=0.02))
+
+    async def main():
+        start = time.perf_counter()
+        result = await tool.call_tool_async({"x": 1}, {})
+        return result, time.perf_counter() - start
+
+    result, elapsed = asyncio.run(main())
+    assert result == "done" and elapsed < 0.2
+    assert calls == [1, 1] and cancelled == [1]
+    assert tool.get_hedge_stats().hedge_wins == 1
+
+
+def test_hedge_budget(sometimes_slow_tool):
+    pytoolsmith_config.set_hedge_budget(ratio=0.0, burst=0)
+    tool, calls = sometimes_slow_tool({1}, hedge=HedgePolicy(delay=0.02))
+
+    assert tool.call_tool({"x": 1}, {}) == "slow"
+    assert calls == [1]
+    stats = tool.get_hedge_stats()
+    assert (stats.calls, stats.hedged, stats.denied) == (1, 0, 1)
+
+    with pytest.raises(ValueError, match="negative"):
+        pytoolsmith_config.set_hedge_budget(ratio=-1)
+
+
+def test_hedges_at_the_observed_quantile(sometimes_slow_tool):
+    tool, calls = sometimes_slow_tool(
+        {6}, hedge=HedgePolicy(quantile=0.95, min_samples=5))
+
+    # Calls aren't hedged until the tool has enough history.
+    for x in range(5):
+        assert tool.call_tool({"x": x}, {}) == "fast"
+    assert tool.get_hedge_stats().hedged == 0
+
+    start = time.perf_counter()
+    assert tool.call_tool({"x": 5}, {}) == "fast"
+    assert time.perf_counter() - start < 0.2
+    assert calls[-2:] == [5, 5]
+    assert tool.get_hedge_stats().hedged == 1
+
+
+def test_concurrent_calls_are_timed_from_when_they_start():
+    pytoolsmith_config.set_hedge_budget(ratio=0.05, burst=10, max_concurrent=4)
+
+    def fetch(x: int) -> str:
+        time.sleep(0.2)
+        return "done"
+
+    tool = ToolDefinition(function=fetch, hedge=HedgePolicy(delay=0.1))
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=40) as pool:
+        results = list(pool.map(lambda x: tool.call_tool({"x": x}, {}), range(40)))
+    elapsed = time.perf_counter() - start
+
+    # Every call starts right away instead of queueing behind the others.
+    assert results == ["done"] * 40
+    assert elapsed < 0.5
+    # Only `max_concurrent` slow calls get a hedge, and the rest are denied.
+    stats = tool.get_hedge_stats()
+    assert stats.calls == 40
+    assert stats.hedged == 4 and stats.denied == 36
@@ -0,0 +1,223 @@
+import asyncio
+
+import pytest
+
+from pytoolsmith import (
+    CallEvent,
+    OpenTelemetryHooks,
+    RenderEvent,
+    SchemaEvent,
+    ToolDefinition,
+    ToolHooks,
+    ToolLibrary,
+    get_current_call,
+    pytoolsmith_config,
+)
+
+
+class RecordingHooks(ToolHooks):
+    def __init__(self):
+        self.events: list[tuple[str, CallEvent | SchemaEvent | RenderEvent]] = []
+
+    def on_call_start(self, event: CallEvent) -> None:
+        self.events.append(("start", event))
+
+    def on_call_end(self, event: CallEvent) -> None:
+        self.events.append(("end", event))
+
+    def on_error(self, event: CallEvent) -> None:
+        self.events.append(("error", event))
+
+    def on_schema_build(self, event: SchemaEvent) -> None:
+        self.events.append(("schema", event))
+
+    def on_render(self, event: RenderEvent) -> None:
+        self.events.append(("render", event))
+
+    def kinds(self) -> list[str]:
+        return [kind for kind, _ in self.events]
+
+
+def echo(text: str) -> str:
+    """
+    Echoes the text back.
+
+    Args:
+        text: The text to echo.
+    """
+    return text
+
+
+def whoami() -> str:
+    return get_current_call().tool_name
+
+
+def fail() -> str:
+    raise ValueError("nope")
+
+
+def lookup_user(user_id: int) -> str:
+    return f"user {user_id}"
+
+
+def lookup_users(user_id: list[int]) -> list:
+    return [f"user {i}" if i else ValueError("no user 0") for i in user_id]
+
+
+def _make_library() -> ToolLibrary:
+    library = ToolLibrary(include_batch_tool=True)
+    library.add_tool(ToolDefinition(function=echo))
+    library.add_tool(ToolDefinition(function=fail))
+    library.add_tool(ToolDefinition(function=lookup_user,
+                                    batch_function=lookup_users))
+    return library
+
+
+def test_calls_and_errors():
+    hooks = RecordingHooks()
+    library = _make_library()
+    library.add_hooks(hooks)
+
+    assert library.get_tool_from_name("echo").call_tool({"text": "héllo"}, {}) \
+        == "héllo"
+    with pytest.raises(ValueError):
+        asyncio.run(library.get_tool_from_name("fail").call_tool_async({}, {}))
+
+    assert hooks.kinds() == ["start", "end", "start", "error", "end"]
+    call = hooks.events[1][1]
+    assert (call.tool_name, call.llm_parameters, call.result) \
+        == ("echo", {"text": "héllo"}, "héllo")
+    assert call.result_size == 6 and call.elapsed >= 0 and call.parent is None
+
+    failed = hooks.events[4][1]
+    assert isinstance(failed.error, ValueError) and failed.result_size is None
+    assert get_current_call() is None
+
+
+def test_batch_invocations_are_children_of_the_batch():
+    hooks = RecordingHooks()
+    library = _make_library()
+    library.add_hooks(hooks)
+
+    pytoolsmith_config.set_batch_runner(
+        pytoolsmith_config.ThreadPoolBatchRunner(max_workers=2))
+    try:
+        library.get_tool_from_name("batch_tool").call_tool({"invocations": [
+            {"name": "echo", "arguments": '{"text": "a"}'},
+            {"name": "lookup_user", "arguments": '{"user_id": 1}'},
+            {"name": "lookup_user", "arguments": '{"user_id": 0}'},
+        ]}, {})
+    finally:
+        pytoolsmith_config.unset_batch_runner()
+
+    ended = [event for kind, event in hooks.events if kind == "end"]
+    batch = ended[-1]
+    assert batch.tool_name == "batch_tool" and batch.parent is None
+    echo_call, = (e for e in ended if e.tool_name == "echo")
+    user_1, user_0 = sorted((e for e in ended if e.tool_name == "lookup_user"),
+                            key=lambda e: e.llm_parameters["user_id"], reverse=True)
+    assert user_1.result == "user 1" and str(user_0.error) == "no user 0"
+    assert echo_call.parent is batch and not echo_call.batched
+    assert user_1.parent is batch and user_1.batched and user_0.batched
+    assert hooks.kinds().count("error") == 1
+
+
+def test_schema_builds_and_renders():
+    hooks = RecordingHooks()
+    tool = ToolDefinition(function=echo, hooks=[hooks])
+    assert hooks.kinds() == ["schema"]
+    schema_event = hooks.events[0][1]
+    assert schema_event.tool_name == "echo" and schema_event.size > 0
+
+    # Cached schemas aren't built again.
+    tool.build_json_schema()
+    tool.build_json_schema({"unused": "value"})
+    assert hooks.kinds() == ["schema", "schema"]
+
+    library = ToolLibrary()
+    library.add_tool(tool)
+    library.add_hooks(hooks)
+    rendered = library.to_openai()
+    render = hooks.events[-1][1]
+    assert (render.format, render.rendered) == ("openai", rendered)
+    assert render.size > 0
+
+    # Hooks aren't added twice, and libraries made from this one keep them.
+    library.subset(names=["echo"]).to_anthropic()
+    assert hooks.kinds() == ["schema", "schema", "render", "render"]
+    assert tool._hooks == (hooks,)
+
+
+def test_lazy_and_later_tools_get_library_hooks():
+    hooks = RecordingHooks()
+    library = ToolLibrary()
+    library.add_hooks(hooks)
+    library.add_lazy("tests.test_hooks:echo")
+    library.add_tool(ToolDefinition(function=fail))
+
+    library.get_tool_from_name("echo").call_tool({"text": "x"}, {})
+    assert [e.tool_name for kind, e in hooks.events if kind == "end"] == ["echo"]
+    assert library.get_tool_from_name("fail")._hooks == (hooks,)
+
+
+def test_current_call():
+    hooked = ToolDefinition(function=whoami, hooks=[ToolHooks()])
+    assert hooked.call_tool({}, {}) == "whoami"
+    assert asyncio.run(hooked.call_tool_async({}, {})) == "whoami"
+
+    # Calls of tools without hooks don't create an event.
+    with pytest.raises(AttributeError):
+        ToolDefinition(function=whoami).call_tool({}, {})
+
+
+def test_failing_start_hook_doesnt_leave_a_current_call():
+    class FailingHooks(ToolHooks):
+        def on_call_start(self, event: CallEvent) -> None:
+            raise RuntimeError("hook failed")
+
+    tool = ToolDefinition(function=echo, hooks=[FailingHooks()])
+    with pytest.raises(RuntimeError):
+        tool.call_tool({"text": "x"}, {})
+    with pytest.raises(RuntimeError):
+        asyncio.run(tool.call_tool_async({"text": "x"}, {}))
+    assert get_current_call() is None
+
+
+def test_opentelemetry_spans():
+    pytest.importorskip("opentelemetry.sdk")
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+    from opentelemetry.sdk.trace.export.in_memory_span_exporter import (
+        InMemorySpanExporter,
+    )
+    from opentelemetry.trace import StatusCode
+
+    exporter = InMemorySpanExporter()
+    provider = TracerProvider()
+    provider.add_span_processor(SimpleSpanProcessor(exporter))
+
+    library = _make_library()
+    library.add_hooks(OpenTelemetryHooks(provider.get_tracer("test")))
+    pytoolsmith_config.set_batch_runner(
+        pytoolsmith_config.ThreadPoolBatchRunner(max_workers=2))
+    try:
+        library.get_tool_from_name("batch_tool").call_tool({"invocations": [
+            {"name": "echo", "arguments": '{"text": "a"}'},
+            {"name": "fail", "arguments": "{}"},
+            {"name": "lookup_user", "arguments": '{"user_id": 1}'},
+        ]}, {})
+    finally:
+        pytoolsmith_config.unset_batch_runner()
+
+    spans = {span.name: span for span in exporter.get_finished_spans()}
+    assert set(spans) == {"execute_tool batch_tool", "execute_tool echo",
+                          "execute_tool fail", "execute_tool lookup_user"}
+    batch = spans.pop("execute_tool batch_tool")
+    assert batch.parent is None
+    for span in spans.values():
+        assert span.parent.span_id == batch.context.span_id
+        assert span.context.trace_id == batch.context.trace_id
+
+    assert spans["execute_tool echo"].attributes["gen_ai.tool.name"] == "echo"
+    assert spans["execute_tool fail"].status.status_code == StatusCode.ERROR
+    assert spans["execute_tool fail"].attributes["error.type"] == "ValueError"
@@ -0,0 +1,222 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import json
+import threading
+import time
+
+import pytest
+
+from pytoolsmith import (
+    CircuitBreakerPolicy,
+    RateLimit,
+    RetryPolicy,
+    ToolDefinition,
+    ToolLibrary,
+    ToolQueueTimeoutError,
+    ToolTimeoutError,
+    pytoolsmith_config,
+)
+
+
+class _ConcurrencyTracker:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.running = 0
+        self.peak = 0
+
+    def __enter__(self):
+        with self.lock:
+            self.running += 1
+            self.peak = max(self.peak, self.running)
+
+    def __exit__(self, *exc_info):
+        with self.lock:
+            self.running -= 1
+
+
+def test_max_concurrency():
+    tracker = _ConcurrencyTracker()
+
+    def fetch(x: int) -> int:
+        with tracker:
+            time.sleep(0.02)
+        return x
+
+    tool = ToolDefinition(function=fetch, max_concurrency=2)
+    library = ToolLibrary()
+    library.add_tool(tool)
+
+    with ThreadPoolExecutor(max_workers=6) as pool:
+        results = list(pool.map(lambda x: tool.call_tool({"x": x}, {}), range(6)))
+
+    assert results == list(range(6))
+    assert tracker.peak == 2
+    stats = library.get_limit_stats()["fetch"]
+    assert (stats.active, stats.queued) == (0, 0)
+    assert stats.total_queued >= 4
+
+
+def test_rate_limit():
+    def ping() -> str:
+        return "pong"
+
+    tool = ToolDefinition(function=ping, rate_limit=RateLimit(rate=20, burst=2))
+
+    start = time.perf_counter()
+    for _ in range(4):
+        tool.call_tool({}, {})
+
+    # Two calls use the burst, and the other two wait 50ms each.
+    assert time.perf_counter() - start >= 0.09
+    assert tool.get_limit_stats().throttled == 2
+    assert ToolDefinition(function=ping).get_limit_stats() is None
+
+
+def test_waiting_for_a_slot_counts_towards_the_timeout():
+    release = threading.Event()
+
+    def hold() -> str:
+        release.wait(timeout=5)
+        return "done"
+
+    tool = ToolDefinition(function=hold, max_concurrency=1, timeout=0.05)
+
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        holder = pool.submit(tool.call_tool, {}, {})
+        time.sleep(0.01)
+        with pytest.raises(ToolTimeoutError):
+            tool.call_tool({}, {})
+        assert tool.get_limit_stats().queued == 0
+        release.set()
+        # The holder timed out too, but keeps its slot until it returns.
+        with pytest.raises(ToolTimeoutError):
+            holder.result()
+
+
+def test_queue_timeouts_are_not_retried_or_breaker_failures():
+    calls = 0
+
+    def ping() -> str:
+        nonlocal calls
+        calls += 1
+        return "pong"
+
+    tool = ToolDefinition(function=ping, rate_limit=RateLimit(rate=0.1),
+                          timeout=0.05, retry=RetryPolicy(initial_delay=0),
+                          circuit_breaker=CircuitBreakerPolicy(failure_threshold=2))
+    assert tool.call_tool({}, {}) == "pong"
+
+    for _ in range(2):
+        with pytest.raises(ToolQueueTimeoutError) as excinfo:
+            tool.call_tool({}, {})
+    assert str(excinfo.value) == "ping timed out after 0.05 seconds waiting for a slot."
+    assert calls == 1
+    assert tool.get_retry_stats().attempts == 3
+    assert tool.get_circuit_state() == "closed"
+
+    # Listing the error in `retry_on` retries it.
+    retried = ToolDefinition(function=ping, rate_limit=RateLimit(rate=0.1),
+                             timeout=0.05, retry=RetryPolicy(
+                                 retry_on=(ToolQueueTimeoutError,), initial_delay=0))
+    retried.call_tool({}, {})
+    with pytest.raises(ToolQueueTimeoutError):
+        retried.call_tool({}, {})
+    assert retried.get_retry_stats().attempts == 4
+
+
+def test_group_limits_apply_to_batches():
+    tracker = _ConcurrencyTracker()
+
+    def lookup_a(x: int) -> int:
+        with tracker:
+            time.sleep(0.02)
+        return x
+
+    def lookup_b(x: int) -> int:
+        with tracker:
+            time.sleep(0.02)
+        return x
+
+    library = ToolLibrary(include_batch_tool=True)
+    library.add_tool(ToolDefinition(function=lookup_a, tool_group="crm"))
+    library.add_tool(ToolDefinition(function=lookup_b, tool_group="crm"))
+    invocations = {"invocations": [
+        {"name": name, "arguments": json.dumps({"x": x})}
+        for x in range(3) for name in ("lookup_a", "lookup_b")
+    ]}
+
+    pytoolsmith_config.set_tool_group_limits("crm", max_concurrency=1)
+    pytoolsmith_config.set_batch_runner(
+        pytoolsmith_config.ThreadPoolBatchRunner(max_workers=6))
+    try:
+        library.get_tool_from_name("batch_tool").call_tool(invocations, {})
+        assert tracker.peak == 1
+        assert pytoolsmith_config.get_tool_group_limit_stats()["crm"].total_queued > 0
+
+        # Tools stop applying the limit once it is removed.
+        pytoolsmith_config.unset_tool_group_limits("crm")
+        tracker.peak = 0
+        library.get_tool_from_name("batch_tool").call_tool(invocations, {})
+        assert tracker.peak > 1
+    finally:
+        pytoolsmith_config.unset_batch_runner()
+        pytoolsmith_config.unset_tool_group_limits("crm")
+
+    assert "crm" not in pytoolsmith_config.get_tool_group_limit_stats()
+
+
+def test_async_limits():
+    running = 0
+    peak = 0
+
+    async def fetch(x: int) -> int:
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+        return x
+
+    tool = ToolDefinition(function=fetch, max_concurrency=2,
+                          rate_limit=RateLimit(rate=1000, burst=10))
+
+    async def main():
+        return await asyncio.gather(*[tool.call_tool_async({"x": x}, {})
+                                      for x in range(8)])
+
+    assert asyncio.run(main()) == list(range(8))
+    assert peak == 2
+    stats = tool.get_limit_stats()
+    assert (stats.active, stats.queued, stats.total_queued) == (0, 0, 6)
+
+
+def test_timed_out_calls_keep_their_slots_until_they_return():
+    tracker = _ConcurrencyTracker()
+
+    def fetch(x: int) -> int:
+        with tracker:
+            time.sleep(0.2)
+        return x
+
+    tool = ToolDefinition(function=fetch, max_concurrency=2, timeout=0.05)
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        futures = [pool.submit(tool.call_tool, {"x": x}, {}) for x in range(4)]
+        for future in futures:
+            with pytest.raises(ToolTimeoutError):
+                future.result()
+
+    async def call_async() -> None:
+        results = await asyncio.gather(
+            *(tool.call_tool_async({"x": x}, {}) for x in range(4)),
+            return_exceptions=True)
+        assert all(isinstance(result, ToolTimeoutError) for result in results)
+
+    time.sleep(0.3)
+    assert tracker.peak == 2 and tool.get_limit_stats().active == 0
+
+    asyncio.run(call_async())
+    assert tracker.peak == 2
+
+    # Once the abandoned calls return, their slots are free again.
+    time.sleep(0.3)
+    assert tool.get_limit_stats().active == 0
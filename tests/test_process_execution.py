@@ -0,0 +1,76 @@
+import asyncio
+import concurrent.futures
+import json
+import os
+import socket
+
+import pytest
+
+from pytoolsmith import ToolDefinition, ToolLibrary, pytoolsmith_config
+
+
+def score_document(text: str, tenant_id: str) -> dict:
+    """
+    Scores a document.
+    Args:
+        text: The document to score.
+    """
+    return {"score": len(text), "tenant_id": tenant_id, "pid": os.getpid()}
+
+
+@pytest.fixture
+def process_pool():
+    with concurrent.futures.ProcessPoolExecutor(max_workers=2) as executor:
+        pytoolsmith_config.set_process_pool(executor)
+        yield executor
+        pytoolsmith_config.unset_process_pool()
+
+
+def test_process_tool_runs_in_worker(process_pool):
+    tool = ToolDefinition(function=score_document, injected_parameters=["tenant_id"],
+                          execution="process")
+
+    # Only the injected hard-set parameters are sent, so others needn't pickle.
+    with socket.socket() as sock:
+        result = tool.call_tool({"text": "hello"}, {"tenant_id": "t1", "sock": sock})
+
+    assert result["score"] == 5
+    assert result["tenant_id"] == "t1"
+    assert result["pid"] != os.getpid()
+
+    async_result = asyncio.run(
+        tool.call_tool_async({"text": "hi"}, {"tenant_id": "t1"}))
+    assert async_result["score"] == 2
+
+
+def test_process_tool_in_batch(process_pool):
+    library = ToolLibrary(include_batch_tool=True)
+    library.add_tool(ToolDefinition(function=score_document,
+                                    injected_parameters=["tenant_id"],
+                                    execution="process"))
+
+    invocations = [{"name": "score_document", "arguments": json.dumps({"text": "ab"})},
+                   {"name": "score_document", "arguments": "{}"}]
+    result = library.get_tool_from_name("batch_tool").call_tool(
+        {"invocations": invocations}, {"tenant_id": "t1"})
+
+    first, second = result.split("\n")
+    assert first.startswith("#0 (score_document) Result: {'score': 2")
+    assert second.startswith("#1 (score_document) Result (note: errored):")
+
+
+def test_process_tool_must_be_importable():
+    def local_tool(a: str) -> str:
+        return a
+
+    with pytest.raises(ValueError):
+        ToolDefinition(function=local_tool, execution="process")
+
+    async def async_tool(a: str) -> str:
+        return a
+
+    with pytest.raises(ValueError):
+        ToolDefinition(function=async_tool, execution="process")
+
+    with pytest.raises(ValueError):
+        ToolDefinition(function=score_document, execution="thread")
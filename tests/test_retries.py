@@ -0,0 +1,103 @@
+import asyncio
+import time
+
+import pytest
+
+from pytoolsmith import RetryPolicy, ToolDefinition, ToolLibrary, ToolTimeoutError
+
+FAST_RETRIES = RetryPolicy(initial_delay=0.01, jitter=0)
+
+
+def test_retries_transient_errors(flaky_tool):
+    tool, attempts = flaky_tool(failures=2, retry=FAST_RETRIES)
+
+    assert tool.call_tool({"x": 1}, {}) == 1
+    assert len(attempts) == 3
+
+    stats = tool.get_retry_stats()
+    assert (stats.calls, stats.attempts, stats.retried_calls, stats.exhausted) == \
+        (1, 3, 1, 0)
+
+
+def test_gives_up_after_max_attempts(flaky_tool):
+    tool, attempts = flaky_tool(failures=5, retry=FAST_RETRIES)
+
+    with pytest.raises(ConnectionError):
+        tool.call_tool({"x": 1}, {})
+    assert len(attempts) == 3
+    assert tool.get_retry_stats().exhausted == 1
+
+
+def test_other_errors_are_not_retried(flaky_tool):
+    tool, attempts = flaky_tool(failures=1, error=ValueError, retry=FAST_RETRIES)
+
+    with pytest.raises(ValueError):
+        tool.call_tool({"x": 1}, {})
+    assert len(attempts) == 1
+    assert flaky_tool(failures=0)[0].get_retry_stats() is None
+
+    with pytest.raises(ValueError, match="max_attempts"):
+        flaky_tool(failures=0, retry=RetryPolicy(max_attempts=0))
+
+
+def test_backoff_grows_and_is_capped(flaky_tool):
+    tool, attempts = flaky_tool(
+        failures=3,
+        retry=RetryPolicy(max_attempts=4, initial_delay=0.02, multiplier=2,
+                          max_delay=0.03, jitter=0))
+
+    start = time.perf_counter()
+    tool.call_tool({"x": 1}, {})
+
+    # Waits of 0.02, then 0.03 twice, as 0.04 and 0.08 are capped.
+    assert 0.08 <= time.perf_counter() - start < 0.2
+
+
+def test_retries_in_batches_stop_at_the_deadline(flaky_tool):
+    tool, attempts = flaky_tool(failures=5,
+                                 retry=RetryPolicy(initial_delay=0.2, jitter=0))
+    library = ToolLibrary(include_batch_tool=True, batch_deadline=0.1)
+    library.add_tool(tool)
+
+    start = time.perf_counter()
+    results = library.run_batch([{"name": "fetch", "arguments": '{"x": 1}'}], {})
+
+    assert time.perf_counter() - start < 0.1
+    assert results[0].errored and results[0].result == "downstream is flaky"
+    assert len(attempts) == 1
+    assert library.get_retry_stats()["fetch"].exhausted == 1
+
+
+def test_timeouts_are_a_budget_for_every_attempt():
+    def slow(x: int) -> int:
+        time.sleep(0.2)
+        return x
+
+    # Timed-out calls aren't retried by default, even though they're TimeoutErrors.
+    tool = ToolDefinition(function=slow, timeout=0.05, retry=FAST_RETRIES)
+    with pytest.raises(ToolTimeoutError):
+        tool.call_tool({"x": 1}, {})
+    assert tool.get_retry_stats().attempts == 1
+
+    # Listed, they are retried, but only within the one timeout.
+    tool = ToolDefinition(function=slow, timeout=0.05, retry=RetryPolicy(
+        retry_on=(ToolTimeoutError,), max_attempts=5, initial_delay=0))
+    start = time.perf_counter()
+    with pytest.raises(ToolTimeoutError):
+        tool.call_tool({"x": 1}, {})
+    assert time.perf_counter() - start < 0.15
+
+
+def test_async_retries():
+    attempts = []
+
+    async def fetch(x: int) -> int:
+        attempts.append(x)
+        if len(attempts) == 1:
+            raise TimeoutError("downstream timed out")
+        return x
+
+    tool = ToolDefinition(function=fetch, retry=FAST_RETRIES)
+
+    assert asyncio.run(tool.call_tool_async({"x": 2}, {})) == 2
+    assert tool.get_retry_stats().attempts == 2
@@ -0,0 +1,138 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from pytoolsmith import CachePolicy, ToolDefinition
+
+
+def test_concurrent_identical_calls_share_one_execution(blocking_tool, wait_for):
+    tool, calls, release = blocking_tool(single_flight=True)
+
+    with ThreadPoolExecutor(max_workers=5) as pool:
+        futures = [pool.submit(tool.call_tool, {"report_id": "r"}, {"tenant_id": "t"})
+                   for _ in range(4)]
+        # A different tenant is a different call.
+        other = pool.submit(tool.call_tool, {"report_id": "r"}, {"tenant_id": "u"})
+        wait_for(lambda: len(calls) == 2)
+        release.set()
+        results = [future.result() for future in futures]
+
+    assert calls == ["r", "r"]
+    assert len(set(results)) == 1
+    assert other.result().startswith("u/r/")
+
+    # Once the call finishes, the next one runs again.
+    tool.call_tool({"report_id": "r"}, {"tenant_id": "t"})
+    assert len(calls) == 3
+
+
+def test_followers_receive_the_exception(blocking_tool, wait_for):
+    tool, calls, release = blocking_tool(single_flight=True)
+
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        futures = [pool.submit(tool.call_tool, {"report_id": "bad"},
+                               {"tenant_id": "t"}) for _ in range(3)]
+        wait_for(lambda: len(calls) == 1)
+        release.set()
+        for future in futures:
+            with pytest.raises(ValueError, match="Report not found"):
+                future.result()
+
+    assert calls == ["bad"]
+
+
+def test_single_flight_is_off_by_default(blocking_tool):
+    tool, calls, release = blocking_tool()
+    release.set()
+
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        list(pool.map(lambda _: tool.call_tool({"report_id": "r"}, {"tenant_id": "t"}),
+                      range(3)))
+
+    assert calls == ["r", "r", "r"]
+
+
+def test_single_flight_with_cache(blocking_tool, wait_for):
+    tool, calls, release = blocking_tool(single_flight=True, cache=CachePolicy())
+
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        futures = [pool.submit(tool.call_tool, {"report_id": "r"},
+                               {"tenant_id": "t"}) for _ in range(3)]
+        wait_for(lambda: len(calls) == 1)
+        release.set()
+        assert len({future.result() for future in futures}) == 1
+
+    tool.call_tool({"report_id": "r"}, {"tenant_id": "t"})
+    assert calls == ["r"]
+    assert tool.get_cache_stats().hits == 1
+
+
+def test_async_single_flight():
+    calls = []
+
+    async def get_report(report_id: str) -> str:
+        calls.append(report_id)
+        call_number = len(calls)
+        await asyncio.sleep(0.02)
+        if report_id == "bad":
+            raise ValueError("Report not found")
+        return f"{report_id}/{call_number}"
+
+    tool = ToolDefinition(function=get_report, single_flight=True)
+
+    async def main():
+        results = await asyncio.gather(
+            *[tool.call_tool_async({"report_id": "r"}, {}) for _ in range(3)],
+            tool.call_tool_async({"report_id": "s"}, {}),
+        )
+        errors = await asyncio.gather(
+            *[tool.call_tool_async({"report_id": "bad"}, {}) for _ in range(2)],
+            return_exceptions=True,
+        )
+        return results, errors
+
+    results, errors = asyncio.run(main())
+
+    assert results == ["r/1", "r/1", "r/1", "s/2"]
+    assert all(isinstance(error, ValueError) for error in errors)
+    assert calls == ["r", "s", "bad"]
+
+
+def test_cancelling_the_first_async_caller_doesnt_cancel_the_others():
+    calls = []
+    cancelled = []
+
+    async def get_report(report_id: str) -> str:
+        calls.append(report_id)
+        try:
+            await asyncio.sleep(0.05)
+        except asyncio.CancelledError:
+            cancelled.append(report_id)
+            raise
+        return report_id
+
+    tool = ToolDefinition(function=get_report, single_flight=True)
+
+    async def main():
+        leader = asyncio.create_task(tool.call_tool_async({"report_id": "r"}, {}))
+        await asyncio.sleep(0.01)
+        follower = asyncio.create_task(tool.call_tool_async({"report_id": "r"}, {}))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        assert await follower == "r"
+        assert leader.cancelled()
+
+        # Once every caller is cancelled, so is the execution.
+        alone = asyncio.create_task(tool.call_tool_async({"report_id": "s"}, {}))
+        await asyncio.sleep(0.01)
+        alone.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await alone
+        await asyncio.sleep(0)
+        # The next call runs again rather than joining the cancelled one.
+        assert await tool.call_tool_async({"report_id": "s"}, {}) == "s"
+
+    asyncio.run(main())
+    assert calls == ["r", "s", "s"]
+    assert cancelled == ["s"]
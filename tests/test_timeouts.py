@@ -0,0 +1,175 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import json
+import threading
+import time
+
+import pytest
+
+from pytoolsmith import ToolDefinition, ToolLibrary, ToolTimeoutError
+
+
+def slow(seconds: float) -> str:
+    time.sleep(seconds)
+    return "done"
+
+
+async def slow_async(seconds: float) -> str:
+    await asyncio.sleep(seconds)
+    return "done"
+
+
+def fails() -> str:
+    raise ValueError("downstream is down")
+
+
+def test_tool_timeout():
+    tool = ToolDefinition(function=slow, timeout=0.05)
+
+    start = time.perf_counter()
+    with pytest.raises(ToolTimeoutError) as excinfo:
+        tool.call_tool({"seconds": 0.5}, {})
+    assert time.perf_counter() - start < 0.3
+    assert str(excinfo.value) == "slow timed out after 0.05 seconds."
+
+    assert tool.call_tool({"seconds": 0}, {}) == "done"
+
+
+def test_async_tool_timeout():
+    tool = ToolDefinition(function=slow_async, timeout=0.05)
+
+    with pytest.raises(ToolTimeoutError):
+        asyncio.run(tool.call_tool_async({"seconds": 0.5}, {}))
+
+    assert asyncio.run(tool.call_tool_async({"seconds": 0}, {})) == "done"
+
+
+def _slow_invocations(*durations: float) -> dict:
+    return {"invocations": [{"name": "slow", "arguments": json.dumps({"seconds": d})}
+                            for d in durations]}
+
+
+def test_batch_deadline():
+    library = ToolLibrary(include_batch_tool=True, batch_deadline=0.15)
+    library.add_tool(ToolDefinition(function=slow, batch_dedupe=False))
+    batch = library.get_tool_from_name("batch_tool")
+
+    result = batch.call_tool(_slow_invocations(0.1, 0.5, 0.1), {})
+
+    first, second, third = result.split("\n")
+    assert first == "#0 (slow) Result: done"
+    # The second call only gets what is left of the deadline.
+    assert second.startswith("#1 (slow) Result (note: errored): slow timed out after")
+    assert third == ("#2 (slow) Result (note: errored): "
+                     "Skipped: the batch deadline passed before this call started.")
+
+    # Subsets keep the batch settings.
+    subset_batch = library.subset(["slow"]).get_tool_from_name("batch_tool")
+    assert "Skipped" in subset_batch.call_tool(_slow_invocations(0.2, 0), {})
+
+
+def test_async_batch_deadline():
+    library = ToolLibrary(include_batch_tool=True, batch_deadline=0.1)
+    library.add_tool(ToolDefinition(function=slow_async))
+    batch = library.get_tool_from_name("batch_tool")
+    invocations = {"invocations": [
+        {"name": "slow_async", "arguments": json.dumps({"seconds": d})}
+        for d in (0, 0.5)
+    ]}
+
+    start = time.perf_counter()
+    result = asyncio.run(batch.call_tool_async(invocations, {}))
+
+    assert time.perf_counter() - start < 0.3
+    assert result.split("\n")[0] == "#0 (slow_async) Result: done"
+    assert "timed out" in result.split("\n")[1]
+
+
+def test_batch_fail_fast():
+    library = ToolLibrary(include_batch_tool=True, batch_fail_fast=True)
+    library.add_tool(ToolDefinition(function=slow, batch_dedupe=False))
+    library.add_tool(ToolDefinition(function=fails))
+    batch = library.get_tool_from_name("batch_tool")
+
+    result = batch.call_tool({"invocations": [
+        {"name": "slow", "arguments": '{"seconds": 0}'},
+        {"name": "fails", "arguments": "{}"},
+        {"name": "slow", "arguments": '{"seconds": 0}'},
+    ]}, {})
+
+    assert result.split("\n") == [
+        "#0 (slow) Result: done",
+        "#1 (fails) Result (note: errored): downstream is down",
+        "#2 (slow) Result (note: errored): "
+        "Skipped: an earlier call in the batch failed.",
+    ]
+
+
+def test_async_batch_fail_fast_cancels_running_calls():
+    async def fails_soon() -> str:
+        await asyncio.sleep(0.05)
+        raise ValueError("downstream is down")
+
+    def lookup(user_id: int) -> int:
+        return user_id
+
+    def lookup_many(user_id: list[int]) -> list:
+        time.sleep(1)
+        return user_id
+
+    library = ToolLibrary(include_batch_tool=True, batch_fail_fast=True)
+    library.add_tool(ToolDefinition(function=slow_async, batch_dedupe=False))
+    library.add_tool(ToolDefinition(function=slow, batch_dedupe=False))
+    library.add_tool(ToolDefinition(function=fails_soon))
+    library.add_tool(ToolDefinition(function=lookup, batch_function=lookup_many))
+    batch = library.get_tool_from_name("batch_tool")
+
+    async def run_batch() -> tuple[str, float]:
+        start = time.perf_counter()
+        result = await batch.call_tool_async({"invocations": [
+            {"name": "slow_async", "arguments": '{"seconds": 1}'},
+            {"name": "slow", "arguments": '{"seconds": 1}'},
+            {"name": "lookup", "arguments": '{"user_id": 1}'},
+            {"name": "lookup", "arguments": '{"user_id": 2}'},
+            {"name": "fails_soon", "arguments": "{}"},
+        ]}, {})
+        return result, time.perf_counter() - start
+
+    # The abandoned sync calls still finish before `asyncio.run` returns, since it
+    # waits for the default executor's threads.
+    result, elapsed = asyncio.run(run_batch())
+    assert elapsed < 0.5
+    cancelled = ("Result (note: errored): "
+                 "Cancelled: an earlier call in the batch failed.")
+    assert result.split("\n") == [
+        f"#0 (slow_async) {cancelled}",
+        f"#1 (slow) {cancelled}",
+        f"#2 (lookup) {cancelled}",
+        f"#3 (lookup) {cancelled}",
+        "#4 (fails_soon) Result (note: errored): downstream is down",
+    ]
+
+
+def test_hung_calls_dont_hold_up_other_tools():
+    release = threading.Event()
+    started = []
+
+    def hang() -> str:
+        started.append(1)
+        release.wait(5)
+        return "late"
+
+    hung = ToolDefinition(function=hang, timeout=0.1)
+    fast = ToolDefinition(function=slow, timeout=0.5)
+    try:
+        # More hung calls than a default-sized thread pool ever has workers.
+        with ThreadPoolExecutor(max_workers=40) as pool:
+            futures = [pool.submit(hung.call_tool, {}, {}) for _ in range(40)]
+            for future in futures:
+                with pytest.raises(ToolTimeoutError):
+                    future.result()
+        assert len(started) == 40
+
+        assert fast.call_tool({"seconds": 0.01}, {}) == "done"
+    finally:
+        release.set()
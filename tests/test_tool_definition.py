@@ -569,3 +569,18 @@ def test_overwrite_input_properties_fields_deep_nesting():
             == 2)
     assert (schema.input_properties["contact"]["properties"]["last_name"]["default"]
             == "Smith")
+
+
+def test_call_tool_injected_parameters_take_precedence():
+    def lookup(user_id: str, tenant_id: str) -> str:
+        return f"{tenant_id}/{user_id}"
+
+    tool = ToolDefinition(function=lookup, injected_parameters=["tenant_id"])
+    llm_parameters = {"user_id": "u1", "tenant_id": "from-llm"}
+
+    assert tool.call_tool(llm_parameters, {"tenant_id": "t1"}) == "t1/u1"
+    # The caller's dictionary is left untouched.
+    assert llm_parameters == {"user_id": "u1", "tenant_id": "from-llm"}
+
+    with pytest.raises(KeyError):
+        tool.call_tool({"user_id": "u1"}, {})
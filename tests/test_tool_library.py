@@ -1,3 +1,7 @@
+import concurrent.futures
+import sys
+import threading
+
 import pytest
 
 from pytoolsmith import ToolDefinition, ToolLibrary
@@ -134,3 +138,94 @@ def test_exclude_library_from_groups(filled_tool_library):
     assert subset_library.get_all_tool_names() == ["_func_to_test_2"]
     subset_library = filled_tool_library.exclude(groups=["1s", "2s"])
     assert subset_library.get_all_tool_names() == []
+
+
+def test_add_lazy_tool():
+    sys.modules.pop("_lazy_tools_module", None)
+
+    tool_library = ToolLibrary()
+    tool_library.add_lazy("_lazy_tools_module:refund",
+                          injected_parameters=["tenant_id"],
+                          tool_group="billing")
+
+    assert tool_library.get_all_tool_names() == ["refund"]
+    assert tool_library.get_tool_names_in_group("billing") == ["refund"]
+    subset_library = tool_library.subset(groups=["billing"])
+    assert "_lazy_tools_module" not in sys.modules
+
+    tool = subset_library.get_tool_from_name("refund")
+    assert "_lazy_tools_module" in sys.modules
+    assert tool.call_tool({"order_id": "o1"}, {"tenant_id": "t1"}) == (
+        "Refunded o1 for t1")
+
+    # The definition is built once and shared with the parent library.
+    assert tool_library.get_tool_from_name("refund") is tool
+    assert tool_library.get_tool_descriptions() == {"refund": "Refunds an order."}
+
+
+def test_add_lazy_tool_bad_path():
+    tool_library = ToolLibrary()
+    with pytest.raises(ValueError):
+        tool_library.add_lazy("_lazy_tools_module.refund")
+
+    tool_library.add_lazy("_lazy_tools_module:not_a_tool")
+    with pytest.raises(AttributeError):
+        tool_library.to_anthropic()
+
+    with pytest.raises(ValueError):
+        tool_library.add_lazy("_lazy_tools_module:not_a_tool")
+
+
+def test_concurrent_registration_and_reads():
+    tool_library = ToolLibrary(include_batch_tool=True)
+    n_threads, n_tools = 8, 50
+
+    def make_function(name: str):
+        def func(a: str) -> str:
+            return a
+
+        func.__name__ = name
+        return func
+
+    def register(thread_idx: int):
+        for i in range(n_tools):
+            tool_library.add_tool(ToolDefinition(
+                function=make_function(f"tool_{thread_idx}_{i}"), tool_group="all"))
+            tool_library.get_all_tool_group_names()
+            tool_library.get_tool_from_name(f"tool_{thread_idx}_{i}")
+
+    threads = [threading.Thread(target=register, args=(i,)) for i in range(n_threads)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(tool_library.to_anthropic()) == n_threads * n_tools + 1
+    assert len(tool_library.get_all_tool_names()) == n_threads * n_tools
+    assert len(tool_library.get_tool_names_in_group("all")) == n_threads * n_tools
+
+
+def test_batch_tool_is_per_library():
+    """Libraries running batches at the same time must not see each other's tools."""
+    library_1 = ToolLibrary(include_batch_tool=True)
+    library_1.add_tool(ToolDefinition(function=_func_to_test_1))
+    library_2 = ToolLibrary(include_batch_tool=True)
+    library_2.add_tool(ToolDefinition(function=_func_to_test_2))
+
+    assert (library_1.get_tool_from_name("batch_tool")
+            is not library_2.get_tool_from_name("batch_tool"))
+
+    def run(library: ToolLibrary, tool_name: str, arg_name: str) -> list[str]:
+        batch = library.get_tool_from_name("batch_tool")
+        invocations = [{"name": tool_name, "arguments": f'{{"{arg_name}": "x"}}'}]
+        return [batch.call_tool({"invocations": invocations}, {}) for _ in range(200)]
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=8) as executor:
+        futures = [
+            executor.submit(run, library_1, "_func_to_test_1", "a")
+            if i % 2 else executor.submit(run, library_2, "_func_to_test_2", "b")
+            for i in range(8)
+        ]
+        results = [r for f in futures for r in f.result()]
+
+    assert all("errored" not in r for r in results)
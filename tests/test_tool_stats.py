@@ -0,0 +1,125 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import time
+
+import pytest
+
+from pytoolsmith import ToolDefinition, ToolLibrary, format_prometheus_metrics
+from pytoolsmith.tool_stats import LATENCY_BOUNDS, SIZE_BOUNDS, StatsRecorder
+
+
+def _make_library() -> ToolLibrary:
+    def echo(text: str) -> str:
+        return text
+
+    def fail() -> str:
+        raise ValueError("nope")
+
+    def nap(seconds: float) -> dict:
+        time.sleep(seconds)
+        return {"slept": seconds}
+
+    library = ToolLibrary(include_batch_tool=True)
+    for function in (echo, fail, nap):
+        library.add_tool(ToolDefinition(function=function))
+    return library
+
+
+def test_records_calls_errors_and_sizes():
+    library = _make_library()
+    echo = library.get_tool_from_name("echo")
+
+    assert echo.call_tool({"text": "hello"}, {}) == "hello"
+    assert asyncio.run(echo.call_tool_async({"text": "héllo"}, {})) == "héllo"
+    with pytest.raises(ValueError):
+        library.get_tool_from_name("fail").call_tool({}, {})
+    library.get_tool_from_name("batch_tool").call_tool({"invocations": [
+        {"name": "echo", "arguments": '{"text": "batched"}'},
+        {"name": "fail", "arguments": "{}"},
+        {"name": "nap", "arguments": '{"seconds": 0.01}'},
+    ]}, {})
+
+    stats = library.stats_snapshot()
+    assert set(stats) == {"echo", "fail", "nap", "batch_tool"}
+    assert (stats["echo"].calls, stats["echo"].errors) == (3, 0)
+    assert (stats["fail"].calls, stats["fail"].error_rate) == (2, 1.0)
+    assert stats["batch_tool"].calls == 1
+
+    # "héllo" is 6 bytes, and dictionaries aren't sized.
+    assert stats["echo"].result_size.sum == 5 + 6 + 7
+    assert stats["nap"].result_size.count == 0
+
+    latency = stats["nap"].latency
+    assert latency.count == 1 and latency.sum >= 0.01
+    assert 0.01 <= latency.quantile(0.5) < 0.02
+
+
+def test_records_from_many_threads():
+    def ping() -> str:
+        return "pong"
+
+    tool = ToolDefinition(function=ping)
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(lambda _: tool.call_tool({}, {}), range(400)))
+
+    stats = tool.get_stats()
+    assert stats.calls == stats.latency.count == stats.result_size.count == 400
+    assert stats.result_size.sum == 1600
+
+    merged = stats.merge(stats)
+    assert merged.calls == 800 and merged.latency.count == 800
+
+
+def test_shards_of_ended_threads_are_retired():
+    def ping() -> str:
+        return "pong"
+
+    tool = ToolDefinition(function=ping)
+    for _ in range(200):
+        threads = [threading.Thread(target=tool.call_tool, args=({}, {}))
+                   for _ in range(10)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    assert len(tool._stats._shards) <= 10
+    stats = tool.get_stats()
+    assert stats.calls == stats.result_size.count == 2000
+    assert stats.result_size.sum == 8000
+
+
+def test_values_fall_in_the_bucket_they_bound():
+    recorder = StatsRecorder()
+    for bound in LATENCY_BOUNDS:
+        recorder.record(bound, None)
+    for bound in SIZE_BOUNDS:
+        recorder.record(0.0, b"x" * int(bound))
+    # Larger values count in the last bucket.
+    recorder.record(1000.0, b"x" * int(SIZE_BOUNDS[-1] * 2))
+
+    stats = recorder.snapshot()
+    assert stats.latency.counts == ((len(SIZE_BOUNDS) + 1,)
+                                    + (1,) * (len(LATENCY_BOUNDS) - 2) + (2,))
+    assert stats.result_size.counts == (1,) * (len(SIZE_BOUNDS) - 1) + (2,)
+
+
+def test_prometheus_metrics():
+    library = _make_library()
+    library.get_tool_from_name("echo").call_tool({"text": "hello"}, {})
+    library.get_tool_from_name("nap").call_tool({"seconds": 0.01}, {})
+
+    text = format_prometheus_metrics(library.stats_snapshot())
+    lines = text.splitlines()
+
+    assert "# TYPE pytoolsmith_tool_calls_total counter" in lines
+    assert 'pytoolsmith_tool_calls_total{tool="echo"} 1' in lines
+    assert 'pytoolsmith_tool_errors_total{tool="fail"} 0' in lines
+    assert "# TYPE pytoolsmith_tool_latency_seconds histogram" in lines
+    assert 'pytoolsmith_tool_latency_seconds_bucket{tool="nap",le="0.0064"} 0' in lines
+    assert 'pytoolsmith_tool_latency_seconds_bucket{tool="nap",le="0.0256"} 1' in lines
+    assert 'pytoolsmith_tool_latency_seconds_bucket{tool="nap",le="+Inf"} 1' in lines
+    assert 'pytoolsmith_tool_latency_seconds_count{tool="nap"} 1' in lines
+    assert 'pytoolsmith_tool_result_size_bytes_bucket{tool="echo",le="16"} 1' in lines
+    assert 'pytoolsmith_tool_result_size_bytes_sum{tool="echo"} 5' in lines